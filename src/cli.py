@@ -0,0 +1,192 @@
+# cli.py
+#
+# The supplysim command line: python -m src <command> [options].
+#
+#   simulate        simulate catalog rows for a date range and a number of SKUs
+#   generate-daily  build the daily sales and stock series of the cleaned catalog
+#   clean           cap outliers and transform the catalog (configs: outliers)
+#   train           train and evaluate the revenue model (configs: train)
+#   predict         simulate, predict and aggregate the weekly restock plan
+#   report          render the EDA figures and the weekly/monthly aggregates
+#   serve           answer predictions over HTTP with micro-batching
+#
+# Defaults come from configs/config.yaml (--config for another file) and
+# options override them. This module only imports the standard library and
+# the config loader: pandas, sklearn, matplotlib and mlflow are imported by
+# the commands that use them, so starting a light command stays cheap.
+
+import argparse
+import sys
+import time
+
+from src.utils.config import CONFIG_PATH, load_config, resolve_path
+
+
+def _section(args, name):
+    return dict(args.config.get(name) or {})
+
+
+def _override(config, args, *names):
+    for name in names:
+        value = getattr(args, name, None)
+        if value is not None:
+            config[name] = value
+    return config
+
+
+# 1. Commands
+def simulate(args):
+    from datetime import datetime, timedelta
+
+    from src.utils.data_sim import simulate_daily_data, simulate_to_files
+
+    config = _override(_section(args, "simulate"), args, "start_date", "end_date", "skus", "seed", "output")
+    start_date = datetime.fromisoformat(str(config.get("start_date", "2023-01-01")))
+    end_date = datetime.fromisoformat(str(config["end_date"])) if config.get("end_date") else \
+        start_date + timedelta(days=30)
+    skus = [f"SKU{i}" for i in range(int(config.get("skus", 100)))]
+    output = resolve_path(config.get("output", "data/simulated"))
+
+    if output.suffix == ".csv":
+        simulated = simulate_daily_data(start_date, end_date, skus, seed=config.get("seed"))
+        simulated.to_csv(output, index=False)
+        print(f"Wrote {len(simulated)} rows to {output}")
+    else:
+        simulate_to_files(start_date, end_date, skus, output, chunk_days=config.get("chunk_days", 7),
+                          seed=config.get("seed"), file_format=config.get("format", "parquet"))
+
+
+def generate_daily(args):
+    from src.utils import daily_timeseries_dataset
+
+    config = _override(_section(args, "generate_daily"), args, "input_path", "output_path", "n_days", "seed")
+    daily_timeseries_dataset.main(config)
+
+
+def clean(args):
+    from src.utils.fix_outliers import fix_outliers
+
+    config = _override(_section(args, "outliers"), args, "input_path", "output_path")
+    output_path = resolve_path(config["output_path"])
+    rows_written = fix_outliers(resolve_path(config["input_path"]), output_path, config["columns"],
+                                threshold=config.get("threshold", 3), log_columns=config.get("log_columns", []),
+                                drop_columns=config.get("drop_columns", []), chunksize=config.get("chunksize", 100000))
+    print(f"Wrote {rows_written} cleaned rows to {output_path}")
+
+
+def train(args):
+    from src.models import model_train
+
+    model_train.main(_override(_section(args, "train"), args, "data_path", "n_estimators"))
+
+
+def predict(args):
+    from src.etl.load import DEFAULT_DATABASE
+    from src.utils import data_sim
+
+    config = _override(_section(args, "predict"), args, "seed")
+    database = config.get("database") or _section(args, "load").get("database", DEFAULT_DATABASE)
+    data_sim.main(seed=config.get("seed"), database=database)
+
+
+def report(args):
+    import pandas as pd
+
+    from src.etl.aggregates import PredictionAggregates
+    from src.etl.load import DEFAULT_DATABASE, SkuDateStore
+    from src.visualization.eda_daily_data import eda_figures
+    from src.visualization.rendering import render_figures
+
+    config = _override(_section(args, "visualization"), args, "output_dir")
+    output_dir = resolve_path(config.get("output_dir", "reports/figures"))
+    output_dir.mkdir(parents=True, exist_ok=True)
+    daily_df = pd.read_csv(resolve_path(config.get("daily_series", "daily_time_series_data.csv")))
+    figures = eda_figures(daily_df, output_dir, max_series=config.get("max_series", 20),
+                          max_points=config.get("max_points", 1000))
+    for path in render_figures(figures):
+        print(f"Saved {path}")
+
+    # Weekly and monthly rollups of the materialized prediction aggregates
+    with SkuDateStore(_section(args, "load").get("database", DEFAULT_DATABASE)) as store:
+        aggregates = PredictionAggregates(store)
+        for name, frame in (("weekly_predictions", aggregates.weekly()), ("monthly_predictions", aggregates.monthly())):
+            frame.to_csv(output_dir / f"{name}.csv", index=False)
+            print(f"Saved {output_dir / f'{name}.csv'} ({len(frame)} rows)")
+
+
+def serve(args):
+    from src.models.prediction_service import serve as serve_predictions
+
+    config = _override(_section(args, "serve"), args, "host", "port", "socket", "max_wait_ms")
+    serve_predictions(config, verbose=args.verbose)
+
+
+# 2. Parser
+def build_parser():
+    parser = argparse.ArgumentParser(prog="supplysim", description="Supply chain simulation pipeline")
+    parser.add_argument("--config", default=str(CONFIG_PATH), help="configuration file (default: %(default)s)")
+    parser.add_argument("--timings", action="store_true", help="print the time of every pipeline stage on exit")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("simulate", help="simulate catalog rows per date and SKU")
+    command.add_argument("--start-date", dest="start_date")
+    command.add_argument("--end-date", dest="end_date")
+    command.add_argument("--skus", type=int, help="number of SKUs")
+    command.add_argument("--seed", type=int)
+    command.add_argument("--output", help="directory of date partitions, or a .csv file")
+    command.set_defaults(handler=simulate)
+
+    command = commands.add_parser("generate-daily", help="build the daily sales and stock series")
+    command.add_argument("--input", dest="input_path")
+    command.add_argument("--output", dest="output_path")
+    command.add_argument("--days", dest="n_days", type=int)
+    command.add_argument("--seed", type=int)
+    command.set_defaults(handler=generate_daily)
+
+    command = commands.add_parser("clean", help="cap outliers and transform the catalog")
+    command.add_argument("--input", dest="input_path")
+    command.add_argument("--output", dest="output_path")
+    command.set_defaults(handler=clean)
+
+    command = commands.add_parser("train", help="train and evaluate the revenue model")
+    command.add_argument("--data", dest="data_path")
+    command.add_argument("--n-estimators", dest="n_estimators", type=int)
+    command.set_defaults(handler=train)
+
+    command = commands.add_parser("predict", help="simulate, predict and aggregate the restock plan")
+    command.add_argument("--seed", type=int)
+    command.set_defaults(handler=predict)
+
+    command = commands.add_parser("report", help="render EDA figures and prediction aggregates")
+    command.add_argument("--output-dir", dest="output_dir")
+    command.set_defaults(handler=report)
+
+    command = commands.add_parser("serve", help="answer predictions over HTTP with micro-batching")
+    command.add_argument("--host")
+    command.add_argument("--port", type=int)
+    command.add_argument("--socket", help="listen on this Unix socket instead of a TCP port")
+    command.add_argument("--max-wait-ms", dest="max_wait_ms", type=float)
+    command.add_argument("--verbose", action="store_true", help="log every request")
+    command.set_defaults(handler=serve)
+    return parser
+
+
+def main(argv=None):
+    start = time.perf_counter()
+    args = build_parser().parse_args(argv)
+    args.config = load_config(args.config)
+
+    from src.utils.instrumentation import setup_stage_log, stage, summarize
+
+    setup_stage_log(args.config)
+    with stage(f"cli_{args.command.replace('-', '_')}"):
+        args.handler(args)
+
+    if args.timings:
+        print(summarize()[["stage", "rows", "seconds", "cpu_seconds", "rss_delta_mb"]].to_string(index=False))
+        print(f"Total {time.perf_counter() - start:.2f}s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
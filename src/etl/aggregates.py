@@ -0,0 +1,171 @@
+# aggregates.py
+#
+# Materialized weekly and monthly aggregates of the daily predictions. The
+# partials table holds one row per (ISO year, ISO week, year, month, SKU),
+# i.e. per SKU and week, split where a week crosses a month boundary, with
+# mergeable aggregates: sums, the count behind the mean restock date and
+# the product type of the earliest day. Daily predictions are upserted
+# into the predictions table and only the partials of the weeks they touch
+# are rebuilt from it, so weekly and monthly reports are rollups of the
+# partials and neither depends on the size of the history. Re-predicting a
+# (SKU, Date) replaces its old values instead of being skipped or counted
+# twice. Keying on the ISO year keeps early-January days out of the
+# previous year's week 52.
+
+import pandas as pd
+
+from src.etl.load import DEFAULT_DATABASE, SkuDateStore, _quote
+
+PARTIALS_TABLE = "prediction_partials"
+PREDICTIONS_TABLE = "predictions"
+
+# Daily columns the partials are built from
+PREDICTION_COLUMNS = ["SKU", "Date", "Restock Indicator", "Restock Date (days)", "Restock Quantity",
+                      "Predicted Costs", "Product type"]
+
+_ROLLUP = """
+    SUM(restock_indicator_sum) AS "Restock Indicator",
+    SUM(restock_days_sum) / SUM(restock_days_count) AS "Restock Date (days)",
+    SUM(restock_quantity_sum) AS "Restock Quantity",
+    SUM(predicted_costs_sum) AS "Predicted Costs",
+    MIN(first_date) AS first_date,
+    product_type AS "Product type"
+"""
+
+
+class PredictionAggregates:
+    """
+    Weekly and monthly prediction aggregates kept in a SkuDateStore database.
+
+    The daily rows are kept in the predictions table, so passing the same
+    predictions twice does not count them twice and re-predicted days
+    replace their previous values.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        self.connection = store.connection
+        self.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {PARTIALS_TABLE} ("
+            "iso_year INTEGER, week INTEGER, year INTEGER, month INTEGER, \"SKU\" TEXT, "
+            "restock_indicator_sum INTEGER, restock_days_sum REAL, restock_days_count INTEGER, "
+            "restock_quantity_sum INTEGER, predicted_costs_sum REAL, first_date TEXT, product_type TEXT, "
+            "PRIMARY KEY (iso_year, week, year, month, \"SKU\")) WITHOUT ROWID")
+
+    # 1. Incremental Updates
+    def add(self, predictions):
+        """
+        Upsert daily predictions and rebuild the partials of every week they touch.
+        Returns the number of daily rows merged.
+        """
+        predictions = predictions[PREDICTION_COLUMNS].copy()
+        predictions["Date"] = pd.to_datetime(predictions["Date"])
+        predictions["SKU"] = predictions["SKU"].astype(str)
+        if predictions.empty:
+            return 0
+        self.store.upsert(PREDICTIONS_TABLE, predictions)
+
+        # Whole ISO weeks (Monday to Sunday) around each SKU's new rows
+        weekday = predictions["Date"].dt.weekday
+        spans = pd.DataFrame({
+            "SKU": predictions["SKU"],
+            "start": predictions["Date"] - pd.to_timedelta(weekday, unit="D"),
+            "end": predictions["Date"] + pd.to_timedelta(6 - weekday, unit="D"),
+        }).groupby("SKU").agg(start=("start", "min"), end=("end", "max")).reset_index()
+        for column in ("start", "end"):
+            spans[column] = spans[column].dt.strftime("%Y-%m-%d")
+
+        # Join through a temporary table rather than binding one variable per SKU
+        with self.connection:
+            self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS partial_spans "
+                                    "(\"SKU\" TEXT PRIMARY KEY, start TEXT, \"end\" TEXT)")
+            self.connection.execute("DELETE FROM partial_spans")
+            self.connection.executemany("INSERT INTO partial_spans VALUES (?, ?, ?)",
+                                        spans.itertuples(index=False, name=None))
+        columns = ", ".join(f"p.{_quote(column)}" for column in PREDICTION_COLUMNS)
+        daily = pd.read_sql_query(
+            f"SELECT {columns} FROM {PREDICTIONS_TABLE} AS p JOIN partial_spans AS s "
+            "ON p.\"SKU\" = s.\"SKU\" AND p.\"Date\" BETWEEN s.start AND s.\"end\"", self.connection)
+        daily["Date"] = pd.to_datetime(daily["Date"])
+
+        iso = daily["Date"].dt.isocalendar()
+        daily["iso_year"] = iso["year"].astype("int64")
+        daily["week"] = iso["week"].astype("int64")
+        daily["year"] = daily["Date"].dt.year
+        daily["month"] = daily["Date"].dt.month
+        daily = daily.sort_values("Date", kind="stable")
+
+        partials = daily.groupby(["iso_year", "week", "year", "month", "SKU"], sort=False, observed=True).agg(
+            restock_indicator_sum=("Restock Indicator", "sum"),
+            restock_days_sum=("Restock Date (days)", "sum"),
+            restock_days_count=("Restock Date (days)", "count"),
+            restock_quantity_sum=("Restock Quantity", "sum"),
+            predicted_costs_sum=("Predicted Costs", "sum"),
+            first_date=("Date", "first"),
+            product_type=("Product type", "first"),
+        ).reset_index()
+        partials["first_date"] = partials["first_date"].dt.strftime("%Y-%m-%d")
+
+        # The rebuilt partials cover whole weeks, so they replace the stored ones
+        columns = list(partials.columns)
+        with self.connection:
+            self.connection.executemany(
+                f"INSERT OR REPLACE INTO {PARTIALS_TABLE} ({', '.join(_quote(column) for column in columns)}) "
+                f"VALUES ({', '.join('?' for _ in columns)})",
+                partials.astype(object).itertuples(index=False, name=None))
+        return len(predictions)
+
+    # 2. Rollups
+    def _rollup(self, keys, names, skus=None, start=None, end=None):
+        sql = f"SELECT {', '.join(keys)}, \"SKU\", {_ROLLUP} FROM {PARTIALS_TABLE}"
+        conditions, params = [], []
+        if skus is not None:
+            # Like add(), join through a temporary table rather than binding one variable per SKU
+            with self.connection:
+                self.connection.execute("CREATE TEMP TABLE IF NOT EXISTS rollup_skus (\"SKU\" TEXT PRIMARY KEY)")
+                self.connection.execute("DELETE FROM rollup_skus")
+                self.connection.executemany("INSERT OR IGNORE INTO rollup_skus VALUES (?)",
+                                            ((str(sku),) for sku in skus))
+            conditions.append("\"SKU\" IN (SELECT \"SKU\" FROM rollup_skus)")
+        # A partial lies within one week and one month, so its first date places it
+        if start is not None:
+            conditions.append("first_date >= ?")
+            params.append(f"{pd.Timestamp(start):%Y-%m-%d}")
+        if end is not None:
+            conditions.append("first_date <= ?")
+            params.append(f"{pd.Timestamp(end):%Y-%m-%d}")
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        # The bare product_type comes from the row with MIN(first_date)
+        sql += f" GROUP BY {', '.join(keys)}, \"SKU\" ORDER BY {', '.join(keys)}, \"SKU\""
+        frame = pd.read_sql_query(sql, self.connection, params=params)
+        return frame.drop(columns="first_date").rename(columns=dict(zip(keys, names)))
+
+    def weekly(self, skus=None, start=None, end=None):
+        """
+        Weekly predictions per (ISO Year, Week, SKU), as in weekly_predictions.csv,
+        optionally only over the days from `start` to `end`.
+        """
+        return self._rollup(["iso_year", "week"], ["ISO Year", "Week"], skus, start, end)
+
+    def monthly(self, skus=None, start=None, end=None):
+        """
+        Monthly predictions per (Year, Month, SKU), optionally only over the days from `start` to `end`.
+        """
+        return self._rollup(["year", "month"], ["Year", "Month"], skus, start, end)
+
+
+def main():
+    from src.utils.config import load_config
+
+    # Rebuild the partials from whatever the store holds and print the weekly report
+    with SkuDateStore(load_config().get("load", {}).get("database", DEFAULT_DATABASE)) as store:
+        aggregates = PredictionAggregates(store)
+        if store.columns(PREDICTIONS_TABLE):
+            predictions = pd.read_sql_query(f'SELECT * FROM "{PREDICTIONS_TABLE}"', store.connection)
+            print(f"Merged {aggregates.add(predictions)} daily predictions")
+        print(aggregates.weekly())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+# extract.py
+#
+# Typed ingest of the raw and processed datasets. Every dataset is read with
+# an explicit schema instead of pandas' default object/int64/float64
+# inference: categoricals for the low-cardinality text columns, the
+# narrowest nullable integer type that fits the column's domain, float32 for
+# values that are only meaningful to a few decimals and real datetimes for Date.
+
+import sys
+
+import pandas as pd
+
+from src.utils.config import load_config, resolve_path
+
+# 1. Column Schema
+CATEGORICAL_COLUMNS = ["Product type", "SKU", "Customer demographics", "Shipping carriers",
+                       "Supplier name", "Location", "Inspection results",
+                       "Transportation modes", "Routes", "Season"]
+
+DATETIME_COLUMNS = ["Date"]
+
+# Nullable (pandas' capitalized) integers, so a missing count reads as <NA>
+# instead of failing the whole cast
+INTEGER_COLUMNS = {
+    "Availability": "Int16",
+    "Number of products sold": "Int32",
+    "Stock levels": "Int32",
+    "Lead times": "Int16",
+    "Lead time": "Int16",
+    "Order quantities": "Int32",
+    "Shipping times": "Int16",
+    "Production volumes": "Int32",
+    "Manufacturing lead time": "Int16",
+    "Daily Sales": "Int32",
+    "Stock Level": "Int32",
+    "Day of the Week": "Int8",
+    "Restock Indicator": "Int8",
+    "Restock Date (days)": "Int16",
+    "Restock Quantity": "Int32",
+    "Week": "Int8",
+}
+
+# Prices, costs and rates that the generators round to cents (or thousandths)
+# keep every significant digit in float32; everything else stays float64
+FLOAT32_COLUMNS = ["Price", "Revenue generated", "Revenue Generated", "Shipping costs", "Manufacturing costs",
+                   "Costs", "Defect rates", "Predicted Costs", "Lag_1_Day_Sales", "Lag_7_Day_Sales"]
+
+UNROUNDED_FLOATS = {column: "float64" for column in ["Price", "Revenue generated", "Shipping costs",
+                                                     "Manufacturing costs", "Costs", "Defect rates"]}
+
+# Per-dataset deviations from the column schema above
+DATASET_OVERRIDES = {
+    # The original Kaggle extract keeps full float precision
+    "supply_chain": UNROUNDED_FLOATS,
+    # Capping turns counts into floats and log1p turns revenue and stock into logs
+    "cleaned_catalog": {"Number of products sold": "float64", "Revenue generated": "float64",
+                        "Stock levels": "float64"},
+    # Uniform draws are not rounded
+    "simulated": UNROUNDED_FLOATS,
+    "daily_series": {"Stock Level": "float64"},
+    "weekly_predictions": {"Restock Indicator": "Int16", "Restock Date (days)": "float32",
+                           "Week": "Int8"},
+}
+
+DEFAULT_DATASETS = {
+    "supply_chain": "data/raw/supply_chain_data.csv",
+    "catalog": "data/synthetic/improved_dataset.csv",
+    "cleaned_catalog": "data/processed/cleaned_improved_dataset.csv",
+    "simulated": "data/processed/simulated_data.csv",
+    "daily_series": "daily_time_series_data.csv",
+    "enhanced_daily_series": "data/processed/enhanced_daily_time_series_data.csv",
+    "daily_predictions": "data/processed/daily_predictions.csv",
+    "weekly_predictions": "data/processed/weekly_predictions.csv",
+}
+
+# Datasets written by another step, read from that step's configured output
+# once it exists and from the tracked DEFAULT_DATASETS copy until then
+CONFIGURED_DATASETS = {
+    "cleaned_catalog": ("outliers", "output_path"),
+}
+
+# Command that writes each configured dataset
+PRODUCING_COMMANDS = {
+    "cleaned_catalog": "python -m src clean",
+}
+
+
+def column_dtype(column, dataset=None):
+    """
+    Declared dtype of `column` ("category", "datetime", an int/float width), or None if unknown.
+    """
+    override = DATASET_OVERRIDES.get(dataset, {}).get(column)
+    if override:
+        return override
+    if column in CATEGORICAL_COLUMNS:
+        return "category"
+    if column in DATETIME_COLUMNS:
+        return "datetime"
+    if column in INTEGER_COLUMNS:
+        return INTEGER_COLUMNS[column]
+    if column in FLOAT32_COLUMNS:
+        return "float32"
+    return None
+
+
+def dataset_schema(columns, dataset=None):
+    return {column: column_dtype(column, dataset) for column in columns}
+
+
+# 2. Typed CSV Readers
+def read_typed_csv(file_path, dataset=None, columns=None, chunksize=None):
+    """
+    Read a CSV with the declared schema, optionally only `columns` and in chunks.
+
+    Columns without a declared type are left to pandas' inference.
+    """
+    header = pd.read_csv(file_path, nrows=0).columns
+    usecols = [column for column in header if columns is None or column in columns]
+    schema = dataset_schema(usecols, dataset)
+
+    dtypes = {column: dtype for column, dtype in schema.items() if dtype not in (None, "datetime")}
+    parse_dates = [column for column, dtype in schema.items() if dtype == "datetime"]
+    return pd.read_csv(file_path, usecols=usecols, dtype=dtypes, parse_dates=parse_dates,
+                       date_format="%Y-%m-%d", chunksize=chunksize)
+
+
+def read_typed_parquet(file_path, dataset=None, columns=None, chunksize=None):
+    """
+    Read a Parquet file with the declared schema, optionally only `columns` and in chunks.
+    """
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(file_path)
+    usecols = [column for column in parquet_file.schema_arrow.names if columns is None or column in columns]
+    dtypes = {column: "datetime64[ns]" if dtype == "datetime" else dtype
+              for column, dtype in dataset_schema(usecols, dataset).items() if dtype is not None}
+    if chunksize is None:
+        return parquet_file.read(columns=usecols).to_pandas().astype(dtypes)
+    return (batch.to_pandas().astype(dtypes)
+            for batch in parquet_file.iter_batches(batch_size=chunksize, columns=usecols))
+
+
+def available_path(path, dataset):
+    """
+    `path` resolved when it exists, else the tracked DEFAULT_DATASETS copy of
+    `dataset`, with a note on stderr naming the command that writes `path`.
+    """
+    path = resolve_path(path)
+    fallback = resolve_path(DEFAULT_DATASETS[dataset])
+    if path.exists() or path == fallback:
+        return path
+    print(f"{path} has not been written yet, reading {fallback} instead; run `{PRODUCING_COMMANDS[dataset]}` "
+          f"to create it", file=sys.stderr)
+    return fallback
+
+
+def dataset_path(dataset):
+    """
+    Path of one of the known datasets: the configured output of the step that
+    writes it (see CONFIGURED_DATASETS) once it exists, else its DEFAULT_DATASETS path.
+    """
+    if dataset in CONFIGURED_DATASETS:
+        section, key = CONFIGURED_DATASETS[dataset]
+        configured = load_config().get(section, {}).get(key)
+        if configured:
+            return available_path(configured, dataset)
+    return resolve_path(DEFAULT_DATASETS[dataset])
+
+
+def extract(dataset, file_path=None, columns=None, chunksize=None):
+    """
+    Read one of the known datasets (see DEFAULT_DATASETS) with its schema.
+    """
+    file_path = resolve_path(file_path or dataset_path(dataset))
+    reader = read_typed_parquet if file_path.suffix == ".parquet" else read_typed_csv
+    return reader(file_path, dataset=dataset, columns=columns, chunksize=chunksize)
+
+
+# 3. Parquet Reader
+def read_parquet(file_path, columns=None, filters=None):
+    """
+    Read an ingested Parquet file, pushing column projection and row filters
+    such as [("SKU", "==", "SKU35"), ("Date", ">=", pd.Timestamp("2024-10-01"))]
+    down to the row-group statistics.
+    """
+    return pd.read_parquet(file_path, columns=columns, filters=filters)
@@ -0,0 +1,214 @@
+# features.py
+#
+# Per-SKU time-series features for the daily series: the day of the week,
+# lags, rolling means and standard deviations and EWMAs of a value column
+# (Daily Sales by default). Every feature of a row only uses the days
+# before it, and missing history is filled with 0 as the original
+# enhanced_daily_time_series_data.csv did.
+#
+# The engine keeps a small state per SKU: a ring buffer of its last few
+# values, the number of days seen, the last Date and the running EWMAs.
+# Appending new days only reads that state and the new rows, and a batch
+# computation is simply an update of an empty engine, so both modes go
+# through the same arithmetic and give identical features.
+
+import json
+
+import numpy as np
+import pandas as pd
+
+from src.utils.config import load_config, resolve_path
+
+DEFAULT_FEATURES = {
+    "column": "Daily Sales",
+    "name": "Sales",
+    "lags": [1, 7],
+    "windows": [7],
+    "spans": [7],
+}
+
+
+class FeatureEngine:
+    """
+    Lag, rolling and EWMA features of `column`, computed per SKU.
+
+    Lags are the value k rows earlier, rolling statistics cover the `w`
+    previous rows (sample standard deviation) and EWMAs use
+    alpha = 2 / (span + 1) without bias adjustment, as of the previous row.
+    Rows are consecutive days: every update must only contain Dates after
+    the last one seen for the SKU.
+    """
+
+    def __init__(self, column="Daily Sales", name="Sales", lags=(1, 7), windows=(7,), spans=(7,)):
+        self.column = column
+        self.name = name
+        self.lags = [int(lag) for lag in lags]
+        self.windows = [int(window) for window in windows]
+        self.spans = [int(span) for span in spans]
+        # The ring buffer holds enough values for the longest lag or window
+        self.depth = max(self.lags + self.windows + [1])
+
+        self.skus_ = []
+        self._slots = {}
+        self.ring_ = np.zeros((0, self.depth), dtype=np.float64)
+        self.seen_ = np.zeros(0, dtype=np.int64)
+        self.last_date_ = np.zeros(0, dtype="datetime64[D]")
+        self.ewma_ = np.zeros((0, len(self.spans)), dtype=np.float64)
+
+    @property
+    def feature_names(self):
+        return (["Day of the Week"]
+                + [f"Lag_{lag}_Day_{self.name}" for lag in self.lags]
+                + [f"Rolling_{window}_Day_{stat}_{self.name}" for window in self.windows for stat in ("Mean", "Std")]
+                + [f"EWMA_{span}_Day_{self.name}" for span in self.spans])
+
+    def last_dates(self):
+        """
+        Last Date seen for every SKU, as a dict of SKU -> "YYYY-MM-DD".
+        """
+        return {sku: str(date) for sku, date in zip(self.skus_, self.last_date_)}
+
+    # 1. State
+    def _slot_indices(self, skus):
+        """
+        State rows of `skus`, adding empty state for SKUs not seen before.
+        """
+        new = [sku for sku in pd.unique(skus) if sku not in self._slots]
+        if new:
+            for sku in new:
+                self._slots[sku] = len(self.skus_)
+                self.skus_.append(sku)
+            self.ring_ = np.vstack([self.ring_, np.zeros((len(new), self.depth))])
+            self.seen_ = np.concatenate([self.seen_, np.zeros(len(new), dtype=np.int64)])
+            self.last_date_ = np.concatenate([self.last_date_, np.full(len(new), "NaT", dtype="datetime64[D]")])
+            self.ewma_ = np.vstack([self.ewma_, np.zeros((len(new), len(self.spans)))])
+        return np.array([self._slots[sku] for sku in skus], dtype=np.int64)
+
+    # 2. Update
+    def update(self, frame):
+        """
+        Features for the rows of `frame`, advancing the per-SKU state.
+
+        Returns `frame` sorted by SKU and Date with the feature columns added.
+        """
+        frame = frame.copy()
+        frame["Date"] = pd.to_datetime(frame["Date"])
+        frame = frame.sort_values(["SKU", "Date"], kind="stable").reset_index(drop=True)
+        frame["Day of the Week"] = frame["Date"].dt.dayofweek
+        if frame.empty:
+            for name in self.feature_names[1:]:
+                frame[name] = np.zeros(0)
+            return frame
+
+        skus = frame["SKU"].astype(str).to_numpy()
+        values = frame[self.column].to_numpy(dtype=np.float64)
+        dates = frame["Date"].to_numpy().astype("datetime64[D]")
+
+        # Group boundaries of the sorted rows
+        starts = np.flatnonzero(np.r_[True, skus[1:] != skus[:-1]])
+        counts = np.diff(np.r_[starts, len(skus)])
+        slots = self._slot_indices(skus[starts])
+        rank = np.arange(len(skus)) - np.repeat(starts, counts)
+
+        last_dates = self.last_date_[slots]
+        stale = ~np.isnat(last_dates) & (dates[starts] <= last_dates)
+        if stale.any():
+            raise ValueError(f"Rows for {skus[starts][stale][0]} are not after its last processed date "
+                             f"{last_dates[stale][0]}")
+
+        # Prepend each SKU's buffered history to its new rows, so that every
+        # lag and window is a fixed offset into one contiguous array
+        seen = self.seen_[slots]
+        history = np.minimum(seen, self.depth)
+        offsets = np.r_[0, np.cumsum(history + counts)[:-1]]
+        combined = np.empty(history.sum() + len(values))
+
+        history_rank = np.arange(history.sum()) - np.repeat(np.r_[0, np.cumsum(history)[:-1]], history)
+        history_position = np.repeat(seen - history, history) + history_rank
+        combined[np.repeat(offsets, history) + history_rank] = \
+            self.ring_[np.repeat(slots, history), history_position % self.depth]
+        rows = np.repeat(offsets + history, counts) + rank
+        combined[rows] = values
+        # Days already seen before each new row
+        position = np.repeat(seen, counts) + rank
+
+        for lag in self.lags:
+            valid = position >= lag
+            frame[f"Lag_{lag}_Day_{self.name}"] = np.where(valid, combined[np.where(valid, rows - lag, 0)], 0.0)
+
+        for window in self.windows:
+            n = np.minimum(position, window).astype(np.float64)
+            total = np.zeros(len(rows))
+            for lag in range(1, window + 1):
+                total += np.where(position >= lag, combined[np.maximum(rows - lag, 0)], 0.0)
+            mean = np.divide(total, n, out=np.zeros(len(rows)), where=n > 0)
+            squares = np.zeros(len(rows))
+            for lag in range(1, window + 1):
+                squares += np.where(position >= lag, (combined[np.maximum(rows - lag, 0)] - mean) ** 2, 0.0)
+            frame[f"Rolling_{window}_Day_Mean_{self.name}"] = mean
+            frame[f"Rolling_{window}_Day_Std_{self.name}"] = np.sqrt(
+                np.divide(squares, n - 1, out=np.zeros(len(rows)), where=n > 1))
+
+        # EWMAs are a recurrence along each SKU: advance all SKUs one row per round
+        ewma = self.ewma_[slots].copy()
+        ewma_features = np.zeros((len(rows), len(self.spans)))
+        alpha = 2.0 / (np.array(self.spans, dtype=np.float64) + 1.0)
+        for step in range(counts.max()):
+            active = np.flatnonzero(counts > step)
+            index = starts[active] + step
+            first = (seen[active] + step) == 0
+            ewma_features[index] = np.where(first[:, None], 0.0, ewma[active])
+            x = values[index][:, None]
+            ewma[active] = np.where(first[:, None], x, alpha * x + (1.0 - alpha) * ewma[active])
+        for i, span in enumerate(self.spans):
+            frame[f"EWMA_{span}_Day_{self.name}"] = ewma_features[:, i]
+
+        # Only the last `depth` values of every SKU go into its ring buffer
+        keep = rank >= np.repeat(counts, counts) - self.depth
+        self.ring_[np.repeat(slots, counts)[keep], position[keep] % self.depth] = values[keep]
+        self.seen_[slots] = seen + counts
+        self.last_date_[slots] = dates[starts + counts - 1]
+        self.ewma_[slots] = ewma
+        return frame
+
+    # 3. Serialization
+    def save(self, path):
+        state = {"column": self.column, "name": self.name, "lags": self.lags, "windows": self.windows,
+                 "spans": self.spans}
+        with open(path, "wb") as f:
+            np.savez(f, config=json.dumps(state), skus=np.array(self.skus_, dtype=str), ring=self.ring_,
+                     seen=self.seen_, last_date=self.last_date_, ewma=self.ewma_)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as state:
+            engine = cls(**json.loads(str(state["config"])))
+            engine.skus_ = state["skus"].tolist()
+            engine._slots = {sku: i for i, sku in enumerate(engine.skus_)}
+            engine.ring_ = state["ring"]
+            engine.seen_ = state["seen"]
+            engine.last_date_ = state["last_date"]
+            engine.ewma_ = state["ewma"]
+        return engine
+
+
+def compute_features(frame, **params):
+    """
+    Batch features for a whole daily series (see FeatureEngine for `params`).
+    """
+    return FeatureEngine(**params).update(frame)
+
+
+def main():
+    config = {**DEFAULT_FEATURES, **load_config().get("features", {})}
+    input_path = resolve_path(config.pop("input_path", "daily_time_series_data_cleaned.csv"))
+    output_path = resolve_path(config.pop("output_path", "data/processed/enhanced_daily_time_series_data.csv"))
+
+    enhanced = compute_features(pd.read_csv(input_path), **config)
+    enhanced.to_csv(output_path, index=False)
+    print(f"Wrote {len(enhanced)} rows with {len(config['lags'])} lags, {len(config['windows'])} windows "
+          f"and {len(config['spans'])} EWMAs to {output_path}")
+
+
+if __name__ == '__main__':
+    main()
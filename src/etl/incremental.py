@@ -0,0 +1,303 @@
+# incremental.py
+#
+# Task callables for the incremental ETL DAG in airflow/dags/etl_dag.py:
+#
+#   extract -> fix_outliers -> daily_series -> features -> predictions
+#                                           \-> anomalies
+#
+# Every task records a high-water mark in the SkuDateStore: the catalog
+# tasks remember a fingerprint of their input file and the dated tasks
+# remember the last processed Date per SKU. A run only processes what lies
+# beyond the marks, and the marks are moved forward only after the outputs
+# are written. Outputs are date-partitioned files named after the task and
+# the range they cover plus upserts keyed on (SKU, Date), so rerunning a
+# task after a failure overwrites exactly what it wrote before and never
+# touches older partitions.
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.etl.aggregates import PredictionAggregates
+from src.etl.extract import extract
+from src.etl.features import DEFAULT_FEATURES, FeatureEngine
+from src.etl.load import DEFAULT_DATABASE, SkuDateStore
+from src.etl.transform import write_parquet
+from src.models.anomaly_detection import DEFAULT_ANOMALIES, AnomalyDetector
+from src.utils.config import load_config, resolve_path
+from src.utils.instrumentation import instrumented
+
+DEFAULT_PIPELINE = {
+    "root": "data/pipeline",
+    "catalog_source": "data/synthetic/improved_dataset.csv",
+    "start_date": "2024-01-01",
+    "seed": 42,
+    "model_cache_dir": ".model_cache",
+}
+
+INITIAL_STOCK = 1000000
+
+
+# 1. Helpers
+def pipeline_config(config=None):
+    config = config or load_config()
+    settings = {**DEFAULT_PIPELINE, **config.get("pipeline", {})}
+    settings["root"] = resolve_path(settings["root"])
+    settings["database"] = config.get("load", {}).get("database", DEFAULT_DATABASE)
+    settings["outliers"] = config.get("outliers", {})
+    features = {**DEFAULT_FEATURES, **config.get("features", {})}
+    settings["features"] = {key: features[key] for key in DEFAULT_FEATURES}
+    anomalies = {**DEFAULT_ANOMALIES, **config.get("anomalies", {})}
+    settings["anomalies"] = {key: anomalies[key] for key in DEFAULT_ANOMALIES}
+    return settings
+
+
+def _fingerprint(path):
+    stat = os.stat(path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+
+def _replace_file(write, output_path):
+    """
+    Call write(staging_path) and atomically move the result to `output_path`.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    staging_path = output_path.with_name(f".{output_path.name}.tmp")
+    write(staging_path)
+    os.replace(staging_path, output_path)
+    return output_path
+
+
+def _write_dated(frame, output_dir, task, start, end):
+    from src.utils.data_sim import write_partitioned
+
+    # One file per (task, range) in every date partition: a rerun of the same
+    # range replaces it, other runs' files in the partition are left alone
+    frame = frame.sort_values(["Date", "SKU"], kind="stable")
+    prefix = f"{task}-{start:%Y%m%d}-{end:%Y%m%d}"
+    return write_partitioned([frame], output_dir, prefix=prefix)
+
+
+def _sku_filter(skus, every_sku):
+    """
+    `skus` for a date_range query, or None when they are all of `every_sku`.
+    """
+    return None if len(skus) == len(every_sku) else skus
+
+
+def _pending_ranges(done, available, default_start, skus):
+    """
+    Group SKUs by the (first, last) date range each one still has to process.
+
+    `done` maps SKU -> last processed date of this task and `available` the
+    last date that is ready upstream (a Timestamp for every SKU, or a mapping).
+    """
+    ranges = {}
+    for sku in skus:
+        last_done = done.get(sku)
+        first = pd.Timestamp(last_done) + pd.Timedelta(days=1) if last_done else pd.Timestamp(default_start)
+        last = pd.Timestamp(available.get(sku) if isinstance(available, dict) else available)
+        if pd.isna(last) or first > last:
+            continue
+        ranges.setdefault((first, last), []).append(sku)
+    return ranges
+
+
+# 2. Catalog Tasks
+@instrumented()
+def run_extract(ds=None, config=None):
+    """
+    Ingest the product catalog into typed Parquet when the source file changed.
+    """
+    settings = pipeline_config(config)
+    source = resolve_path(settings["catalog_source"])
+    output_path = settings["root"] / "catalog.parquet"
+
+    with SkuDateStore(settings["database"]) as store:
+        fingerprint = _fingerprint(source)
+        if store.watermarks("extract").get("source") == fingerprint and output_path.exists():
+            return 0
+        _replace_file(lambda path: write_parquet(extract("catalog", source, chunksize=1000000), path,
+                                                 dataset="catalog"), output_path)
+        store.set_watermarks("extract", {"source": fingerprint})
+    return 1
+
+
+@instrumented()
+def run_fix_outliers(ds=None, config=None):
+    """
+    Clean the ingested catalog when it changed since the last run.
+    """
+    from src.utils.fix_outliers import fix_outliers
+
+    settings = pipeline_config(config)
+    outliers = settings["outliers"]
+    input_path = settings["root"] / "catalog.parquet"
+    output_path = settings["root"] / "cleaned_catalog.parquet"
+
+    with SkuDateStore(settings["database"]) as store:
+        fingerprint = _fingerprint(input_path)
+        if store.watermarks("fix_outliers").get("source") == fingerprint and output_path.exists():
+            return 0
+        _replace_file(lambda path: fix_outliers(
+            input_path, path, outliers.get("columns", []), threshold=outliers.get("threshold", 3),
+            log_columns=outliers.get("log_columns", []), drop_columns=outliers.get("drop_columns", []),
+            chunksize=outliers.get("chunksize", 100000)), output_path)
+        store.set_watermarks("fix_outliers", {"source": fingerprint})
+    return 1
+
+
+# 3. Dated Tasks
+@instrumented(rows=int)
+def run_daily_series(ds, config=None):
+    """
+    Extend every SKU's daily series from its watermark up to `ds`.
+
+    Stock levels continue from the last stored level, and the random draws
+    of every day are seeded from its Date, so a rerun reproduces them and a
+    backfill over several days matches running the days one at a time.
+    """
+    from src.utils.daily_timeseries_dataset import generate_daily_series
+
+    settings = pipeline_config(config)
+    catalog = pd.read_parquet(settings["root"] / "cleaned_catalog.parquet").drop_duplicates(subset=["SKU"])
+    catalog["SKU"] = catalog["SKU"].astype(str)
+    rows = 0
+
+    with SkuDateStore(settings["database"]) as store:
+        done = store.watermarks("daily_series")
+        ranges = _pending_ranges(done, pd.Timestamp(ds), settings["start_date"], catalog["SKU"])
+        for (first, last), skus in ranges.items():
+            products = catalog[catalog["SKU"].isin(skus)]
+
+            # Continue from the last stored stock level of SKUs seen before
+            stock = pd.Series(INITIAL_STOCK, index=products["SKU"].to_numpy(), dtype=np.float64)
+            seen = [sku for sku in skus if sku in done]
+            if seen:
+                previous = store.date_range("daily_series", first - pd.Timedelta(days=1),
+                                            first - pd.Timedelta(days=1), skus=_sku_filter(seen, done),
+                                            columns=["SKU", "Stock Level"])
+                stock.update(previous.set_index("SKU")["Stock Level"])
+
+            days, stock = [], stock.to_numpy()
+            for day in pd.date_range(first, last):
+                seed = np.random.SeedSequence([settings["seed"], day.toordinal()])
+                day_df = generate_daily_series(products, start_date=day, n_days=1, initial_stock=stock, seed=seed)
+                stock = day_df["Stock Level"].to_numpy(dtype=np.float64)
+                days.append(day_df)
+            daily_df = pd.concat(days, ignore_index=True)
+            daily_df["SKU"] = daily_df["SKU"].astype(str)
+
+            _write_dated(daily_df, settings["root"] / "daily_series", "daily_series", first, last)
+            store.upsert("daily_series", daily_df)
+            store.set_watermarks("daily_series", {sku: f"{last:%Y-%m-%d}" for sku in skus})
+            rows += len(daily_df)
+    return rows
+
+
+@instrumented(rows=int)
+def run_features(ds, config=None):
+    """
+    Build features for the daily rows past the feature engine's state.
+
+    The engine state is saved after the outputs are written and is the
+    record of what has been processed; the "features" watermarks mirror it
+    for the downstream task.
+    """
+    settings = pipeline_config(config)
+    state_path = settings["root"] / "feature_state.npz"
+    engine = FeatureEngine.load(state_path) if state_path.exists() else FeatureEngine(**settings["features"])
+    rows = 0
+
+    with SkuDateStore(settings["database"]) as store:
+        available = store.watermarks("daily_series")
+        ranges = _pending_ranges(engine.last_dates(), available, settings["start_date"], list(available))
+        for (first, last), skus in ranges.items():
+            features = engine.update(store.date_range("daily_series", first, last,
+                                                      skus=_sku_filter(skus, available)))
+            _write_dated(features, settings["root"] / "features", "features", first, last)
+            store.upsert("features", features)
+            rows += len(features)
+
+        if ranges:
+            _replace_file(engine.save, state_path)
+        store.set_watermarks("features", engine.last_dates())
+    return rows
+
+
+@instrumented(rows=int)
+def run_anomalies(ds, config=None):
+    """
+    Score the daily rows past the anomaly detector's state and store the
+    z-scores and flags per (SKU, Date).
+
+    Like the feature engine, the saved detector state is the record of
+    what has been processed and the "anomalies" watermarks mirror it.
+    """
+    settings = pipeline_config(config)
+    state_path = settings["root"] / "anomaly_state.npz"
+    detector = AnomalyDetector.load(state_path) if state_path.exists() else AnomalyDetector(**settings["anomalies"])
+    rows = 0
+
+    with SkuDateStore(settings["database"]) as store:
+        available = store.watermarks("daily_series")
+        ranges = _pending_ranges(detector.last_dates(), available, settings["start_date"], list(available))
+        for (first, last), skus in ranges.items():
+            daily_df = store.date_range("daily_series", first, last, skus=_sku_filter(skus, available),
+                                        columns=["SKU", "Date"] + detector.columns)
+            scored = detector.update(daily_df).drop(columns=detector.columns)
+            _write_dated(scored, settings["root"] / "anomalies", "anomalies", first, last)
+            store.upsert("anomalies", scored)
+            rows += len(scored)
+
+        if ranges:
+            _replace_file(detector.save, state_path)
+        store.set_watermarks("anomalies", detector.last_dates())
+    return rows
+
+
+@instrumented(rows=int)
+def run_predictions(ds, config=None):
+    """
+    Predict restock metrics for every (Date, SKU) past each SKU's prediction watermark
+    and merge them into the weekly and monthly aggregates.
+    """
+    from src.models.model_cache import ModelCache
+    from src.utils.data_sim import generate_training_data, predict_horizon, prepare_training_data, train_model
+
+    settings = pipeline_config(config)
+    catalog = pd.read_parquet(settings["root"] / "catalog.parquet").drop_duplicates(subset=["SKU"])
+    catalog["SKU"] = catalog["SKU"].astype(str)
+    rows = 0
+
+    with SkuDateStore(settings["database"]) as store:
+        available = store.watermarks("features")
+        done = store.watermarks("predictions")
+        ranges = _pending_ranges(done, available, settings["start_date"], list(available))
+        if not ranges:
+            return 0
+
+        # The seeded training set makes the cache key stable across runs; the
+        # forest is served from its memory-mapped compact export
+        training_data = generate_training_data(seed=settings["seed"])
+        X, y, encoder = prepare_training_data(training_data)
+        model, _ = ModelCache(resolve_path(settings["model_cache_dir"])).get_or_fit(
+            training_data, encoder, {"backend": "forest"}, lambda: train_model(X, y, backend="forest"), compact=True)
+
+        aggregates = PredictionAggregates(store)
+        for (first, last), skus in ranges.items():
+            # Product attributes come from the catalog, one row per new (Date, SKU)
+            new_rows = store.date_range("features", first, last, skus=_sku_filter(skus, available),
+                                        columns=["SKU", "Date"])
+            prediction_data = new_rows.merge(catalog, on="SKU")
+            predictions = predict_horizon(prediction_data, model, encoder)
+
+            _write_dated(predictions, settings["root"] / "predictions", "predictions", first, last)
+            # Upserts the daily rows into the predictions table as well
+            aggregates.add(predictions)
+            store.set_watermarks("predictions", {sku: f"{last:%Y-%m-%d}" for sku in skus})
+            rows += len(predictions)
+    return rows
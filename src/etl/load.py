@@ -0,0 +1,207 @@
+# load.py
+#
+# Local SQLite store for the daily series, simulations and predictions.
+# Every table is keyed and clustered on (SKU, Date) (a WITHOUT ROWID table
+# stores rows in primary-key order), so one SKU's history is a single
+# contiguous range read instead of a boolean mask over the whole frame.
+
+import sqlite3
+from pathlib import Path
+
+import pandas as pd
+
+from src.etl.extract import extract
+from src.utils.config import load_config, resolve_path
+from src.utils.instrumentation import setup_stage_log, stage
+
+DEFAULT_DATABASE = "data/supplysim.db"
+
+# SKUs bound per "IN (...)" query, below SQLite's lowest default variable limit (999)
+MAX_SKU_VARIABLES = 900
+
+# Dataset (see extract.DEFAULT_DATASETS) -> table it is loaded into
+DEFAULT_TABLES = {
+    "daily_series": "daily_series",
+    "simulated": "simulations",
+    "daily_predictions": "predictions",
+}
+
+
+def _sql_type(dtype):
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return "INTEGER"
+    if pd.api.types.is_float_dtype(dtype):
+        return "REAL"
+    return "TEXT"
+
+
+def _quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+class SkuDateStore:
+    """
+    Tables of per-(SKU, Date) rows with point lookups, range queries and bulk upserts.
+
+    Dates are stored as ISO "YYYY-MM-DD" text, which sorts chronologically.
+    """
+
+    def __init__(self, path=DEFAULT_DATABASE):
+        self.path = resolve_path(path) if path != ":memory:" else path
+        if path != ":memory:":
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self.connection = sqlite3.connect(str(self.path))
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("PRAGMA synchronous=NORMAL")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    # 1. Schema
+    def columns(self, table):
+        return [row[1] for row in self.connection.execute(f"PRAGMA table_info({_quote(table)})")]
+
+    def ensure_table(self, table, frame):
+        """
+        Create `table` from the columns of `frame`, and add any new columns to an existing table.
+        """
+        existing = self.columns(table)
+        if not existing:
+            columns = ", ".join(f"{_quote(column)} {_sql_type(dtype)}" for column, dtype in frame.dtypes.items())
+            self.connection.execute(
+                f"CREATE TABLE {_quote(table)} ({columns}, PRIMARY KEY (\"SKU\", \"Date\")) WITHOUT ROWID")
+            # Secondary index for all-SKU date range queries
+            self.connection.execute(
+                f"CREATE INDEX {_quote(table + '_date')} ON {_quote(table)} (\"Date\")")
+        else:
+            for column, dtype in frame.dtypes.items():
+                if column not in existing:
+                    self.connection.execute(
+                        f"ALTER TABLE {_quote(table)} ADD COLUMN {_quote(column)} {_sql_type(dtype)}")
+
+    # 2. Bulk Upserts
+    def upsert(self, table, frame):
+        """
+        Insert the rows of `frame`, replacing rows with the same (SKU, Date).
+        Returns the number of rows written.
+        """
+        if frame.empty:
+            return 0
+        frame = frame.copy()
+        frame["Date"] = pd.to_datetime(frame["Date"]).dt.strftime("%Y-%m-%d")
+        frame["SKU"] = frame["SKU"].astype(str)
+
+        with self.connection:
+            self.ensure_table(table, frame)
+            columns = ", ".join(_quote(column) for column in frame.columns)
+            placeholders = ", ".join("?" for _ in frame.columns)
+            updates = ", ".join(f"{_quote(c)} = excluded.{_quote(c)}" for c in frame.columns if c not in ("SKU", "Date"))
+            conflict = f"DO UPDATE SET {updates}" if updates else "DO NOTHING"
+            # Column-wise conversion to Python scalars; NaN becomes NULL
+            values = [frame[column].astype(object).where(frame[column].notna(), None).tolist()
+                      for column in frame.columns]
+            self.connection.executemany(
+                f"INSERT INTO {_quote(table)} ({columns}) VALUES ({placeholders}) "
+                f"ON CONFLICT (\"SKU\", \"Date\") {conflict}",
+                zip(*values),
+            )
+        return len(frame)
+
+    # 3. Queries
+    def _query(self, sql, params):
+        frame = pd.read_sql_query(sql, self.connection, params=params)
+        if "Date" in frame.columns:
+            frame["Date"] = pd.to_datetime(frame["Date"])
+        return frame
+
+    def _select(self, columns):
+        return ", ".join(_quote(column) for column in columns) if columns else "*"
+
+    def get(self, table, sku, date, columns=None):
+        """
+        Point lookup of one (SKU, Date) row as a dict, or None.
+        """
+        frame = self._query(
+            f"SELECT {self._select(columns)} FROM {_quote(table)} WHERE \"SKU\" = ? AND \"Date\" = ?",
+            (str(sku), pd.Timestamp(date).strftime("%Y-%m-%d")))
+        return frame.iloc[0].to_dict() if len(frame) else None
+
+    def history(self, table, sku, start=None, end=None, columns=None):
+        """
+        Rows of one SKU ordered by Date, optionally limited to [start, end].
+        """
+        start = pd.Timestamp(start).strftime("%Y-%m-%d") if start is not None else "0000-00-00"
+        end = pd.Timestamp(end).strftime("%Y-%m-%d") if end is not None else "9999-99-99"
+        return self._query(
+            f"SELECT {self._select(columns)} FROM {_quote(table)} "
+            f"WHERE \"SKU\" = ? AND \"Date\" BETWEEN ? AND ? ORDER BY \"Date\"",
+            (str(sku), start, end))
+
+    def date_range(self, table, start, end, skus=None, columns=None):
+        """
+        Rows of every SKU (or of `skus`) with Date in [start, end], ordered by SKU and Date.
+        """
+        sql = (f"SELECT {self._select(columns)} FROM {_quote(table)} WHERE \"Date\" BETWEEN ? AND ?")
+        params = [pd.Timestamp(start).strftime("%Y-%m-%d"), pd.Timestamp(end).strftime("%Y-%m-%d")]
+        if skus is None:
+            return self._query(sql + " ORDER BY \"SKU\", \"Date\"", params)
+
+        # Sorted SKUs in batches of bound variables: every batch is ordered by
+        # SKU and Date and follows the previous one, so the result is too
+        skus = sorted({str(sku) for sku in skus})
+        frames = []
+        for i in range(0, max(len(skus), 1), MAX_SKU_VARIABLES):
+            batch = skus[i:i + MAX_SKU_VARIABLES]
+            frames.append(self._query(f"{sql} AND \"SKU\" IN ({', '.join('?' for _ in batch)}) "
+                                      f"ORDER BY \"SKU\", \"Date\"", params + batch))
+        return frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True)
+
+    def skus(self, table):
+        return [row[0] for row in self.connection.execute(
+            f"SELECT DISTINCT \"SKU\" FROM {_quote(table)} ORDER BY \"SKU\"")]
+
+    def last_dates(self, table):
+        """
+        Latest Date stored for every SKU, as a Series indexed by SKU.
+        """
+        frame = self._query(f"SELECT \"SKU\", MAX(\"Date\") AS \"Date\" FROM {_quote(table)} GROUP BY \"SKU\"", ())
+        return frame.set_index("SKU")["Date"]
+
+    # 4. Watermarks
+    def watermarks(self, task):
+        """
+        High-water marks recorded by `task` (usually SKU -> last processed Date), as a dict.
+        """
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks (task TEXT, key TEXT, value TEXT, PRIMARY KEY (task, key)) "
+            "WITHOUT ROWID")
+        return dict(self.connection.execute("SELECT key, value FROM watermarks WHERE task = ?", (task,)))
+
+    def set_watermarks(self, task, marks):
+        self.watermarks(task)
+        with self.connection:
+            self.connection.executemany(
+                "INSERT INTO watermarks (task, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT (task, key) DO UPDATE SET value = excluded.value",
+                ((task, str(key), str(value)) for key, value in marks.items()))
+
+
+def main():
+    setup_stage_log()
+    config = load_config().get("load", {})
+    tables = config.get("tables") or DEFAULT_TABLES
+    with SkuDateStore(config.get("database", DEFAULT_DATABASE)) as store:
+        for dataset, table in tables.items():
+            with stage(f"load_{dataset}") as record:
+                rows = record["rows"] = sum(store.upsert(table, chunk) for chunk in extract(dataset, chunksize=500000))
+            print(f"Loaded {rows} rows of {dataset} into {table}")
+
+
+if __name__ == '__main__':
+    main()
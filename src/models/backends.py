@@ -0,0 +1,88 @@
+# backends.py
+#
+# Interchangeable multi-target regressors for the inventory model, plus a
+# benchmark that compares them on the data_sim training set.
+
+import time
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import HistGradientBoostingRegressor, RandomForestRegressor
+from sklearn.metrics import mean_squared_error, r2_score
+from sklearn.model_selection import train_test_split
+from sklearn.multioutput import MultiOutputRegressor
+
+MODEL_BACKENDS = ["multioutput_forest", "forest", "hist_gradient_boosting"]
+
+
+# 1. Model Factory
+def make_model(backend="forest", n_jobs=-1, random_state=42, **params):
+    """
+    Build an unfitted multi-target regressor.
+
+    - "multioutput_forest": one RandomForestRegressor per target (the original model)
+    - "forest": a single RandomForestRegressor predicting all targets at once
+    - "hist_gradient_boosting": one HistGradientBoostingRegressor per target
+
+    `n_jobs` controls how many cores fit trees (or targets) in parallel;
+    the histogram booster is multi-threaded on its own. Extra keyword
+    arguments are passed to the underlying estimator.
+    """
+    if backend == "multioutput_forest":
+        params.setdefault("n_estimators", 100)
+        return MultiOutputRegressor(RandomForestRegressor(random_state=random_state, **params), n_jobs=n_jobs)
+    if backend == "forest":
+        params.setdefault("n_estimators", 100)
+        return RandomForestRegressor(random_state=random_state, n_jobs=n_jobs, **params)
+    if backend == "hist_gradient_boosting":
+        return MultiOutputRegressor(HistGradientBoostingRegressor(random_state=random_state, **params))
+    raise ValueError(f"Unknown model backend {backend!r}, expected one of {MODEL_BACKENDS}")
+
+
+# 2. Backend Benchmark
+def benchmark_backends(X, y, backends=None, n_jobs=-1, test_size=0.3, random_state=42):
+    """
+    Fit every backend on the same split and report fit time, predict
+    latency and accuracy as a DataFrame with one row per backend.
+    """
+    X_dense = X.toarray() if hasattr(X, "toarray") else X
+    X_train, X_test, y_train, y_test = train_test_split(X_dense, y, test_size=test_size, random_state=random_state)
+
+    results = []
+    for backend in backends or MODEL_BACKENDS:
+        model = make_model(backend, n_jobs=n_jobs, random_state=random_state)
+
+        start = time.perf_counter()
+        model.fit(X_train, y_train)
+        fit_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        y_pred = model.predict(X_test)
+        batch_seconds = time.perf_counter() - start
+
+        # Latency of a single-row request, the typical on-demand prediction
+        single_row = X_test[:1]
+        start = time.perf_counter()
+        for _ in range(20):
+            model.predict(single_row)
+        single_row_ms = (time.perf_counter() - start) / 20 * 1000
+
+        results.append({
+            "backend": backend,
+            "fit_seconds": fit_seconds,
+            "predict_seconds": batch_seconds,
+            "predict_rows_per_second": len(X_test) / batch_seconds,
+            "single_row_ms": single_row_ms,
+            "mse": mean_squared_error(y_test, y_pred),
+            "r2": r2_score(y_test, y_pred),
+        })
+
+    return pd.DataFrame(results)
+
+
+if __name__ == '__main__':
+    from src.utils.data_sim import generate_training_data, prepare_training_data
+
+    X, y, encoder = prepare_training_data(generate_training_data(seed=0))
+    with pd.option_context("display.width", 160, "display.max_columns", None):
+        print(benchmark_backends(X, np.asarray(y)))
@@ -0,0 +1,287 @@
+# compact_forest.py
+#
+# Array-backed inference format for the fitted tree ensembles: a
+# RandomForestRegressor (single or multi-target), a MultiOutputRegressor
+# of forests or a single decision tree. Every node of every tree is laid
+# out in a handful of contiguous arrays,
+#
+#   feature    int32    split feature (0 for leaves)
+#   threshold  float32  split threshold (+inf for leaves)
+#   left/right int32    global index of the children (leaves point to themselves)
+#   value      float64  node value, (n_nodes, outputs per tree)
+#   roots      int32    root node of each tree
+#
+# saved as .npy files next to a small meta.json. Loading memory-maps the
+# arrays, so serving processes share one copy through the page cache and
+# start without unpickling thousands of tree objects.
+#
+# sklearn casts X to float32 before comparing it against the float64
+# thresholds, so each threshold is stored as the largest float32 that is
+# not above it: x <= threshold32 exactly when x <= threshold for every
+# float32 x, and the routing of every sample is unchanged. Leaf values stay
+# float64; predictions only differ from sklearn by the order of the sum.
+#
+#   python -m src.models.compact_forest --n-estimators 100
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+ARRAYS = ["feature", "threshold", "left", "right", "value", "roots", "tree_output"]
+FORMAT_VERSION = 1
+
+
+def _trees(model):
+    # (tree, first output column) of every tree, grouped by output column
+    estimators = getattr(model, "estimators_", None)
+    if estimators is None and hasattr(model, "tree_"):
+        return [(model.tree_, 0)], model.n_outputs_, model.n_outputs_
+
+    if estimators and hasattr(estimators[0], "estimators_"):
+        # MultiOutputRegressor: one single-target forest per output
+        trees = []
+        for output, forest in enumerate(estimators):
+            if forest.n_outputs_ != 1:
+                raise ValueError("Expected single-target forests inside the MultiOutputRegressor")
+            trees.extend((tree.tree_, output) for tree in forest.estimators_)
+        return trees, len(estimators), 1
+
+    if estimators and hasattr(estimators[0], "tree_"):
+        return [(tree.tree_, 0) for tree in estimators], model.n_outputs_, model.n_outputs_
+    raise ValueError(f"Cannot export {type(model).__name__}: expected a fitted random forest or decision tree")
+
+
+def _round_down_float32(values):
+    # The largest float32 that is <= each float64 value
+    rounded = values.astype(np.float32)
+    above = rounded.astype(np.float64) > values
+    rounded[above] = np.nextafter(rounded[above], np.float32(-np.inf))
+    return rounded
+
+
+class CompactForest:
+    """
+    Flat array representation of a fitted tree ensemble with a vectorized predictor.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, tree_output, n_features, n_outputs,
+                 max_depth, squeeze=False):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.value = value
+        self.roots = roots
+        self.tree_output = tree_output
+        self.n_features = n_features
+        self.n_outputs = n_outputs
+        self.max_depth = max_depth
+        self.squeeze = squeeze
+
+    @classmethod
+    def from_model(cls, model):
+        """
+        Flatten a fitted RandomForestRegressor, MultiOutputRegressor of forests or DecisionTreeRegressor.
+        """
+        trees, n_outputs, width = _trees(model)
+        sizes = np.array([tree.node_count for tree, _ in trees])
+        offsets = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+
+        feature, threshold, left, right, value = [], [], [], [], []
+        for (tree, _), offset in zip(trees, offsets):
+            is_leaf = tree.children_left == -1
+            nodes = np.arange(tree.node_count)
+            feature.append(np.where(is_leaf, 0, tree.feature))
+            threshold.append(np.where(is_leaf, np.inf, tree.threshold))
+            left.append(np.where(is_leaf, nodes, tree.children_left) + offset)
+            right.append(np.where(is_leaf, nodes, tree.children_right) + offset)
+            value.append(tree.value.reshape(tree.node_count, -1)[:, :width])
+
+        return cls(
+            feature=np.concatenate(feature).astype(np.int32),
+            threshold=_round_down_float32(np.concatenate(threshold)),
+            left=np.concatenate(left).astype(np.int32),
+            right=np.concatenate(right).astype(np.int32),
+            value=np.ascontiguousarray(np.concatenate(value), dtype=np.float64),
+            roots=offsets.astype(np.int32),
+            tree_output=np.array([output for _, output in trees], dtype=np.int32),
+            n_features=int(model.n_features_in_),
+            n_outputs=int(n_outputs),
+            max_depth=int(max(tree.max_depth for tree, _ in trees)),
+            # sklearn returns 1-D predictions for single-target trees and forests
+            squeeze=n_outputs == width == 1,
+        )
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in ARRAYS)
+
+    # 1. Prediction
+    def apply(self, X):
+        """
+        Leaf index of every (sample, tree) pair for a dense float32 block.
+        """
+        n_rows, n_trees = len(X), self.n_trees
+        values = X.ravel()
+        node = np.tile(self.roots, n_rows)
+        # Only the paths that have not reached a leaf (threshold +inf) step down
+        offset = np.repeat(np.arange(n_rows) * self.n_features, n_trees)
+        active = np.flatnonzero(np.isfinite(self.threshold[node]))
+        while len(active):
+            current = node[active]
+            go_left = values[offset[active] + self.feature[current]] <= self.threshold[current]
+            current = np.where(go_left, self.left[current], self.right[current])
+            node[active] = current
+            active = active[np.isfinite(self.threshold[current])]
+        return node.reshape(n_rows, n_trees)
+
+    def predict(self, X, block_size=None):
+        """
+        Mean prediction of the trees for X (array, DataFrame or sparse matrix).
+
+        Rows are routed in blocks of `block_size` samples, by default sized
+        so one block visits about a million (sample, tree) nodes at a time.
+        """
+        n_rows = X.shape[0]
+        if X.shape[1] != self.n_features:
+            raise ValueError(f"X has {X.shape[1]} features, the forest expects {self.n_features}")
+        block_size = block_size or max(1, 2 ** 20 // self.n_trees)
+
+        # Trees are grouped by output, so each output sums one contiguous run of trees
+        starts = np.flatnonzero(np.r_[True, self.tree_output[1:] != self.tree_output[:-1]])
+        outputs = self.tree_output[starts]
+        counts = np.diff(np.r_[starts, self.n_trees])
+        width = self.value.shape[1]
+
+        predictions = np.empty((n_rows, self.n_outputs), dtype=np.float64)
+        for start in range(0, n_rows, block_size):
+            block = X[start:start + block_size]
+            block = block.toarray() if hasattr(block, "toarray") else block
+            block = np.ascontiguousarray(block, dtype=np.float32)
+            sums = np.add.reduceat(self.value[self.apply(block)], starts, axis=1)
+            for output, total, count in zip(outputs, np.moveaxis(sums, 1, 0), counts):
+                predictions[start:start + block_size, output:output + width] = total / count
+        return predictions[:, 0] if self.squeeze else predictions
+
+    # 2. Persistence
+    def save(self, path):
+        """
+        Write the arrays and meta.json to the directory `path`, replacing it atomically.
+        """
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        staging = Path(tempfile.mkdtemp(dir=path.parent, prefix=f".{path.name}-"))
+        for name in ARRAYS:
+            np.save(staging / f"{name}.npy", np.ascontiguousarray(getattr(self, name)))
+        with open(staging / "meta.json", "w") as f:
+            json.dump({"format_version": FORMAT_VERSION, "n_features": self.n_features, "n_outputs": self.n_outputs,
+                       "max_depth": self.max_depth, "squeeze": self.squeeze, "n_trees": self.n_trees}, f, indent=2)
+
+        if path.exists():
+            shutil.rmtree(path)
+        os.replace(staging, path)
+        return path
+
+    @classmethod
+    def load(cls, path, mmap_mode="r"):
+        """
+        Load an exported forest, memory-mapping its arrays unless `mmap_mode` is None.
+        """
+        path = Path(path)
+        with open(path / "meta.json") as f:
+            meta = json.load(f)
+        if meta["format_version"] != FORMAT_VERSION:
+            raise ValueError(f"Unsupported compact forest format {meta['format_version']} in {path}")
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode=mmap_mode) for name in ARRAYS}
+        return cls(**arrays, n_features=meta["n_features"], n_outputs=meta["n_outputs"],
+                   max_depth=meta["max_depth"], squeeze=meta["squeeze"])
+
+
+def export_forest(model, path):
+    """
+    Flatten a fitted forest and save it to the directory `path`.
+    """
+    return CompactForest.from_model(model).save(path)
+
+
+# 3. Load benchmark
+def _load_stats(kind, path):
+    # Runs in a fresh interpreter: import, load and touch the model once
+    from src.utils.instrumentation import rss_mb
+
+    start = time.perf_counter()
+    if kind == "joblib":
+        import joblib
+
+        model = joblib.load(path)
+        n_features = model.n_features_in_
+    else:
+        model = CompactForest.load(path)
+        n_features = model.n_features
+    load_seconds = time.perf_counter() - start
+    model.predict(np.zeros((1, n_features), dtype=np.float32))
+    stats = {"format": kind, "load_seconds": load_seconds,
+             "first_predict_seconds": time.perf_counter() - start - load_seconds, "rss_mb": rss_mb()}
+
+    # Memory-mapped pages are shared through the page cache; RssAnon is what each process adds
+    try:
+        with open("/proc/self/status") as f:
+            status = dict(line.split(":", 1) for line in f)
+        stats["private_mb"] = int(status["RssAnon"].split()[0]) / 1024
+    except (OSError, KeyError, ValueError):
+        stats["private_mb"] = float("nan")
+    return stats
+
+
+def main(argv=None):
+    """
+    Export the data_sim forest and compare it with the pickled model: load
+    time and RSS of a fresh process, and the largest prediction difference.
+    """
+    parser = argparse.ArgumentParser(description="Compare the compact forest export with the joblib model")
+    parser.add_argument("--n-estimators", type=int, default=100)
+    parser.add_argument("--backend", default="forest", choices=["forest", "multioutput_forest"])
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--load-only", nargs=2, metavar=("FORMAT", "PATH"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.load_only:
+        print(json.dumps(_load_stats(*args.load_only)))
+        return 0
+
+    import joblib
+
+    from src.utils.data_sim import generate_training_data, prepare_training_data, train_model
+
+    X, y, _ = prepare_training_data(generate_training_data(seed=args.seed))
+    model = train_model(X, y, backend=args.backend, n_estimators=args.n_estimators)
+    forest = CompactForest.from_model(model)
+    difference = np.abs(forest.predict(X) - model.predict(X)).max()
+    print(f"{forest.n_trees} trees, {len(forest.feature)} nodes, {forest.nbytes / 1024 ** 2:.1f} MB of arrays; "
+          f"largest prediction difference {difference:.3g}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        joblib.dump(model, Path(tmp) / "model.joblib")
+        forest.save(Path(tmp) / "forest")
+        for kind, path in (("joblib", Path(tmp) / "model.joblib"), ("compact", Path(tmp) / "forest")):
+            result = subprocess.run([sys.executable, "-m", "src.models.compact_forest", "--load-only", kind,
+                                     str(path)], capture_output=True, text=True, check=True)
+            stats = json.loads(result.stdout)
+            print(f"{kind:>8}: load {stats['load_seconds']:.3f}s, first predict {stats['first_predict_seconds']:.3f}s, "
+                  f"RSS {stats['rss_mb']:.1f} MB ({stats['private_mb']:.1f} MB private)")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
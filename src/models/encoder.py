@@ -0,0 +1,162 @@
+# encoder.py
+#
+# A fitted, persistent replacement for the pd.get_dummies + StandardScaler
+# preprocessing used by data_sim.py and model_train.py. The category
+# vocabularies and scaling statistics are learned once, so every later call
+# produces the same fixed column layout without any per-call alignment.
+
+import json
+
+import numpy as np
+import pandas as pd
+import scipy.sparse as sp
+
+
+def _codes(values, index):
+    # Position of every value in `index`, -1 when missing. Categorical input
+    # only maps its (few) categories, so large columns are never re-hashed
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        mapping = np.append(index.get_indexer(values.cat.categories), -1)
+        return mapping[values.cat.codes.to_numpy()]
+    return index.get_indexer(values)
+
+
+class FeatureEncoder:
+    """
+    One-hot encodes categorical columns and standardizes numeric columns.
+
+    The output layout is the numeric columns followed by the one-hot columns
+    (in `categorical_columns` order), then a sin/cos pair for every entry of
+    `cyclical_columns`, which maps a column to its ordered list of values.
+    Categories not seen during fit encode as all zeros. `transform` returns
+    a CSR matrix when `sparse` is True and a dense float32 array otherwise.
+    """
+
+    def __init__(self, categorical_columns=None, numeric_columns=None, drop_first=True, sparse=False,
+                 cyclical_columns=None):
+        self.categorical_columns = categorical_columns
+        self.numeric_columns = numeric_columns
+        self.drop_first = drop_first
+        self.sparse = sparse
+        self.cyclical_columns = cyclical_columns or {}
+
+    # 1. Fitting
+    def fit(self, X):
+        if self.categorical_columns is None:
+            self.categorical_columns = X.select_dtypes(include=['object', 'category', 'string']).columns.tolist()
+        if self.numeric_columns is None:
+            self.numeric_columns = X.select_dtypes(include=['number']).columns.tolist()
+        self.categorical_columns = list(self.categorical_columns)
+        self.numeric_columns = list(self.numeric_columns)
+
+        # Same category order as pd.get_dummies
+        self.categories_ = {}
+        for column in self.categorical_columns:
+            values = X[column].array if isinstance(X[column].dtype, pd.CategoricalDtype) else pd.Categorical(X[column])
+            self.categories_[column] = values.categories.tolist()
+
+        # Same statistics as StandardScaler
+        numeric = X[self.numeric_columns].to_numpy(dtype=np.float64)
+        self.mean_ = numeric.mean(axis=0)
+        scale = numeric.std(axis=0)
+        self.scale_ = np.where(scale == 0, 1.0, scale)
+
+        self._build_layout()
+        return self
+
+    def _build_layout(self):
+        offset = len(self.numeric_columns)
+        names = list(self.numeric_columns)
+        self._offsets = {}
+        self._indexes = {column: pd.Index(categories) for column, categories in self.categories_.items()}
+        self._cyclical_indexes = {column: pd.Index(values) for column, values in self.cyclical_columns.items()}
+        for column in self.categorical_columns:
+            kept = self.categories_[column][1:] if self.drop_first else self.categories_[column]
+            self._offsets[column] = offset
+            names.extend(f"{column}_{category}" for category in kept)
+            offset += len(kept)
+        for column in self.cyclical_columns:
+            names.extend([f"{column}_Sin", f"{column}_Cos"])
+        self.feature_names_ = names
+
+    # 2. Transforming
+    def transform(self, X):
+        n_rows = len(X)
+        n_numeric = len(self.numeric_columns)
+        numeric = (X[self.numeric_columns].to_numpy(dtype=np.float64) - self.mean_) / self.scale_
+
+        # Column index of the one-hot entry of every row, or -1 when none is set
+        one_hot = []
+        for column in self.categorical_columns:
+            codes = _codes(X[column], self._indexes[column]).astype(np.int64)
+            if self.drop_first:
+                codes = codes - 1
+            one_hot.append(np.where(codes >= 0, codes + self._offsets[column], -1))
+
+        cyclical = []
+        for column, values in self.cyclical_columns.items():
+            position = _codes(X[column], self._cyclical_indexes[column])
+            angle = 2 * np.pi * position / len(values)
+            cyclical.append(np.where(position >= 0, np.sin(angle), 0.0))
+            cyclical.append(np.where(position >= 0, np.cos(angle), 0.0))
+
+        n_features = len(self.feature_names_)
+        first_cyclical = n_features - len(cyclical)
+        if not self.sparse:
+            encoded = np.zeros((n_rows, n_features), dtype=np.float32)
+            encoded[:, :n_numeric] = numeric
+            rows = np.arange(n_rows)
+            for columns in one_hot:
+                set_rows = columns >= 0
+                encoded[rows[set_rows], columns[set_rows]] = 1.0
+            for i, values in enumerate(cyclical):
+                encoded[:, first_cyclical + i] = values
+            return encoded
+
+        dense_blocks = [numeric] + [values[:, None] for values in cyclical]
+        dense_columns = list(range(n_numeric)) + list(range(first_cyclical, n_features))
+        dense = np.hstack(dense_blocks) if dense_blocks else np.empty((n_rows, 0))
+        one_hot = np.column_stack(one_hot) if one_hot else np.empty((n_rows, 0), dtype=np.int64)
+
+        rows = np.concatenate([np.repeat(np.arange(n_rows), len(dense_columns)),
+                               np.repeat(np.arange(n_rows), one_hot.shape[1])])
+        columns = np.concatenate([np.tile(dense_columns, n_rows).astype(np.int64), one_hot.ravel()])
+        data = np.concatenate([dense.ravel(), np.ones(one_hot.size)]).astype(np.float32)
+        keep = columns >= 0
+        return sp.csr_matrix((data[keep], (rows[keep], columns[keep])), shape=(n_rows, n_features))
+
+    def fit_transform(self, X):
+        return self.fit(X).transform(X)
+
+    # 3. Persistence
+    def to_dict(self):
+        return {
+            "categorical_columns": self.categorical_columns,
+            "numeric_columns": self.numeric_columns,
+            "drop_first": self.drop_first,
+            "sparse": self.sparse,
+            "cyclical_columns": self.cyclical_columns,
+            "categories": self.categories_,
+            "mean": self.mean_.tolist(),
+            "scale": self.scale_.tolist(),
+        }
+
+    @classmethod
+    def from_dict(cls, state):
+        encoder = cls(state["categorical_columns"], state["numeric_columns"], state["drop_first"],
+                      state["sparse"], state["cyclical_columns"])
+        encoder.categories_ = state["categories"]
+        encoder.mean_ = np.asarray(state["mean"], dtype=np.float64)
+        encoder.scale_ = np.asarray(state["scale"], dtype=np.float64)
+        encoder._build_layout()
+        return encoder
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
@@ -0,0 +1,149 @@
+# model_cache.py
+#
+# Content-addressed cache for trained models and their fitted encoders.
+# An entry is keyed by a hash of the training data, the encoder state and
+# the hyperparameters, so a model is only retrained when one of those
+# actually changes. Models are stored uncompressed with joblib so their
+# NumPy arrays can be memory-mapped on load instead of read eagerly, and
+# forests are also exported in the array-backed format of
+# src/models/compact_forest.py for serving.
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+from importlib.metadata import version
+from pathlib import Path
+
+import pandas as pd
+
+from src.models.compact_forest import CompactForest
+from src.models.encoder import FeatureEncoder
+
+DEFAULT_CACHE_DIR = '.model_cache'
+DEFAULT_MAX_BYTES = 2 * 1024 ** 3
+# Staging directories older than this were left behind by a crashed put()
+STAGING_MAX_AGE = 3600
+
+
+def cache_key(training_data, encoder, params):
+    """
+    Hash of the training data, the fitted encoder state and the hyperparameters.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([list(map(str, training_data.columns)),
+                              list(map(str, training_data.dtypes))]).encode())
+    digest.update(pd.util.hash_pandas_object(training_data, index=False).to_numpy().tobytes())
+    digest.update(json.dumps(encoder.to_dict(), sort_keys=True, default=str).encode())
+    # Pickled estimators are only valid for the sklearn version that wrote them
+    digest.update(json.dumps({"params": params, "sklearn": version("scikit-learn")},
+                             sort_keys=True, default=str).encode())
+    return digest.hexdigest()
+
+
+class ModelCache:
+    """
+    Directory of cached (model, encoder) pairs with size-based LRU eviction.
+
+    Every entry is a sub-directory named after its key. Its modification
+    time is refreshed on each hit, and the least recently used entries are
+    removed once the cache grows beyond `max_bytes`. Entries are written to
+    a `.staging-*` directory first; ones a crash left behind are removed by
+    evict() once they are `STAGING_MAX_AGE` seconds old.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=DEFAULT_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def get(self, key, mmap_mode='r'):
+        """
+        Return the cached (model, encoder) for `key`, or None on a miss.
+        """
+        entry = self.cache_dir / key
+        if not (entry / 'model.joblib').exists():
+            return None
+        import joblib
+
+        os.utime(entry)
+        model = joblib.load(entry / 'model.joblib', mmap_mode=mmap_mode)
+        return model, FeatureEncoder.load(entry / 'encoder.json')
+
+    def get_compact(self, key, mmap_mode='r'):
+        """
+        Return the cached (CompactForest, encoder) for `key`, or None when the
+        entry is missing or its model is not a forest.
+        """
+        entry = self.cache_dir / key
+        if not (entry / 'forest' / 'meta.json').exists():
+            return None
+        os.utime(entry)
+        return CompactForest.load(entry / 'forest', mmap_mode=mmap_mode), FeatureEncoder.load(entry / 'encoder.json')
+
+    def put(self, key, model, encoder):
+        import joblib
+
+        # Write to a temporary directory first so readers never see half an entry
+        staging = Path(tempfile.mkdtemp(dir=self.cache_dir, prefix='.staging-'))
+        joblib.dump(model, staging / 'model.joblib')
+        encoder.save(staging / 'encoder.json')
+        try:
+            CompactForest.from_model(model).save(staging / 'forest')
+        except ValueError:
+            pass  # Only tree ensembles have a compact export
+
+        entry = self.cache_dir / key
+        if entry.exists():
+            shutil.rmtree(entry)
+        os.replace(staging, entry)
+        self.evict(keep=key)
+        return entry
+
+    def evict(self, keep=None):
+        """
+        Remove least recently used entries until the cache fits in max_bytes,
+        and staging directories abandoned by a crashed put().
+        """
+        # A put() in another process may still be writing to a recent one
+        for path in self.cache_dir.glob('.staging-*'):
+            if time.time() - path.stat().st_mtime > STAGING_MAX_AGE:
+                shutil.rmtree(path, ignore_errors=True)
+
+        entries = [path for path in self.cache_dir.iterdir() if path.is_dir() and not path.name.startswith('.')]
+        sizes = {path: sum(f.stat().st_size for f in path.rglob('*') if f.is_file()) for path in entries}
+        total = sum(sizes.values())
+        for path in sorted(entries, key=lambda p: p.stat().st_mtime):
+            if total <= self.max_bytes:
+                break
+            if path.name == keep:
+                continue
+            shutil.rmtree(path)
+            total -= sizes[path]
+        return total
+
+    def get_or_fit(self, training_data, encoder, params, fit, compact=False):
+        """
+        Return the cached model for this data, encoder and parameters, or call
+        `fit()` to train one and store it. Returns (model, cache_hit).
+
+        With `compact`, a forest is returned as its memory-mapped CompactForest.
+        """
+        key = cache_key(training_data, encoder, params)
+        cached = (compact and self.get_compact(key)) or self.get(key)
+        if cached is None:
+            model, cache_hit = fit(), False
+            self.put(key, model, encoder)
+        else:
+            model, cache_hit = cached[0], True
+        if compact and not isinstance(model, CompactForest):
+            if not (self.cache_dir / key / 'forest' / 'meta.json').exists():
+                # Entries written before the compact export existed get one now
+                try:
+                    CompactForest.from_model(model).save(self.cache_dir / key / 'forest')
+                except ValueError:
+                    return model, cache_hit
+            return self.get_compact(key)[0], cache_hit
+        return model, cache_hit
@@ -1,80 +1,129 @@
 import pandas as pd
-import numpy as np
-from sklearn.model_selection import train_test_split
-from sklearn.ensemble import RandomForestRegressor
-from sklearn.metrics import mean_squared_error, r2_score
-from sklearn.preprocessing import StandardScaler
-import mlflow
-import mlflow.sklearn
-
-# Load the cleaned dataset
-data = pd.read_csv('S:/SJSU/DATA_226/group_project/data/processed/cleaned_improved_dataset.csv')
-
-# 1. Feature Engineering
-# Include "SKU" in the categorical columns for one-hot encoding
-categorical_columns = ["Product type", "SKU", "Customer demographics", "Shipping carriers", 
-                       "Supplier name", "Location", "Inspection results", 
-                       "Transportation modes", "Routes", "Season"]
-
-# One-hot encoding for all categorical variables, including SKU
-data_encoded = pd.get_dummies(data, columns=categorical_columns, drop_first=True)
-
-# Extract features and target variable
-X = data_encoded.drop(columns=["Revenue generated"])  # Features
-y = data_encoded["Revenue generated"]  # Target
-
-# Identify the numeric columns for transformations
-numeric_columns = X.select_dtypes(include=['float64', 'int64']).columns
-
-# Standardize numerical features
-scaler = StandardScaler()
-X[numeric_columns] = scaler.fit_transform(X[numeric_columns])
-
-# Cyclical Encoding for Temporal Features
-season_mapping = {"Winter": 0, "Spring": 1, "Summer": 2, "Fall": 3}
-data_encoded["Season_Cyclical"] = data["Season"].map(season_mapping)
-X["Season_Sin"] = np.sin(2 * np.pi * data_encoded["Season_Cyclical"] / 4)
-X["Season_Cos"] = np.cos(2 * np.pi * data_encoded["Season_Cyclical"] / 4)
-X = X.drop(columns=["Season_Cyclical"], errors='ignore')
-
-# 2. Train-Test Split
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.3, random_state=42)
 
-# Start an MLflow run
-mlflow.start_run()
+from src.etl.extract import available_path
+from src.utils.config import load_config, resolve_path
+from src.utils.instrumentation import setup_stage_log, stage
 
-# 3. Model Training: Random Forest Regressor
-model = RandomForestRegressor(n_estimators=400, random_state=45)
-model.fit(X_train, y_train)
-
-# 4. Model Evaluation
-y_pred = model.predict(X_test)
-mse = mean_squared_error(y_test, y_pred)
-r2 = r2_score(y_test, y_pred)
-
-# Log parameters and metrics to MLflow
-mlflow.log_param("n_estimators", 400)
-mlflow.log_param("random_state", 45)
-mlflow.log_metric("mse", mse)
-mlflow.log_metric("r2", r2)
-
-# Log the model
-mlflow.sklearn.log_model(model, "random_forest_model")
-
-# End the MLflow run
-mlflow.end_run()
-
-# Print metrics
-print(f"Mean Squared Error: {mse}")
-print(f"R-squared: {r2}")
-
-# 5. Feature Importance Analysis
-importances = model.feature_importances_
-feature_importance_df = pd.DataFrame({
-    "Feature": X.columns,
-    "Importance": importances
-}).sort_values(by="Importance", ascending=False)
+# Include "SKU" in the categorical columns for one-hot encoding
+CATEGORICAL_COLUMNS = ["Product type", "SKU", "Customer demographics", "Shipping carriers",
+                       "Supplier name", "Location", "Inspection results",
+                       "Transportation modes", "Routes", "Season"]
 
-# Print the top 10 important features
-print("\nTop 10 Important Features:")
-print(feature_importance_df.head(10))
+DEFAULT_TRAIN = {
+    "data_path": "data/processed/cleaned_improved_dataset.parquet",
+    "target_column": "Revenue generated",
+    "encoder_path": "feature_encoder.json",
+    "compact_path": "models/revenue_forest",
+    "n_estimators": 400,
+    "random_state": 45,
+    "test_size": 0.3,
+    "split_random_state": 42,
+    "model_cache_dir": ".model_cache",
+}
+
+
+def train(config=None):
+    """
+    Train and evaluate the revenue forest with the "train" section of configs/config.yaml.
+    Returns (model, encoder, metrics).
+    """
+    # sklearn and mlflow are only loaded by the train command
+    import mlflow
+    import mlflow.sklearn
+    from sklearn.ensemble import RandomForestRegressor
+    from sklearn.metrics import mean_squared_error, r2_score
+    from sklearn.model_selection import train_test_split
+
+    from src.models.compact_forest import export_forest
+    from src.models.encoder import FeatureEncoder
+    from src.models.model_cache import ModelCache
+
+    config = {**DEFAULT_TRAIN, **(config if config is not None else load_config().get("train", {}))}
+
+    # Start an MLflow run; every stage below also logs its timings to it
+    mlflow.start_run()
+
+    # Load the cleaned dataset
+    with stage("load_data") as record:
+        # The tracked CSV stands in for the cleaned catalog until `clean` has run
+        data_path = available_path(config["data_path"], "cleaned_catalog")
+        data = pd.read_parquet(data_path) if data_path.suffix == ".parquet" else pd.read_csv(data_path)
+        record["rows"] = len(data)
+
+    # 1. Feature Engineering
+    # Features are every column except the target variable
+    target_column = config["target_column"]
+    numeric_columns = data.drop(columns=[target_column] + CATEGORICAL_COLUMNS).select_dtypes(include=['number']).columns.tolist()
+
+    # One-hot encoding for all categorical variables, including SKU, standardized
+    # numeric features and cyclical encoding for Season, emitted as a sparse matrix
+    encoder = FeatureEncoder(categorical_columns=CATEGORICAL_COLUMNS, numeric_columns=numeric_columns, sparse=True,
+                             cyclical_columns={"Season": ["Winter", "Spring", "Summer", "Fall"]})
+    encoder_path = resolve_path(config["encoder_path"])
+    with stage("encode_features", rows=len(data)):
+        X = encoder.fit_transform(data)  # Features
+        y = data[target_column]  # Target
+        encoder.save(encoder_path)
+
+    # 2. Train-Test Split
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=config["test_size"],
+                                                        random_state=config["split_random_state"])
+
+    # 3. Model Training: Random Forest Regressor
+    # Reuse the cached forest when the data, encoder and hyperparameters are unchanged
+    model_params = {key: config[key] for key in ("n_estimators", "random_state", "test_size", "split_random_state")}
+    with stage("train_model", rows=X_train.shape[0]):
+        model, cache_hit = ModelCache(resolve_path(config["model_cache_dir"])).get_or_fit(
+            data, encoder, model_params,
+            lambda: RandomForestRegressor(n_estimators=config["n_estimators"], random_state=config["random_state"],
+                                          n_jobs=-1).fit(X_train, y_train)
+        )
+    mlflow.log_param("model_cache_hit", cache_hit)
+
+    # 4. Model Evaluation
+    with stage("evaluate_model", rows=X_test.shape[0]):
+        y_pred = model.predict(X_test)
+    mse = mean_squared_error(y_test, y_pred)
+    r2 = r2_score(y_test, y_pred)
+
+    # Log parameters and metrics to MLflow
+    mlflow.log_param("n_estimators", config["n_estimators"])
+    mlflow.log_param("random_state", config["random_state"])
+    mlflow.log_param("n_jobs", -1)
+    mlflow.log_metric("mse", mse)
+    mlflow.log_metric("r2", r2)
+
+    # Log the model, its array-backed export for serving and the fitted encoder it expects
+    with stage("log_model"):
+        mlflow.sklearn.log_model(model, "random_forest_model")
+        compact_path = export_forest(model, resolve_path(config["compact_path"]))
+        mlflow.log_artifacts(str(compact_path), "compact_forest")
+        mlflow.log_artifact(str(encoder_path))
+
+    # End the MLflow run
+    mlflow.end_run()
+    return model, encoder, {"mse": mse, "r2": r2}
+
+
+def main(config=None):
+    setup_stage_log()
+    model, encoder, metrics = train(config)
+
+    # Print metrics
+    print(f"Mean Squared Error: {metrics['mse']}")
+    print(f"R-squared: {metrics['r2']}")
+
+    # 5. Feature Importance Analysis
+    importances = model.feature_importances_
+    feature_importance_df = pd.DataFrame({
+        "Feature": encoder.feature_names_,
+        "Importance": importances
+    }).sort_values(by="Importance", ascending=False)
+
+    # Print the top 10 important features
+    print("\nTop 10 Important Features:")
+    print(feature_importance_df.head(10))
+
+
+if __name__ == '__main__':
+    main()
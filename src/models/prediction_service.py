@@ -0,0 +1,361 @@
+# prediction_service.py
+#
+# Long-running local prediction service for the inventory model. The
+# encoder and the forest are loaded once (the forest memory-mapped from its
+# compact export, see src/models/compact_forest.py) and requests are
+# answered over HTTP on a TCP port or a Unix socket:
+#
+#   POST /predict   {"rows": [{"SKU": "SKU1", "Price": 42.0, ...}, ...]}
+#                   or a single row object; returns {"predictions": [...]}
+#   GET  /metrics   request, row and batch counters, p50/p99 latency, throughput
+#   GET  /health
+#
+# Concurrent requests are coalesced into micro-batches: the first queued
+# request opens a window of `max_wait_ms`, and everything that arrives
+# before it closes (up to `max_batch_rows` rows) is encoded and predicted
+# in one vectorized call.
+#
+#   python -m src serve
+#   python -m src.models.prediction_service --socket /tmp/supplysim.sock
+
+import argparse
+import http.client
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+import pandas as pd
+
+from src.utils.config import load_config, resolve_path
+
+DEFAULT_SERVE = {
+    "host": "127.0.0.1",
+    "port": 8765,
+    "socket": None,
+    "max_wait_ms": 2.0,
+    "max_batch_rows": 4096,
+    "seed": 42,
+    "model_cache_dir": ".model_cache",
+}
+
+TARGETS = ["Restock Indicator", "Restock Date (days)", "Restock Quantity", "Predicted Costs"]
+
+
+def load_model(config=None):
+    """
+    Load (model, encoder) for serving: the seeded data_sim forest from the
+    model cache as a CompactForest, trained and cached on the first start.
+    """
+    from src.models.model_cache import ModelCache
+    from src.utils.data_sim import generate_training_data, prepare_training_data, train_model
+
+    config = {**DEFAULT_SERVE, **(config or {})}
+    # The seeded training set gives the same cache key as the batch scripts
+    training_data = generate_training_data(seed=config["seed"])
+    X, y, encoder = prepare_training_data(training_data)
+    model, _ = ModelCache(resolve_path(config["model_cache_dir"])).get_or_fit(
+        training_data, encoder, {"backend": "forest"}, lambda: train_model(X, y, backend="forest"), compact=True)
+    return model, encoder
+
+
+def format_predictions(skus, predictions):
+    """
+    Restock metrics per row, rounded like predict_inventory_management.
+    """
+    # np.rint rounds half to even, like the built-in round
+    indicator, days, quantity = (np.rint(predictions[:, i]).astype(np.int64).tolist() for i in range(3))
+    costs = np.round(predictions[:, 3], 2).tolist()
+    return [{"SKU": sku, TARGETS[0]: a, TARGETS[1]: b, TARGETS[2]: c, TARGETS[3]: d}
+            for sku, a, b, c, d in zip(skus, indicator, days, quantity, costs)]
+
+
+# 1. Micro-batching
+class ServiceMetrics:
+    """
+    Thread-safe request, row and batch counters with a window of recent latencies.
+    """
+
+    def __init__(self, window=10000):
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=window)
+        self.batch_rows = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.requests = self.rows = self.batches = self.errors = 0
+
+    def record_batch(self, n_rows, latencies):
+        with self.lock:
+            self.batches += 1
+            self.rows += n_rows
+            self.requests += len(latencies)
+            self.batch_rows.append(n_rows)
+            self.latencies.extend(latencies)
+
+    def record_error(self):
+        with self.lock:
+            self.errors += 1
+
+    def snapshot(self):
+        with self.lock:
+            latencies = np.array(self.latencies) * 1000
+            batch_rows = np.array(self.batch_rows)
+            uptime = time.perf_counter() - self.started
+            snapshot = {"requests": self.requests, "rows": self.rows, "batches": self.batches,
+                        "errors": self.errors, "uptime_seconds": uptime}
+        snapshot.update({
+            "requests_per_second": snapshot["requests"] / uptime if uptime > 0 else 0.0,
+            "rows_per_second": snapshot["rows"] / uptime if uptime > 0 else 0.0,
+            "latency_p50_ms": float(np.percentile(latencies, 50)) if len(latencies) else None,
+            "latency_p99_ms": float(np.percentile(latencies, 99)) if len(latencies) else None,
+            "mean_batch_rows": float(batch_rows.mean()) if len(batch_rows) else None,
+        })
+        return snapshot
+
+
+class MicroBatcher:
+    """
+    Background thread that coalesces queued requests into batched predict calls.
+
+    submit(rows) returns a Future of the formatted predictions for `rows`
+    (a list of dicts). A batch is closed `max_wait_ms` after its first
+    request arrived or once it holds `max_batch_rows` rows.
+    """
+
+    def __init__(self, model, encoder, max_wait_ms=2.0, max_batch_rows=4096, metrics=None):
+        self.model = model
+        self.encoder = encoder
+        self.max_wait = max_wait_ms / 1000
+        self.max_batch_rows = max_batch_rows
+        self.metrics = metrics or ServiceMetrics()
+        self.required_columns = ["SKU"] + encoder.numeric_columns + encoder.categorical_columns
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+        self._thread.start()
+
+    def submit(self, rows):
+        future = Future()
+        # Reject incomplete rows up front: from_records would fill a missing
+        # column with NaN once the row shares a batch with complete ones
+        missing = [column for column in self.required_columns if any(column not in row for row in rows)]
+        if missing:
+            future.set_exception(KeyError(missing[0]))
+            return future
+        self._queue.put((rows, future, time.perf_counter()))
+        return future
+
+    def predict(self, rows, timeout=None):
+        return self.submit(rows).result(timeout)
+
+    def close(self):
+        self._queue.put(None)
+        self._thread.join()
+
+    def _next_batch(self):
+        first = self._queue.get()
+        if first is None:
+            return None
+        batch, n_rows = [first], len(first[0])
+        deadline = first[2] + self.max_wait
+        while n_rows < self.max_batch_rows:
+            try:
+                item = self._queue.get(timeout=max(deadline - time.perf_counter(), 0))
+            except queue.Empty:
+                break
+            if item is None:
+                self._queue.put(None)  # Finish this batch, then stop
+                break
+            batch.append(item)
+            n_rows += len(item[0])
+        return batch
+
+    def _predict(self, batch):
+        rows = [row for request_rows, _, _ in batch for row in request_rows]
+        frame = pd.DataFrame.from_records(rows)
+        encoded = self.encoder.transform(frame)
+        # Null numeric values would be routed like any other number
+        if np.isnan(encoded.data if hasattr(encoded, "toarray") else encoded).any():
+            raise ValueError("Numeric columns must not be null")
+        predictions = self.model.predict(encoded)
+        results = format_predictions(frame["SKU"].tolist(), predictions)
+
+        start, finished = 0, time.perf_counter()
+        for request_rows, future, submitted in batch:
+            future.set_result(results[start:start + len(request_rows)])
+            start += len(request_rows)
+        self.metrics.record_batch(len(rows), [finished - submitted for _, _, submitted in batch])
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            try:
+                self._predict(batch)
+            except Exception:
+                # A malformed request fails the whole batch, so answer each request on its own
+                for item in batch:
+                    try:
+                        self._predict([item])
+                    except Exception as error:
+                        self.metrics.record_error()
+                        item[1].set_exception(error)
+
+
+# 2. HTTP
+class PredictionHandler(BaseHTTPRequestHandler):
+    # Keep connections open between requests, and send small responses
+    # right away instead of waiting on the client's delayed ACK
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def address_string(self):
+        # Unix socket clients have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_GET(self):
+        if self.path == "/health":
+            self._send_json(200, {"status": "ok"})
+        elif self.path == "/metrics":
+            self._send_json(200, self.server.batcher.metrics.snapshot())
+        else:
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+
+    def do_POST(self):
+        if self.path != "/predict":
+            self._send_json(404, {"error": f"Unknown path {self.path}"})
+            return
+        try:
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            rows = body["rows"] if isinstance(body, dict) and "rows" in body else [body]
+            if not isinstance(rows, list) or not all(isinstance(row, dict) for row in rows):
+                raise ValueError("Expected a row object or {\"rows\": [row, ...]}")
+        except (ValueError, KeyError) as error:
+            self._send_json(400, {"error": str(error)})
+            return
+        if not rows:
+            self._send_json(200, {"predictions": []})
+            return
+
+        try:
+            predictions = self.server.batcher.predict(rows, timeout=self.server.timeout_seconds)
+        except KeyError as error:
+            self._send_json(400, {"error": f"Missing column {error}"})
+        except (ValueError, TypeError) as error:
+            self._send_json(400, {"error": str(error)})
+        except Exception as error:
+            self._send_json(500, {"error": f"{type(error).__name__}: {error}"})
+        else:
+            self._send_json(200, {"predictions": predictions})
+
+
+class UnixPredictionHandler(PredictionHandler):
+    # TCP_NODELAY does not apply to Unix sockets
+    disable_nagle_algorithm = False
+
+
+class PredictionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Room for every load generator connection opening at once
+    request_queue_size = 128
+
+    def __init__(self, address, batcher, timeout_seconds=30, verbose=False):
+        super().__init__(address, PredictionHandler)
+        self.batcher = batcher
+        self.timeout_seconds = timeout_seconds
+        self.verbose = verbose
+
+
+class UnixPredictionServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, path, batcher, timeout_seconds=30, verbose=False):
+        if os.path.exists(path):
+            os.unlink(path)
+        super().__init__(path, UnixPredictionHandler)
+        self.batcher = batcher
+        self.timeout_seconds = timeout_seconds
+        self.verbose = verbose
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """
+    http.client connection to a service listening on a Unix socket.
+    """
+
+    def __init__(self, path, timeout=30):
+        super().__init__("localhost", timeout=timeout)
+        self.path = path
+
+    def connect(self):
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.settimeout(self.timeout)
+        self.sock.connect(self.path)
+
+
+def make_server(model, encoder, config=None, verbose=False):
+    """
+    Build the HTTP server (TCP, or a Unix socket when config["socket"] is set)
+    around a MicroBatcher. Call serve_forever() to run it.
+    """
+    config = {**DEFAULT_SERVE, **(config or {})}
+    batcher = MicroBatcher(model, encoder, max_wait_ms=config["max_wait_ms"],
+                           max_batch_rows=config["max_batch_rows"])
+    if config.get("socket"):
+        return UnixPredictionServer(str(resolve_path(config["socket"])), batcher, verbose=verbose)
+    return PredictionServer((config["host"], config["port"]), batcher, verbose=verbose)
+
+
+def serve(config=None, verbose=False):
+    config = {**DEFAULT_SERVE, **(config if config is not None else load_config().get("serve", {}))}
+    model, encoder = load_model(config)
+    server = make_server(model, encoder, config, verbose=verbose)
+    where = config["socket"] or f"http://{config['host']}:{config['port']}"
+    print(f"Serving predictions on {where} (micro-batch window {config['max_wait_ms']} ms)", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.batcher.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Local prediction service with micro-batching")
+    parser.add_argument("--host")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("--socket", help="listen on this Unix socket instead of a TCP port")
+    parser.add_argument("--max-wait-ms", dest="max_wait_ms", type=float)
+    parser.add_argument("--max-batch-rows", dest="max_batch_rows", type=int)
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    config = load_config().get("serve", {})
+    config.update({key: value for key, value in vars(args).items() if value is not None and key != "verbose"})
+    serve(config, verbose=args.verbose)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,219 @@
+# simulation.py
+#
+# Discrete-time inventory simulation for many SKUs at once. The state of
+# every SKU lives in NumPy arrays (on-hand stock, units on order and a
+# pipeline of in-transit orders indexed by arrival day), and each simulated
+# day updates all SKUs with a handful of array operations:
+#
+#   1. orders due today arrive and are added to the on-hand stock
+#   2. demand is served from stock; what cannot be served is lost
+#   3. SKUs whose inventory position (on hand + on order) is at or below
+#      their reorder point order their order quantity, which arrives after
+#      their lead time
+#
+# Demand comes from a daily series (Date x SKU "Daily Sales") or is drawn
+# from Poisson rates, and orders either follow the reorder point policy or
+# are taken from the model predictions (Restock Indicator / Quantity / Date).
+
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# 1. Inputs
+def demand_from_series(daily_data, column="Daily Sales", skus=None):
+    """
+    Pivot a daily series into a (days x SKUs) demand matrix.
+
+    Returns (demand, dates, skus); days or SKUs without a row have no demand.
+    """
+    dates = pd.to_datetime(daily_data["Date"])
+    date_index = pd.DatetimeIndex(pd.unique(dates)).sort_values()
+    sku_index = pd.Index(skus if skus is not None else pd.unique(daily_data["SKU"].astype(str)))
+
+    day = date_index.get_indexer(dates)
+    sku = sku_index.get_indexer(daily_data["SKU"].astype(str))
+    keep = sku >= 0
+    demand = np.zeros((len(date_index), len(sku_index)))
+    demand[day[keep], sku[keep]] = daily_data[column].to_numpy(dtype=np.float64)[keep]
+    return demand, date_index, sku_index
+
+
+def poisson_demand(rates, n_days, seed=None, rng=None):
+    """
+    Draw a (days x SKUs) demand matrix with a Poisson rate per SKU.
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    rates = np.asarray(rates, dtype=np.float64)
+    return rng.poisson(rates, size=(n_days, len(rates))).astype(np.float64)
+
+
+def reorder_policy(rates, lead_times, service_z=1.65, cover_days=14):
+    """
+    Reorder points and order quantities from daily demand rates and lead times.
+
+    The reorder point covers the expected lead-time demand plus `service_z`
+    standard deviations of Poisson demand; an order covers `cover_days` of demand.
+    """
+    rates = np.asarray(rates, dtype=np.float64)
+    lead_demand = rates * np.asarray(lead_times, dtype=np.float64)
+    reorder_point = np.ceil(lead_demand + service_z * np.sqrt(lead_demand))
+    order_quantity = np.maximum(np.ceil(rates * cover_days), 1.0)
+    return reorder_point, order_quantity
+
+
+def orders_from_predictions(predictions, dates, skus):
+    """
+    Order quantity and lead time matrices (days x SKUs) from model predictions.
+
+    A row with Restock Indicator 1 orders its Restock Quantity, arriving
+    after Restock Date (days) (at least one day).
+    """
+    day = pd.DatetimeIndex(dates).get_indexer(pd.to_datetime(predictions["Date"]))
+    sku = pd.Index(skus).get_indexer(predictions["SKU"].astype(str))
+    keep = (day >= 0) & (sku >= 0) & (predictions["Restock Indicator"].to_numpy() == 1)
+
+    quantities = np.zeros((len(dates), len(skus)))
+    lead_times = np.ones((len(dates), len(skus)), dtype=np.int64)
+    quantities[day[keep], sku[keep]] = np.maximum(predictions["Restock Quantity"].to_numpy(dtype=np.float64)[keep], 0)
+    lead_times[day[keep], sku[keep]] = np.maximum(predictions["Restock Date (days)"].to_numpy()[keep], 1)
+    return quantities, lead_times
+
+
+# 2. Engine
+class InventorySimulation:
+    """
+    Inventory state of `n` SKUs under a lost-sales (reorder point, order quantity) policy.
+
+    `initial_stock`, `reorder_point`, `order_quantity` and `lead_time` are
+    scalars or arrays with one value per SKU. `max_lead_time` bounds the
+    lead times of orders passed to step(); it defaults to the largest
+    policy lead time.
+    """
+
+    def __init__(self, initial_stock, reorder_point, order_quantity, lead_time, n=None, max_lead_time=None):
+        n = n or max(np.size(value) for value in (initial_stock, reorder_point, order_quantity, lead_time))
+        self.on_hand = np.broadcast_to(np.asarray(initial_stock, dtype=np.float64), (n,)).copy()
+        self.reorder_point = np.broadcast_to(np.asarray(reorder_point, dtype=np.float64), (n,)).copy()
+        self.order_quantity = np.broadcast_to(np.asarray(order_quantity, dtype=np.float64), (n,)).copy()
+        self.lead_time = np.maximum(np.broadcast_to(np.asarray(lead_time, dtype=np.int64), (n,)), 1)
+        self.on_order = np.zeros(n)
+
+        # pipeline[:, d % horizon] holds the units arriving on day d
+        self.horizon = int(max(max_lead_time or 0, self.lead_time.max(initial=1))) + 1
+        self.pipeline = np.zeros((n, self.horizon))
+        self.day = 0
+        self._rows = np.arange(n)
+
+    def step(self, demand, order_quantity=None, lead_time=None):
+        """
+        Advance every SKU by one day.
+
+        Orders follow the reorder point policy unless `order_quantity` (and
+        optionally `lead_time`, at least 1 day) give this day's orders per SKU.
+        Returns a dict of per-SKU arrays: sold, lost, ordered and arrived.
+        """
+        # Checked before any state changes. Today's arrivals are on hand
+        # before orders are placed, so an order arrives tomorrow at the earliest
+        lead_time = self.lead_time if lead_time is None else np.asarray(lead_time)
+        if (lead_time < 1).any():
+            raise ValueError("Lead times must be at least 1 day")
+        if (lead_time >= self.horizon).any():
+            raise ValueError(f"Lead times must be below {self.horizon} days, raise max_lead_time")
+
+        slot = self.day % self.horizon
+        arrived = self.pipeline[:, slot].copy()
+        self.pipeline[:, slot] = 0.0
+        self.on_hand += arrived
+        self.on_order -= arrived
+
+        sold = np.minimum(self.on_hand, demand)
+        self.on_hand -= sold
+
+        if order_quantity is None:
+            reorder = self.on_hand + self.on_order <= self.reorder_point
+            ordered = np.where(reorder, self.order_quantity, 0.0)
+            lead_time = self.lead_time
+        else:
+            ordered = np.asarray(order_quantity, dtype=np.float64)
+
+        # Every SKU places at most one order per day, so the (row, slot) pairs are unique
+        self.pipeline[self._rows, (self.day + lead_time) % self.horizon] += ordered
+        self.on_order += ordered
+        self.day += 1
+        return {"sold": sold, "lost": demand - sold, "ordered": ordered, "arrived": arrived}
+
+    def run(self, demand, order_quantity=None, lead_time=None, record=False):
+        """
+        Simulate one day per row of the (days x SKUs) `demand` matrix.
+
+        `order_quantity` and `lead_time` are optional (days x SKUs) order
+        matrices (see orders_from_predictions). Returns (daily, summary):
+        all-SKU totals per day and per-SKU totals over the run, plus the
+        (days x SKUs) on-hand history as float32 when `record` is set.
+        """
+        n_days, n = demand.shape
+        daily = np.zeros((n_days, 5))
+        sold_total, lost_total, ordered_total = np.zeros(n), np.zeros(n), np.zeros(n)
+        stockout_days = np.zeros(n, dtype=np.int64)
+        on_hand_total = np.zeros(n)
+        history = np.empty((n_days, n), dtype=np.float32) if record else None
+
+        for day in range(n_days):
+            result = self.step(demand[day],
+                               None if order_quantity is None else order_quantity[day],
+                               None if lead_time is None else lead_time[day])
+            sold_total += result["sold"]
+            lost_total += result["lost"]
+            ordered_total += result["ordered"]
+            stockout_days += result["lost"] > 0
+            on_hand_total += self.on_hand
+            daily[day] = (result["sold"].sum(), result["lost"].sum(), result["ordered"].sum(),
+                          result["arrived"].sum(), self.on_hand.sum())
+            if record:
+                history[day] = self.on_hand
+
+        daily = pd.DataFrame(daily, columns=["Sold", "Lost", "Ordered", "Arrived", "On Hand"])
+        demand_total = sold_total + lost_total
+        summary = pd.DataFrame({
+            "Sold": sold_total,
+            "Lost": lost_total,
+            "Ordered": ordered_total,
+            "Stockout Days": stockout_days,
+            "Average On Hand": on_hand_total / max(n_days, 1),
+            "Ending On Hand": self.on_hand.copy(),
+            "Fill Rate": np.divide(sold_total, demand_total, out=np.ones(n), where=demand_total > 0),
+        })
+        return (daily, summary, history) if record else (daily, summary)
+
+
+def simulate_catalog(catalog, n_days=365, initial_stock=None, seed=None, **policy):
+    """
+    Simulate every product of a catalog with Poisson demand at its
+    "Number of products sold" * "Demand Factor" rate and "Lead times".
+
+    Returns (daily, summary) with the summary indexed by SKU.
+    """
+    rates = (catalog["Number of products sold"] * catalog["Demand Factor"]).to_numpy(dtype=np.float64)
+    lead_times = catalog["Lead times"].to_numpy()
+    reorder_point, order_quantity = reorder_policy(rates, lead_times, **policy)
+    if initial_stock is None:
+        initial_stock = reorder_point + order_quantity
+
+    engine = InventorySimulation(initial_stock, reorder_point, order_quantity, lead_times)
+    daily, summary = engine.run(poisson_demand(rates, n_days, seed=seed))
+    summary.index = pd.Index(catalog["SKU"].astype(str), name="SKU")
+    return daily, summary
+
+
+if __name__ == '__main__':
+    from src.utils.data_sim import simulate_daily_data
+
+    # 100k SKUs x 365 days from one day of simulated catalog rows
+    catalog = simulate_daily_data("2024-01-01", "2024-01-01", [f"SKU{i}" for i in range(100000)], seed=42)
+    start = time.perf_counter()
+    daily, summary = simulate_catalog(catalog, n_days=365, seed=42)
+    print(f"Simulated {len(summary)} SKUs x {len(daily)} days in {time.perf_counter() - start:.2f}s")
+    print(summary.describe().T)
@@ -0,0 +1,204 @@
+# tuning.py
+#
+# Successive-halving hyperparameter search for the revenue forest trained in
+# model_train.py, replacing the full-size RandomizedSearchCV from the
+# notebook. Every configuration starts on a small budget (trees or training
+# rows) and only the best 1/factor of them move on to a factor-times larger
+# budget. Preprocessing is fitted once per fold and cached on disk, every
+# finished trial is appended to a journal (and logged to MLflow), and an
+# interrupted search resumes from the journal.
+
+import hashlib
+import json
+import math
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.metrics import mean_squared_error
+from sklearn.model_selection import KFold, ParameterSampler
+
+from src.models.encoder import FeatureEncoder
+from src.etl.extract import dataset_path
+from src.models.model_train import CATEGORICAL_COLUMNS
+
+# Same search space as the notebook's RandomizedSearchCV
+PARAM_DISTRIBUTIONS = {
+    "n_estimators": [100, 200, 300, 400, 500],
+    "max_depth": [10, 15, 20, 25, 30, None],
+    "min_samples_split": [2, 5, 10, 15],
+    "min_samples_leaf": [1, 2, 5, 10],
+    "max_features": ["sqrt", "log2", 0.5, 0.75],
+}
+
+
+# 1. Cached Per-Fold Preprocessing
+def _encode_fold(data, target_column, encoder_params, train_index, test_index):
+    encoder = FeatureEncoder(**encoder_params)
+    X_train = encoder.fit_transform(data.iloc[train_index])
+    X_test = encoder.transform(data.iloc[test_index])
+    y = data[target_column].to_numpy()
+    return X_train, y[train_index], X_test, y[test_index]
+
+
+def encode_folds(data, target_column, encoder_params, cv=5, random_state=42, cache_dir='.tuning_cache'):
+    """
+    Fit the encoder on the training rows of every fold once. The encoded
+    folds are memoized on disk, so a resumed search does not redo them.
+    """
+    encode = joblib.Memory(cache_dir, verbose=0).cache(_encode_fold)
+    folds = KFold(n_splits=cv, shuffle=True, random_state=random_state).split(data)
+    # Shuffle the training rows so that a row budget takes a random subsample
+    rng = np.random.default_rng(random_state)
+    return [encode(data, target_column, encoder_params, rng.permutation(train_index), test_index)
+            for train_index, test_index in folds]
+
+
+# 2. Trial Journal
+def _read_journal(journal_path, search_id):
+    trials = {}
+    if journal_path and Path(journal_path).exists():
+        with open(journal_path) as f:
+            for line in f:
+                trial = json.loads(line)
+                if trial["search_id"] == search_id:
+                    trials[(trial["candidate"], trial["rung"])] = trial
+    return trials
+
+
+def _log_trial(trial, journal_path, mlflow):
+    if journal_path:
+        with open(journal_path, 'a') as f:
+            f.write(json.dumps(trial) + '\n')
+    if mlflow is not None:
+        with mlflow.start_run(run_name=f"candidate-{trial['candidate']}-rung-{trial['rung']}", nested=True):
+            mlflow.log_params({**trial["params"], "resource": trial["resource"]})
+            mlflow.log_metric("mse", trial["mse"])
+            mlflow.log_metric("fit_seconds", trial["fit_seconds"])
+
+
+def search_id(data, settings):
+    """
+    Hash of the data's columns and contents and the search settings; a journal
+    only resumes a search over the same values.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([list(map(str, data.columns)), list(map(str, data.dtypes))]).encode())
+    digest.update(pd.util.hash_pandas_object(data, index=False).to_numpy().tobytes())
+    digest.update(json.dumps(settings, sort_keys=True, default=str).encode())
+    return digest.hexdigest()[:16]
+
+
+# 3. Successive Halving
+def successive_halving_search(data, target_column, encoder_params, param_distributions=PARAM_DISTRIBUTIONS,
+                              n_candidates=20, cv=5, resource="n_estimators", min_resource=25,
+                              max_resource=500, factor=3, random_state=42, n_jobs=-1,
+                              journal_path='tuning_journal.jsonl', cache_dir='.tuning_cache', log_to_mlflow=True):
+    """
+    Run a successive-halving search and return the best parameters, their
+    cross-validated MSE and a DataFrame with every trial.
+
+    `resource` is either "n_estimators" (forests grow from `min_resource`
+    trees) or "n_samples" (forests see `min_resource` training rows per
+    fold); after each rung the budget is multiplied by `factor`, capped at
+    `max_resource`. With the tree budget, the forests of surviving
+    configurations are warm-started so each rung only grows the new trees.
+    """
+    candidates = list(ParameterSampler(param_distributions, n_iter=n_candidates, random_state=random_state))
+    if resource == "n_estimators":
+        candidates = [{k: v for k, v in params.items() if k != "n_estimators"} for params in candidates]
+
+    search = search_id(data, [target_column, encoder_params, candidates, cv, resource, min_resource, max_resource,
+                              factor, random_state])
+    finished = _read_journal(journal_path, search)
+
+    mlflow = None
+    if log_to_mlflow:
+        try:
+            import mlflow
+        except ImportError:
+            mlflow = None
+
+    if mlflow is not None:
+        mlflow.start_run(run_name=f"successive-halving-{search}")
+
+    folds = encode_folds(data, target_column, encoder_params, cv=cv, random_state=random_state, cache_dir=cache_dir)
+    forests = {}  # (candidate, fold) -> warm-started forest of a surviving configuration
+    survivors = list(range(len(candidates)))
+    trials = []
+    rung = 0
+
+    while True:
+        budget = min(max_resource, min_resource * factor ** rung)
+        rung_scores = {}
+
+        for candidate in survivors:
+            trial = finished.get((candidate, rung))
+            if trial is None:
+                start = time.perf_counter()
+                fold_mse = []
+                for fold, (X_train, y_train, X_test, y_test) in enumerate(folds):
+                    if resource == "n_estimators":
+                        forest = forests.get((candidate, fold))
+                        if forest is None:
+                            forest = RandomForestRegressor(random_state=random_state, n_jobs=n_jobs,
+                                                           warm_start=True, **candidates[candidate])
+                        forest.set_params(n_estimators=budget)
+                        forest.fit(X_train, y_train)
+                        forests[(candidate, fold)] = forest
+                    else:
+                        forest = RandomForestRegressor(random_state=random_state, n_jobs=n_jobs,
+                                                       **candidates[candidate])
+                        forest.fit(X_train[:budget], y_train[:budget])
+                    fold_mse.append(mean_squared_error(y_test, forest.predict(X_test)))
+
+                trial = {
+                    "search_id": search,
+                    "candidate": candidate,
+                    "rung": rung,
+                    "resource": budget,
+                    "params": candidates[candidate],
+                    "mse": float(np.mean(fold_mse)),
+                    "fold_mse": [float(m) for m in fold_mse],
+                    "fit_seconds": time.perf_counter() - start,
+                }
+                _log_trial(trial, journal_path, mlflow)
+            trials.append(trial)
+            rung_scores[candidate] = trial["mse"]
+
+        if len(survivors) == 1 or budget >= max_resource:
+            break
+
+        # Keep the best 1/factor configurations and free the forests of the rest
+        n_keep = max(1, math.ceil(len(survivors) / factor))
+        survivors = sorted(survivors, key=lambda c: rung_scores[c])[:n_keep]
+        forests = {key: forest for key, forest in forests.items() if key[0] in survivors}
+        rung += 1
+
+    if mlflow is not None:
+        mlflow.end_run()
+
+    best = min(survivors, key=lambda c: rung_scores[c])
+    best_params = dict(candidates[best])
+    if resource == "n_estimators":
+        best_params["n_estimators"] = budget
+    return best_params, rung_scores[best], pd.DataFrame(trials)
+
+
+if __name__ == '__main__':
+    # The cleaned catalog written by fix_outliers (outliers.output_path in configs/config.yaml)
+    data_path = dataset_path("cleaned_catalog")
+    data = pd.read_parquet(data_path) if data_path.suffix == ".parquet" else pd.read_csv(data_path)
+    encoder_params = {
+        "categorical_columns": CATEGORICAL_COLUMNS,
+        "numeric_columns": data.drop(columns=["Revenue generated"] + CATEGORICAL_COLUMNS)
+                               .select_dtypes(include=['number']).columns.tolist(),
+        "sparse": True,
+        "cyclical_columns": {"Season": ["Winter", "Spring", "Summer", "Fall"]},
+    }
+    best_params, best_mse, trials = successive_halving_search(data, "Revenue generated", encoder_params)
+    print(trials[["candidate", "rung", "resource", "mse", "fit_seconds"]])
+    print(f"Best parameters: {best_params} (cross-validated MSE {best_mse:.4f})")
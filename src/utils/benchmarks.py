@@ -0,0 +1,240 @@
+# benchmarks.py
+#
+# Scaling benchmarks for the simulation, preprocessing and prediction hot
+# paths. Every stage runs at each (SKUs, days) size of the grid and records
+# its best wall time over `repeat` runs, rows per second and the peak
+# memory allocated while it ran (tracemalloc, which numpy and pandas
+# report to). Training and the per-row restock loop run on a prefix of
+# the larger sizes (--max-train-rows, --max-loop-rows). Results are saved
+# as JSON, and a comparison against a stored baseline flags the stages
+# that got slower or bigger.
+#
+#   python -m src.utils.benchmarks --skus 10 100 1000 10000 --days 30 --output bench.json
+#   python -m src.utils.benchmarks --baseline bench.json
+#   python -m src.utils.benchmarks --cold-start
+
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.utils.daily_timeseries_dataset import generate_daily_series
+from src.utils.data_sim import (add_training_targets, predict_horizon, predict_inventory_management,
+                                prepare_training_data, simulate_daily_data, train_model)
+
+DEFAULT_SKUS = [10, 100, 1000, 10000]
+DEFAULT_DAYS = [30]
+
+# Libraries the light CLI commands must not import
+HEAVY_MODULES = ["sklearn", "scipy", "matplotlib", "mlflow", "joblib"]
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+
+
+# 1. Measurement
+def measure(stage, function, rows, repeat=3, **size):
+    """
+    Run `function` `repeat` times and return (result, record) for the best run.
+
+    Peak memory is taken from the first run, wall time is the fastest run.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = function()
+    seconds = [time.perf_counter() - start]
+    peak_mb = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+    tracemalloc.stop()
+
+    for _ in range(repeat - 1):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+
+    best = min(seconds)
+    return result, {"stage": stage, **size, "rows": rows, "seconds": best,
+                    "rows_per_second": rows / best if best > 0 else float("inf"), "peak_mb": peak_mb}
+
+
+def benchmark_size(n_skus, n_days, repeat=3, max_train_rows=20000, max_loop_rows=5000, n_estimators=20, seed=42):
+    """
+    Benchmark every stage at one size; returns one record per stage.
+    """
+    skus = [f"SKU{i}" for i in range(n_skus)]
+    start_date = datetime(2024, 1, 1)
+    end_date = start_date + timedelta(days=n_days - 1)
+    size = {"n_skus": n_skus, "n_days": n_days}
+    n_rows = n_skus * n_days
+    records = []
+
+    simulated, record = measure("simulate_daily_data", lambda: simulate_daily_data(start_date, end_date, skus, seed=seed),
+                                n_rows, repeat, **size)
+    records.append(record)
+
+    # One catalog row per SKU drives the daily series
+    catalog = simulated.iloc[:n_skus]
+    _, record = measure("generate_daily_series",
+                        lambda: generate_daily_series(catalog, start_date=start_date, n_days=n_days, seed=seed),
+                        n_rows, repeat, **size)
+    records.append(record)
+
+    training_data = add_training_targets(simulated.copy(), np.random.default_rng(seed))
+    (X, y, encoder), record = measure("prepare_training_data", lambda: prepare_training_data(training_data),
+                                      n_rows, repeat, **size)
+    records.append(record)
+
+    # Training is by far the slowest stage; large sizes train on a prefix
+    train_rows = min(n_rows, max_train_rows)
+    model, record = measure("train_model",
+                            lambda: train_model(X[:train_rows], y.iloc[:train_rows], n_estimators=n_estimators),
+                            train_rows, repeat=1, **size)
+    records.append(record)
+
+    # So is the per-row restock loop; it only shows the gap to predict_horizon
+    loop_rows = min(n_rows, max_loop_rows)
+    _, record = measure("predict_inventory_management",
+                        lambda: predict_inventory_management(simulated.iloc[:loop_rows], model, encoder), loop_rows,
+                        repeat, **size)
+    records.append(record)
+    _, record = measure("predict_horizon", lambda: predict_horizon(simulated, model, encoder), n_rows, repeat, **size)
+    records.append(record)
+    return records
+
+
+def run_suite(sku_counts=DEFAULT_SKUS, day_counts=DEFAULT_DAYS, repeat=3, max_train_rows=20000,
+              max_loop_rows=5000, n_estimators=20, seed=42):
+    """
+    Benchmark every stage on the (SKUs x days) grid.
+
+    Returns a dict with the environment and one record per stage and size.
+    """
+    results = []
+    for n_days in day_counts:
+        for n_skus in sku_counts:
+            results.extend(benchmark_size(n_skus, n_days, repeat=repeat, max_train_rows=max_train_rows,
+                                          max_loop_rows=max_loop_rows, n_estimators=n_estimators, seed=seed))
+            print(f"Benchmarked {n_skus} SKUs x {n_days} days")
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "machine": platform.machine(),
+        "results": results,
+    }
+
+
+def _imported_modules(argv):
+    # -X importtime lists every module the process imported on stderr
+    result = subprocess.run([sys.executable, "-X", "importtime", "-m", "src", *argv], cwd=PROJECT_ROOT,
+                            capture_output=True, text=True, check=True)
+    lines = [line.split("|")[-1].strip() for line in result.stderr.splitlines() if line.startswith("import time:")]
+    return {line.split(".")[0] for line in lines}
+
+
+def cold_start(repeat=5, n_skus=10):
+    """
+    Cold start time of the supplysim CLI, from process launch to exit.
+
+    Times `--help` and a small `simulate` run in fresh interpreters and
+    records which heavy libraries each one imported; neither should import any.
+    """
+    records = []
+    with tempfile.TemporaryDirectory() as tmp:
+        commands = {
+            "help": ["--help"],
+            "simulate": ["simulate", "--skus", str(n_skus), "--output", str(Path(tmp) / "simulated.csv")],
+        }
+        for name, argv in commands.items():
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                subprocess.run([sys.executable, "-m", "src", *argv], cwd=PROJECT_ROOT, capture_output=True,
+                               check=True)
+                seconds.append(time.perf_counter() - start)
+            heavy = sorted(set(HEAVY_MODULES) & _imported_modules(argv))
+            records.append({"command": name, "seconds": min(seconds), "heavy_modules": heavy})
+    return records
+
+
+# 2. Results
+def save_results(results, path):
+    with open(path, "w") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def compare(results, baseline, tolerance=0.2, min_seconds=0.05, min_mb=1.0):
+    """
+    Compare two benchmark results stage by stage and size by size.
+
+    A stage regressed when its time or peak memory grew by more than
+    `tolerance` (a fraction); timings under `min_seconds` and peaks under
+    `min_mb` in both runs are too noisy to judge and never flag a regression.
+    """
+    keys = ["stage", "n_skus", "n_days"]
+    current = pd.DataFrame(results["results"]).set_index(keys)
+    previous = pd.DataFrame(baseline["results"]).set_index(keys)
+    joined = current[["seconds", "peak_mb"]].join(previous[["seconds", "peak_mb"]], rsuffix="_baseline",
+                                                  how="inner")
+
+    joined["time_ratio"] = joined["seconds"] / joined["seconds_baseline"]
+    joined["memory_ratio"] = joined["peak_mb"] / joined["peak_mb_baseline"]
+    measurable = joined[["seconds", "seconds_baseline"]].max(axis=1) >= min_seconds
+    joined["time_regression"] = measurable & (joined["time_ratio"] > 1 + tolerance)
+    sizable = joined[["peak_mb", "peak_mb_baseline"]].max(axis=1) >= min_mb
+    joined["memory_regression"] = sizable & (joined["memory_ratio"] > 1 + tolerance)
+    joined["regression"] = joined["time_regression"] | joined["memory_regression"]
+    return joined.reset_index()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Scaling benchmarks for the supply chain simulation")
+    parser.add_argument("--skus", type=int, nargs="+", default=DEFAULT_SKUS)
+    parser.add_argument("--days", type=int, nargs="+", default=DEFAULT_DAYS)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-train-rows", type=int, default=20000)
+    parser.add_argument("--max-loop-rows", type=int, default=5000)
+    parser.add_argument("--n-estimators", type=int, default=20)
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="compare against this JSON file and exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2)
+    parser.add_argument("--cold-start", action="store_true",
+                        help="only time the CLI cold start and exit 1 if a light command imports a heavy library")
+    args = parser.parse_args(argv)
+
+    if args.cold_start:
+        records = cold_start(repeat=args.repeat)
+        print(pd.DataFrame(records).to_string(index=False))
+        return 1 if any(record["heavy_modules"] for record in records) else 0
+
+    results = run_suite(args.skus, args.days, repeat=args.repeat, max_train_rows=args.max_train_rows,
+                        max_loop_rows=args.max_loop_rows, n_estimators=args.n_estimators)
+    if args.output:
+        save_results(results, args.output)
+
+    with pd.option_context("display.width", 200, "display.max_columns", None, "display.max_rows", None):
+        print(pd.DataFrame(results["results"]))
+        if args.baseline:
+            comparison = compare(results, load_results(args.baseline), tolerance=args.tolerance)
+            print(comparison)
+            regressions = comparison[comparison["regression"]]
+            if len(regressions):
+                print(f"{len(regressions)} regressions beyond {args.tolerance:.0%}")
+                return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,23 @@
+# config.py
+#
+# Loader for configs/config.yaml.
+
+from pathlib import Path
+
+import yaml
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+CONFIG_PATH = PROJECT_ROOT / 'configs' / 'config.yaml'
+
+
+def load_config(path=CONFIG_PATH):
+    with open(path) as f:
+        return yaml.safe_load(f) or {}
+
+
+def resolve_path(path):
+    """
+    Resolve a path from the config relative to the project root.
+    """
+    path = Path(path)
+    return path if path.is_absolute() else PROJECT_ROOT / path
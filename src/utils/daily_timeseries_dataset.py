@@ -2,81 +2,96 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 
-# Load the cleaned dataset
-file_path = 'S:/SJSU/DATA_226/group_project/data/processed/cleaned_improved_dataset.csv'
-data = pd.read_csv(file_path)
-
-# Function to generate daily time-series data
-def generate_daily_data(record):
-    daily_data = []
-    current_date = datetime.now() - timedelta(days=60)  # Start 30 days ago
-    stock_level = 1000000  # Initial stock level from the dataset
-    daily_sales_avg = record["Number of products sold"]  # Average daily sales from the dataset
-    demand_factor = record["Demand Factor"]  # Demand multiplier for variability
-
-    # Set to keep track of generated dates to avoid duplicates
-    generated_dates = set()
-
-    for day in range(30):
-        date = current_date + timedelta(days=day)
-        date_str = date.strftime("%Y-%m-%d")
-
-        if date_str in generated_dates:
-            continue  # Skip if the date is already in the set
-
-        generated_dates.add(date_str)  # Add the date to the set
-
-        # Simulate daily sales with randomness and the demand factor
-        daily_sales = max(0, np.random.poisson(daily_sales_avg * demand_factor))
-        stock_level = max(0, stock_level - daily_sales)  # Ensure stock level doesn't go negative
-
-        # Create a daily record
-        daily_record = {
-            "Date": date_str,
-            "Product type": record["Product type"],
-            "SKU": record["SKU"],
-            "Daily Sales": daily_sales,
-            "Stock Level": stock_level,
-            "Price": record["Price"],
-            "Revenue Generated": daily_sales * record["Price"],  # Calculate daily revenue
-            "Season": record["Season"],
-            "Demand Factor": record["Demand Factor"]
-        }
-        daily_data.append(daily_record)
-
-    return daily_data
-
-# Generate daily data for each product in the dataset
-all_daily_data = []
-for index, record in data.iterrows():
-    all_daily_data.extend(generate_daily_data(record))
-
-# Convert to DataFrame
-daily_df = pd.DataFrame(all_daily_data)
-# Remove duplicates based on 'Date' and 'SKU' columns
-daily_df = daily_df.drop_duplicates(subset=["Date", "SKU"])
-
-# Save to a new CSV file
-daily_df.to_csv('daily_time_series_data_cleaned.csv', index=False)
-
-# Display the first few rows
-print(daily_df.head())
-
-# Save to a new CSV file
-daily_df.to_csv('daily_time_series_data_with_seasonal_effects.csv', index=False)
-
-# Display the first few rows
-print(daily_df.head())
-
-# Check for duplicates: Same SKU and same Date
-duplicates = daily_df.duplicated(subset=["SKU", "Date"], keep=False)
-
-# Display rows that are duplicates
-duplicate_rows = daily_df[duplicates]
-
-# Check if there are any duplicates and print the result
-if not duplicate_rows.empty:
-    print("Duplicate entries found for the same SKU on the same date:")
-    print(duplicate_rows)
-else:
-    print("No duplicate entries found for the same SKU on the same date.")
\ No newline at end of file
+from src.etl.extract import available_path
+from src.utils.config import load_config, resolve_path
+
+# Path of the cleaned dataset
+DEFAULT_INPUT_PATH = 'data/processed/cleaned_improved_dataset.parquet'
+
+# Generate daily time-series data for every product in the dataset
+def generate_daily_series(data, start_date=None, n_days=30, initial_stock=1000000, seed=None, rng=None):
+    """
+    Build `n_days` of daily sales and stock levels for every product in `data`.
+
+    Sales for all products and days are drawn as one (products x days)
+    Poisson matrix with rate "Number of products sold" * "Demand Factor",
+    and stock levels are the clipped cumulative sum of sales subtracted from
+    `initial_stock` (a scalar, or one value per SKU in order of first
+    appearance). The series starts at `start_date` (60 days ago when None).
+    Only the first record of each SKU is kept, which is what dropping
+    duplicate (Date, SKU) rows from the full result used to do.
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+    if start_date is None:
+        start_date = datetime.now() - timedelta(days=60)
+
+    data = data.drop_duplicates(subset=["SKU"])
+    dates = pd.date_range(pd.Timestamp(start_date).normalize(), periods=n_days, freq='D')
+    n_products = len(data)
+
+    # Simulate daily sales with randomness and the demand factor
+    demand = (data["Number of products sold"] * data["Demand Factor"]).to_numpy(dtype=np.float64)
+    daily_sales = rng.poisson(demand[:, None], size=(n_products, n_days))
+    # Stock only ever goes down, so clipping the running total at zero is the
+    # same as clipping after every day
+    initial_stock = np.asarray(initial_stock)
+    if initial_stock.ndim == 1:
+        initial_stock = initial_stock[:, None]
+    stock_level = np.maximum(0, initial_stock - np.cumsum(daily_sales, axis=1))
+
+    # Text columns are repeated as category codes rather than Python strings
+    def repeat_categorical(column):
+        values = pd.Categorical(data[column])
+        return pd.Categorical.from_codes(np.repeat(values.codes, n_days), categories=values.categories)
+
+    price = data["Price"].to_numpy()
+    return pd.DataFrame({
+        "Date": np.tile(dates.values, n_products),
+        "Product type": repeat_categorical("Product type"),
+        "SKU": repeat_categorical("SKU"),
+        "Daily Sales": daily_sales.ravel(),
+        "Stock Level": stock_level.ravel(),
+        "Price": np.repeat(price, n_days),
+        "Revenue Generated": (daily_sales * price[:, None]).ravel(),  # Calculate daily revenue
+        "Season": repeat_categorical("Season"),
+        "Demand Factor": np.repeat(data["Demand Factor"].to_numpy(), n_days),
+    })
+
+def main(config=None):
+    # Input, output and horizon come from the "generate_daily" section of configs/config.yaml
+    config = config if config is not None else load_config().get("generate_daily", {})
+    # The tracked CSV stands in for the cleaned catalog until `clean` has run
+    input_path = available_path(config.get("input_path", DEFAULT_INPUT_PATH), "cleaned_catalog")
+    output_path = resolve_path(config.get("output_path", "daily_time_series_data_cleaned.csv"))
+    seasonal_output_path = resolve_path(config.get("seasonal_output_path",
+                                                   "daily_time_series_data_with_seasonal_effects.csv"))
+
+    data = pd.read_parquet(input_path) if input_path.suffix == ".parquet" else pd.read_csv(input_path)
+    daily_df = generate_daily_series(data, start_date=config.get("start_date"), n_days=config.get("n_days", 30),
+                                     seed=config.get("seed"))
+
+    # Save to a new CSV file
+    daily_df.to_csv(output_path, index=False)
+
+    # Display the first few rows
+    print(daily_df.head())
+
+    # Save to a new CSV file
+    daily_df.to_csv(seasonal_output_path, index=False)
+
+    # Check for duplicates: Same SKU and same Date
+    duplicates = daily_df.duplicated(subset=["SKU", "Date"], keep=False)
+
+    # Display rows that are duplicates
+    duplicate_rows = daily_df[duplicates]
+
+    # Check if there are any duplicates and print the result
+    if not duplicate_rows.empty:
+        print("Duplicate entries found for the same SKU on the same date:")
+        print(duplicate_rows)
+    else:
+        print("No duplicate entries found for the same SKU on the same date.")
+
+if __name__ == '__main__':
+    main()
@@ -2,115 +2,242 @@
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
-import matplotlib.pyplot as plt
-from sklearn.preprocessing import StandardScaler
-from sklearn.preprocessing import LabelEncoder
-from sklearn.multioutput import MultiOutputRegressor
-from sklearn.ensemble import RandomForestRegressor
+from datetime import datetime
+from pathlib import Path
+import os
+import shutil
+import sys
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+from src.etl.aggregates import PredictionAggregates
+from src.etl.load import DEFAULT_DATABASE, SkuDateStore
+from src.models.model_cache import DEFAULT_CACHE_DIR, ModelCache
+from src.utils.instrumentation import setup_stage_log, stage
 
 # 1. Data Simulation Function
-def simulate_daily_data(start_date, end_date, skus):
+# Column layout of the simulated data: (name, distribution, parameters).
+# "choice" columns are drawn as category codes, "integers" use an exclusive
+# upper bound like np.random.randint.
+SIMULATED_COLUMNS = [
+    ("Product type", "choice", ["haircare", "skincare"]),
+    ("SKU", "sku", None),
+    ("Price", "uniform", (20.0, 100.0)),
+    ("Availability", "integers", (50, 150)),
+    ("Number of products sold", "integers", (10, 70)),
+    ("Customer demographics", "choice", ["Female", "Male", "Non-binary", "Unknown"]),
+    ("Stock levels", "integers", (20, 100)),
+    ("Lead times", "integers", (1, 15)),
+    ("Order quantities", "integers", (10, 50)),
+    ("Shipping times", "integers", (1, 7)),
+    ("Shipping carriers", "choice", ["Carrier A", "Carrier B", "Carrier C"]),
+    ("Shipping costs", "uniform", (10.0, 30.0)),
+    ("Supplier name", "choice", ["Supplier 1", "Supplier 2", "Supplier 3", "Supplier 4"]),
+    ("Location", "choice", ["Delhi", "Mumbai", "Kolkata", "Bangalore"]),
+    ("Production volumes", "integers", (400, 1000)),
+    ("Manufacturing lead time", "integers", (5, 20)),
+    ("Manufacturing costs", "uniform", (30.0, 70.0)),
+    ("Inspection results", "choice", ["Pass", "Fail", "Pending"]),
+    ("Defect rates", "uniform", (0.5, 3.0)),
+    ("Transportation modes", "choice", ["Air", "Road", "Rail"]),
+    ("Routes", "choice", ["Route A", "Route B", "Route C"]),
+    ("Costs", "uniform", (150.0, 350.0)),
+    ("Season", "choice", ["Spring", "Summer", "Fall", "Winter"]),
+    ("Demand Factor", "uniform", (0.8, 1.5)),
+]
+
+
+def simulate_daily_data(start_date, end_date, skus, seed=None, rng=None):
+    """
+    Simulate one row per (date, SKU), ordered by date and then SKU.
+
+    Every column is drawn for all cells in a single call on a
+    np.random.Generator, so the output is reproducible from `seed`
+    (or from the state of `rng` when one is passed in).
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+
     date_range = pd.date_range(start=start_date, end=end_date, freq='D')
-    simulated_data = []
-
-    for current_date in date_range:
-        for sku in skus:
-            daily_data = {
-                "Date": current_date,
-                "Product type": np.random.choice(["haircare", "skincare"]),
-                "SKU": sku,
-                "Price": np.random.uniform(20.0, 100.0),
-                "Availability": np.random.randint(50, 150),
-                "Number of products sold": np.random.randint(10, 70),
-                "Customer demographics": np.random.choice(["Female", "Male", "Non-binary", "Unknown"]),
-                "Stock levels": np.random.randint(20, 100),
-                "Lead times": np.random.randint(1, 15),
-                "Order quantities": np.random.randint(10, 50),
-                "Shipping times": np.random.randint(1, 7),
-                "Shipping carriers": np.random.choice(["Carrier A", "Carrier B", "Carrier C"]),
-                "Shipping costs": np.random.uniform(10.0, 30.0),
-                "Supplier name": np.random.choice(["Supplier 1", "Supplier 2", "Supplier 3", "Supplier 4"]),
-                "Location": np.random.choice(["Delhi", "Mumbai", "Kolkata", "Bangalore"]),
-                "Production volumes": np.random.randint(400, 1000),
-                "Manufacturing lead time": np.random.randint(5, 20),
-                "Manufacturing costs": np.random.uniform(30.0, 70.0),
-                "Inspection results": np.random.choice(["Pass", "Fail", "Pending"]),
-                "Defect rates": np.random.uniform(0.5, 3.0),
-                "Transportation modes": np.random.choice(["Air", "Road", "Rail"]),
-                "Routes": np.random.choice(["Route A", "Route B", "Route C"]),
-                "Costs": np.random.uniform(150.0, 350.0),
-                "Season": np.random.choice(["Spring", "Summer", "Fall", "Winter"]),
-                "Demand Factor": np.random.uniform(0.8, 1.5)
-            }
-            simulated_data.append(daily_data)
-
-    return pd.DataFrame(simulated_data)
+    sku_codes, sku_categories = pd.factorize(pd.Index(skus))
+    n_rows = len(date_range) * len(sku_codes)
+
+    columns = {"Date": np.repeat(date_range.values, len(sku_codes))}
+    for name, kind, params in SIMULATED_COLUMNS:
+        if kind == "sku":
+            columns[name] = pd.Categorical.from_codes(np.tile(sku_codes, len(date_range)), categories=sku_categories)
+        elif kind == "choice":
+            codes = rng.integers(0, len(params), size=n_rows, dtype=np.int8)
+            columns[name] = pd.Categorical.from_codes(codes, categories=params)
+        elif kind == "integers":
+            columns[name] = rng.integers(params[0], params[1], size=n_rows, dtype=np.int64)
+        else:
+            columns[name] = rng.uniform(params[0], params[1], size=n_rows)
+
+    return pd.DataFrame(columns)
 
 # 2. Generate Simulated Data for Model Training
-def generate_training_data():
+def generate_training_data(seed=None):
     # For simplicity, we'll simulate training data similar to the daily data
+    rng = np.random.default_rng(seed)
     skus = ["SKU" + str(i) for i in range(1, 46)]  # 45 SKUs for training
     start_date = datetime(2022, 1, 1)
     end_date = datetime(2022, 12, 31)  # One year of data
 
-    training_data = simulate_daily_data(start_date, end_date, skus)
+    training_data = simulate_daily_data(start_date, end_date, skus, rng=rng)
+    return add_training_targets(training_data, rng)
 
+def add_training_targets(training_data, rng):
     # Add target variables for training
-    training_data['Restock Indicator'] = np.random.randint(0, 2, size=len(training_data))
-    training_data['Restock Date (days)'] = np.random.randint(5, 15, size=len(training_data))
-    training_data['Restock Quantity'] = np.random.randint(10, 100, size=len(training_data))
-    training_data['Predicted Costs'] = np.random.uniform(200.0, 500.0, size=len(training_data))
+    training_data['Restock Indicator'] = rng.integers(0, 2, size=len(training_data))
+    training_data['Restock Date (days)'] = rng.integers(5, 15, size=len(training_data))
+    training_data['Restock Quantity'] = rng.integers(10, 100, size=len(training_data))
+    training_data['Predicted Costs'] = rng.uniform(200.0, 500.0, size=len(training_data))
 
     return training_data
 
+# 2b. Streaming Simulation
+def iter_daily_data(start_date, end_date, skus, chunk_days=7, chunk_skus=None, seed=None, rng=None):
+    """
+    Yield the simulation as a sequence of DataFrames instead of one frame.
+
+    Each chunk covers `chunk_days` dates and at most `chunk_skus` SKUs
+    (all SKUs when None), so memory stays bounded by the chunk size no
+    matter how long the period or how many SKUs are simulated. Chunks are
+    yielded window of dates by window of dates, and within a window SKU
+    chunk by SKU chunk, so concatenated chunks are in the date-major order
+    of simulate_daily_data after a stable sort by date (already when
+    `chunk_days` is 1 or `chunk_skus` is None). The output is reproducible
+    for a given seed and chunk layout.
+    """
+    if rng is None:
+        rng = np.random.default_rng(seed)
+
+    date_range = pd.date_range(start=start_date, end=end_date, freq='D')
+    skus = list(skus)
+    chunk_skus = chunk_skus or len(skus)
+
+    for i in range(0, len(date_range), chunk_days):
+        chunk_dates = date_range[i:i + chunk_days]
+        for j in range(0, len(skus), chunk_skus):
+            yield simulate_daily_data(chunk_dates[0], chunk_dates[-1], skus[j:j + chunk_skus], rng=rng)
+
+def iter_training_data(chunk_days=7, chunk_skus=None, seed=None):
+    """
+    Streaming counterpart of generate_training_data.
+    """
+    rng = np.random.default_rng(seed)
+    skus = ["SKU" + str(i) for i in range(1, 46)]
+    for chunk in iter_daily_data(datetime(2022, 1, 1), datetime(2022, 12, 31), skus,
+                                 chunk_days=chunk_days, chunk_skus=chunk_skus, rng=rng):
+        yield add_training_targets(chunk, rng)
+
+def write_partitioned(chunks, output_dir, file_format='parquet', prefix=None):
+    """
+    Write DataFrame chunks to date-partitioned files under `output_dir`.
+
+    Rows land in `output_dir/date=YYYY-MM-DD/part-NNNNN.<ext>`, one file per
+    chunk and date, using Parquet or Arrow IPC (`file_format='arrow'`).
+    A partition is cleared the first time this run writes to it, so a rerun
+    replaces its dates instead of appending duplicates. With a `prefix`,
+    files are named `<prefix>-NNNNN.<ext>` and only files with the same
+    name are replaced, which lets several writers share a partition.
+    Returns the number of rows written.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    extension = {'parquet': 'parquet', 'arrow': 'arrow'}[file_format]
+    output_dir = Path(output_dir)
+    cleared = set()
+    rows_written = 0
+
+    for part, chunk in enumerate(chunks):
+        if chunk.empty:
+            continue
+        table = pa.Table.from_pandas(chunk, preserve_index=False)
+        dates = chunk['Date'].to_numpy()
+        # Chunks are date-major, so every date is one contiguous slice
+        boundaries = np.flatnonzero(dates[1:] != dates[:-1]) + 1
+        starts = np.concatenate(([0], boundaries))
+        stops = np.concatenate((boundaries, [len(dates)]))
+
+        for start, stop in zip(starts, stops):
+            partition = output_dir / f"date={pd.Timestamp(dates[start]):%Y-%m-%d}"
+            if partition not in cleared:
+                if prefix is None and partition.exists():
+                    shutil.rmtree(partition)
+                partition.mkdir(parents=True, exist_ok=True)
+                cleared.add(partition)
+
+            file_path = partition / f"{prefix or 'part'}-{part:05d}.{extension}"
+            # Write next to the target and rename, so readers never see a partial file
+            staging_path = partition / f".{file_path.name}.tmp"
+            date_slice = table.slice(start, stop - start)
+            if file_format == 'parquet':
+                pq.write_table(date_slice, staging_path)
+            else:
+                with pa.OSFile(str(staging_path), 'wb') as sink, pa.ipc.new_file(sink, date_slice.schema) as writer:
+                    writer.write_table(date_slice)
+            os.replace(staging_path, file_path)
+            rows_written += date_slice.num_rows
+
+    return rows_written
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MB.
+    """
+    if resource is None:
+        return float('nan')
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+    return peak / 1024 ** 2 if sys.platform == 'darwin' else peak / 1024
+
+def simulate_to_files(start_date, end_date, skus, output_dir, chunk_days=7, chunk_skus=None,
+                      seed=None, file_format='parquet'):
+    """
+    Stream a simulation straight to date-partitioned files and report peak RSS.
+    """
+    chunks = iter_daily_data(start_date, end_date, skus, chunk_days=chunk_days,
+                             chunk_skus=chunk_skus, seed=seed)
+    rows_written = write_partitioned(chunks, output_dir, file_format=file_format)
+    print(f"Wrote {rows_written} rows to {output_dir} (peak RSS {peak_rss_mb():.1f} MB)")
+    return rows_written
+
 # 3. Prepare Data for Model Training
 def prepare_training_data(training_data):
     # Drop unnecessary columns
     X = training_data.drop(columns=['Date', 'SKU', 'Restock Indicator', 'Restock Date (days)', 'Restock Quantity', 'Predicted Costs'])
     y = training_data[['Restock Indicator', 'Restock Date (days)', 'Restock Quantity', 'Predicted Costs']]
 
-    # Identify categorical and numerical columns
-    categorical_columns = X.select_dtypes(include=['object']).columns.tolist()
-    numeric_columns = X.select_dtypes(include=['int64', 'float64']).columns.tolist()
-
-    # One-hot encode categorical columns
-    X_encoded = pd.get_dummies(X, columns=categorical_columns, drop_first=True)
+    from src.models.encoder import FeatureEncoder
 
-    # Standardize numeric columns
-    scaler = StandardScaler()
-    X_encoded[numeric_columns] = scaler.fit_transform(X_encoded[numeric_columns])
+    # One-hot encode categorical columns and standardize numeric columns
+    encoder = FeatureEncoder()
+    X_encoded = encoder.fit_transform(X)
 
-    return X_encoded, y, scaler, categorical_columns, numeric_columns
+    return X_encoded, y, encoder
 
 # 4. Train the Model
-def train_model(X, y):
-    # Use a Random Forest Regressor as the base estimator
-    base_estimator = RandomForestRegressor(n_estimators=100, random_state=42)
-    multi_output_model = MultiOutputRegressor(base_estimator)
+def train_model(X, y, backend="forest", n_jobs=-1, **params):
+    # sklearn is only imported by the commands that train
+    from src.models.backends import make_model
+
+    # A single forest predicting all four targets, fitted on every core by
+    # default; see src/models/backends.py for the alternatives
+    multi_output_model = make_model(backend, n_jobs=n_jobs, **params)
     multi_output_model.fit(X, y)
     return multi_output_model
 
 # 5. Prediction Function
-def predict_inventory_management(new_data, multi_output_model, X_columns, scaler, categorical_columns, numeric_columns):
+def predict_inventory_management(new_data, multi_output_model, encoder):
     """
     Predict warehouse metrics for multiple SKUs using the trained multi-output model.
     """
-    # One-hot encode new data and align it with training data
-    new_data_encoded = pd.get_dummies(new_data, columns=categorical_columns, drop_first=True)
-    
-    # Identify and add any missing columns to match the training data
-    missing_cols = list(set(X_columns) - set(new_data_encoded.columns))
-    # Create a DataFrame of zeros for missing columns and concatenate
-    if missing_cols:
-        missing_df = pd.DataFrame(0, index=new_data_encoded.index, columns=missing_cols)
-        new_data_encoded = pd.concat([new_data_encoded, missing_df], axis=1)
-    
-    # Reorder columns to match the training set
-    new_data_encoded = new_data_encoded[X_columns]
-
-    # Standardize numeric columns
-    new_data_encoded[numeric_columns] = scaler.transform(new_data_encoded[numeric_columns])
+    # The fitted encoder always produces the training column layout
+    new_data_encoded = encoder.transform(new_data)
 
     # Make predictions
     predictions = multi_output_model.predict(new_data_encoded)
@@ -129,97 +256,139 @@ def predict_inventory_management(new_data, multi_output_model, X_columns, scaler
 
     return inventory_metrics
 
-# 6. Main Function to Run the Simulation
-def main():
-    # Generate and prepare training data
-    training_data = generate_training_data()
-    X, y, scaler, categorical_columns, numeric_columns = prepare_training_data(training_data)
-
-    # Train the model
-    multi_output_model = train_model(X, y)
-    X_columns = X.columns  # Save column names for aligning during prediction
-
-    # Define the SKUs to simulate
-    skus = ["SKU47", "SKU48", "SKU49", "SKU50"]
-
-    # Define the simulation period
-    start_date = datetime(2023, 1, 1)
-    end_date = datetime(2023, 1, 31)  # Simulate for one month
-
-    # Simulate daily data for the entire period
-    simulated_data = simulate_daily_data(start_date, end_date, skus)
+def predict_horizon(simulated_data, multi_output_model, encoder, block_size=None):
+    """
+    Predict warehouse metrics for every (Date, SKU) row of a simulation at once.
 
+    Rows are encoded and predicted in blocks of `block_size` rows (all rows
+    in a single model.predict call when None) and the result is returned as
+    a DataFrame with the same columns as the day-by-day path.
+    """
+    block_size = block_size or max(len(simulated_data), 1)
+    predictions = np.vstack([
+        multi_output_model.predict(encoder.transform(simulated_data.iloc[start:start + block_size]))
+        for start in range(0, len(simulated_data), block_size)
+    ]) if len(simulated_data) else np.empty((0, 4))
+
+    # np.rint rounds half to even, like the built-in round
+    return pd.DataFrame({
+        "SKU": simulated_data["SKU"].to_numpy(),
+        "Restock Indicator": np.rint(predictions[:, 0]).astype(np.int64),
+        "Restock Date (days)": np.rint(predictions[:, 1]).astype(np.int64),
+        "Restock Quantity": np.rint(predictions[:, 2]).astype(np.int64),
+        "Predicted Costs": np.round(predictions[:, 3], 2),
+        "Date": simulated_data["Date"].to_numpy(),
+        "Product type": simulated_data["Product type"].to_numpy(),
+    })
+
+def predict_day_by_day(simulated_data, multi_output_model, encoder):
+    """
+    Reference implementation of predict_horizon that walks the simulation one day at a time.
+    """
     # Initialize a list to store all daily predictions
     daily_predictions = []
 
     # Process data day by day
-    current_date = start_date
-    while current_date <= end_date:
+    for current_date in pd.unique(simulated_data['Date']):
         # Get data for the current day
         daily_data = simulated_data[simulated_data['Date'] == current_date]
 
-        if not daily_data.empty:
-            # Drop the 'Date' column for prediction
-            prediction_data = daily_data.drop(columns=['Date']).reset_index(drop=True)
+        # Drop the 'Date' column for prediction
+        prediction_data = daily_data.drop(columns=['Date']).reset_index(drop=True)
+
+        # Generate predictions for the day
+        predictions = predict_inventory_management(prediction_data, multi_output_model, encoder)
 
-            # Generate predictions for the day
-            predictions = predict_inventory_management(
-                prediction_data, multi_output_model, X_columns, scaler, categorical_columns, numeric_columns
+        # Add the date to each prediction
+        for i, prediction in enumerate(predictions):
+            prediction['Date'] = current_date
+            prediction['Product type'] = daily_data.iloc[i]['Product type']
+            daily_predictions.append(prediction)
+
+    return pd.DataFrame(daily_predictions)
+
+# 6. Main Function to Run the Simulation
+def main(seed=None, cache_dir=DEFAULT_CACHE_DIR, database=":memory:"):
+    # Independent streams for the training data and the simulation period
+    training_seed, simulation_seed = np.random.SeedSequence(seed).spawn(2)
+
+    # Generate and prepare training data
+    with stage("generate_training_data") as record:
+        training_data = generate_training_data(training_seed)
+        record["rows"] = len(training_data)
+    with stage("prepare_training_data", rows=len(training_data)):
+        X, y, encoder = prepare_training_data(training_data)
+
+    # Train the model, or reuse the cached one when the training data, the
+    # encoder and the hyperparameters are unchanged. Without a seed every run
+    # trains on new data, so its entry could never be hit again
+    model_params = {"backend": "forest"}
+    with stage("train_model", rows=len(training_data)) as record:
+        if cache_dir and seed is not None:
+            multi_output_model, cache_hit = ModelCache(cache_dir).get_or_fit(
+                training_data, encoder, model_params, lambda: train_model(X, y, **model_params)
             )
+            record["cache_hit"] = cache_hit
+            print(f"Model cache {'hit' if cache_hit else 'miss'}")
+        else:
+            multi_output_model = train_model(X, y, **model_params)
 
-            # Add the date to each prediction
-            for i, prediction in enumerate(predictions):
-                prediction['Date'] = current_date
-                prediction['Product type'] = daily_data.iloc[i]['Product type']
-                daily_predictions.append(prediction)
+    # Define the SKUs to simulate
+    skus = ["SKU47", "SKU48", "SKU49", "SKU50"]
 
-        # Move to the next day
-        current_date += timedelta(days=1)
+    # Define the simulation period
+    start_date = datetime(2023, 1, 1)
+    end_date = datetime(2023, 1, 31)  # Simulate for one month
 
-    # Convert daily_predictions to a DataFrame
-    predictions_df = pd.DataFrame(daily_predictions)
+    # Simulate daily data for the entire period
+    with stage("simulate_daily_data") as record:
+        simulated_data = simulate_daily_data(start_date, end_date, skus, seed=simulation_seed)
+        record["rows"] = len(simulated_data)
+
+    # Predict the whole horizon in one batch
+    with stage("predict_horizon", rows=len(simulated_data)):
+        predictions_df = predict_horizon(simulated_data, multi_output_model, encoder)
 
-    # Aggregate weekly predictions
     predictions_df['Date'] = pd.to_datetime(predictions_df['Date'])
     predictions_df['Week'] = predictions_df['Date'].dt.isocalendar().week
 
-    weekly_predictions = predictions_df.groupby(['Week', 'SKU']).agg({
-        'Restock Indicator': 'sum',
-        'Restock Date (days)': 'mean',
-        'Restock Quantity': 'sum',
-        'Predicted Costs': 'sum',
-        'Product type': 'first'
-    }).reset_index()
-
-    weekly_predictions = weekly_predictions.sort_values(by=['Week', 'SKU'])
+    # Merge the new daily predictions into the materialized (ISO year, week)
+    # aggregates, replacing earlier predictions of the same days, and read the
+    # weekly report of this run's days back from them
+    with stage("aggregate_weekly", rows=len(predictions_df)), SkuDateStore(database) as store:
+        aggregates = PredictionAggregates(store)
+        aggregates.add(predictions_df)
+        weekly_predictions = aggregates.weekly(skus, start_date, end_date)
 
     # Save the results to CSV files (optional)
-    simulated_data.to_csv('simulated_data.csv', index=False)
-    predictions_df.to_csv('daily_predictions.csv', index=False)
-    weekly_predictions.to_csv('weekly_predictions.csv', index=False)
+    with stage("write_csv", rows=len(simulated_data) + len(predictions_df) + len(weekly_predictions)):
+        simulated_data.to_csv('simulated_data.csv', index=False)
+        predictions_df.to_csv('daily_predictions.csv', index=False)
+        weekly_predictions.to_csv('weekly_predictions.csv', index=False)
 
     # Print the weekly predictions
     print("Weekly Predictions:")
     print(weekly_predictions)
 
     # Visualize the results
-    visualize_results(weekly_predictions, skus)
+    with stage("visualize_results", rows=len(weekly_predictions)):
+        visualize_results(weekly_predictions, skus)
 
 # 7. Visualization Function
-def visualize_results(weekly_predictions, skus):
-    # Plot Restock Quantity per SKU over Weeks
-    plt.figure(figsize=(10, 6))
-    for sku in skus:
-        sku_data = weekly_predictions[weekly_predictions['SKU'] == sku]
-        plt.plot(sku_data['Week'], sku_data['Restock Quantity'], marker='o', label=sku)
-
-    plt.xlabel('Week Number')
-    plt.ylabel('Total Restock Quantity')
-    plt.title('Weekly Restock Quantity per SKU')
-    plt.legend()
-    plt.grid(True)
-    plt.show()
+def visualize_results(weekly_predictions, skus, output_path="reports/figures/weekly_restock_quantity.png"):
+    """
+    Plot Restock Quantity per SKU over Weeks into `output_path`; with many
+    SKUs the figure shows quantile bands instead of one line per SKU.
+    """
+    from src.utils.config import resolve_path
+    from src.visualization.rendering import render_figure, series_panel
+
+    weekly_predictions = weekly_predictions[weekly_predictions['SKU'].isin(skus)]
+    panel = series_panel(weekly_predictions, 'Week', 'Restock Quantity', title='Weekly Restock Quantity per SKU',
+                         xlabel='Week Number', ylabel='Total Restock Quantity', marker='o')
+    return render_figure([panel], resolve_path(output_path))
 
 # Run the main function
 if __name__ == '__main__':
-    main()
+    setup_stage_log()
+    main(seed=42, database=DEFAULT_DATABASE)
@@ -1,35 +1,123 @@
 # Import necessary libraries
-import pandas as pd
 import numpy as np
-from scipy import stats
-
-# Load the dataset from the CSV file
-file_path = 'S:/SJSU/DATA_226/group_project/data/raw/improved_dataset.csv'
-data = pd.read_csv(file_path)
-
-# 1. Handling Outliers Using Z-score Method
-# We'll cap the outliers in "Number of products sold", "Revenue generated", and "Stock levels"
-z_scores = stats.zscore(data[["Number of products sold", "Revenue generated", "Stock levels"]])
-threshold = 3
-
-# Cap the outliers beyond the threshold
-for column in ["Number of products sold", "Revenue generated", "Stock levels"]:
-    upper_limit = data[column].mean() + threshold * data[column].std()
-    lower_limit = data[column].mean() - threshold * data[column].std()
-    data[column] = np.where(data[column] > upper_limit, upper_limit, data[column])
-    data[column] = np.where(data[column] < lower_limit, lower_limit, data[column])
-
-# 2. Transform Skewed Variables
-# Applying log transformation to reduce skewness in "Revenue generated" and "Stock levels"
-data["Revenue generated"] = np.log1p(data["Revenue generated"])  # log1p to handle zero values
-data["Stock levels"] = np.log1p(data["Stock levels"])
-
-# 3. Dropping Redundant Features
-# Removing "Lead time" due to perfect correlation with "Lead times"
-data = data.drop(columns=["Lead time"])
-
-# Save the cleaned dataset to a new CSV file
-cleaned_file_path = 'cleaned_improved_dataset.csv'
-data.to_csv(cleaned_file_path, index=False)
-
-cleaned_file_path
+import pandas as pd
+
+from src.utils.config import load_config, resolve_path
+from src.utils.instrumentation import setup_stage_log, stage
+
+def read_chunks(file_path, columns=None, chunksize=100000):
+    """
+    Read a CSV or Parquet file in chunks of at most `chunksize` rows.
+    """
+    if str(file_path).endswith('.parquet'):
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(file_path).iter_batches(batch_size=chunksize, columns=columns):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(file_path, usecols=columns, chunksize=chunksize)
+
+# 1. Streaming Column Statistics
+# The first pass reads the dataset chunk by chunk and merges per-chunk
+# count, mean and sum of squared deviations (Chan et al.), which stays
+# numerically stable without ever holding the whole file in memory.
+def column_statistics(file_path, columns, chunksize=100000):
+    stats = {column: (0, 0.0, 0.0) for column in columns}
+    for chunk in read_chunks(file_path, columns=columns, chunksize=chunksize):
+        for column in columns:
+            values = chunk[column].dropna().to_numpy(dtype=np.float64)
+            if len(values) == 0:
+                continue
+            n_a, mean_a, m2_a = stats[column]
+            n_b, mean_b = len(values), values.mean()
+            m2_b = np.square(values - mean_b).sum()
+
+            n = n_a + n_b
+            delta = mean_b - mean_a
+            stats[column] = (n, mean_a + delta * n_b / n, m2_a + m2_b + delta ** 2 * n_a * n_b / n)
+
+    # Sample standard deviation, like pandas' std()
+    return {column: {"count": n, "mean": mean, "std": np.sqrt(m2 / (n - 1)) if n > 1 else 0.0}
+            for column, (n, mean, m2) in stats.items()}
+
+# 2. Capping, Transforms and Dropped Columns
+# The second pass applies everything chunk by chunk using the statistics
+# from the first pass.
+def clean_chunks(file_path, stats, threshold=3, log_columns=(), drop_columns=(), chunksize=100000):
+    for chunk in read_chunks(file_path, chunksize=chunksize):
+        # Cap the outliers beyond the threshold
+        for column, column_stats in stats.items():
+            upper_limit = column_stats["mean"] + threshold * column_stats["std"]
+            lower_limit = column_stats["mean"] - threshold * column_stats["std"]
+            chunk[column] = chunk[column].astype(np.float64).clip(lower_limit, upper_limit)
+
+        # Transform Skewed Variables (log1p to handle zero values)
+        for column in log_columns:
+            chunk[column] = np.log1p(chunk[column])
+
+        # Dropping Redundant Features
+        yield chunk.drop(columns=list(drop_columns))
+
+def write_chunks(chunks, output_path):
+    """
+    Write cleaned chunks to Parquet, or to CSV when `output_path` ends in .csv.
+    Returns the number of rows written.
+    """
+    rows_written = 0
+    if str(output_path).endswith('.csv'):
+        for i, chunk in enumerate(chunks):
+            chunk.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0, index=False)
+            rows_written += len(chunk)
+        return rows_written
+
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in chunks:
+            if writer is None:
+                # Later chunks are cast to the schema of the first one, which is
+                # widened so that any later chunk fits: an integer column may
+                # hold fractions or NaN further down the file, so numbers are
+                # written as float64, and a text column that is all-null in the
+                # first chunk is inferred as type null, so it is written as string
+                schema = pa.Schema.from_pandas(chunk, preserve_index=False)
+                schema = pa.schema([field.with_type(pa.string()) if pa.types.is_null(field.type)
+                                    else field.with_type(pa.float64()) if pa.types.is_integer(field.type)
+                                    else field for field in schema])
+                writer = pq.ParquetWriter(output_path, schema)
+            writer.write_table(pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False))
+            rows_written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return rows_written
+
+def fix_outliers(input_path, output_path, columns, threshold=3, log_columns=(), drop_columns=(), chunksize=100000):
+    with stage("outlier_statistics") as record:
+        stats = column_statistics(input_path, columns, chunksize=chunksize)
+        record["rows"] = max((column_stats["count"] for column_stats in stats.values()), default=0)
+    with stage("outlier_cleaning") as record:
+        chunks = clean_chunks(input_path, stats, threshold=threshold, log_columns=log_columns,
+                              drop_columns=drop_columns, chunksize=chunksize)
+        record["rows"] = write_chunks(chunks, output_path)
+    return record["rows"]
+
+def main():
+    # Column list, threshold and paths come from configs/config.yaml
+    setup_stage_log()
+    config = load_config()["outliers"]
+    cleaned_file_path = resolve_path(config["output_path"])
+    rows_written = fix_outliers(
+        resolve_path(config["input_path"]),
+        cleaned_file_path,
+        config["columns"],
+        threshold=config.get("threshold", 3),
+        log_columns=config.get("log_columns", []),
+        drop_columns=config.get("drop_columns", []),
+        chunksize=config.get("chunksize", 100000),
+    )
+    print(f"Wrote {rows_written} cleaned rows to {cleaned_file_path}")
+
+if __name__ == '__main__':
+    main()
@@ -1,6 +1,8 @@
 import pandas as pd
 import random
 
+from src.utils.profiler import print_report, profile_dataset
+
 # Function to generate a seasonal demand factor
 def generate_seasonal_demand():
     # Seasonal demand can be higher or lower depending on the time of year
@@ -109,51 +111,11 @@ better_data = [generate_better_random_datapoint() for _ in range(1000)]
 # Create a DataFrame with improved data quality
 better_df = pd.DataFrame(better_data)
 data = better_df
-# Code to check for common data issues in the dataset
-
-# 1. Check for Missing Values
-missing_values = data.isnull().sum()
-print("Missing Values in Each Column:\n", missing_values)
-
-# 2. Identify Outliers Using Z-score Method
-from scipy import stats
-
-# Calculating z-scores for each numeric column to identify outliers
-z_scores = stats.zscore(data[numeric_columns])
-outliers = (abs(z_scores) > 3).sum(axis=0)
-print("\nNumber of Outliers in Each Numeric Column (Z-score > 3):\n", outliers)
-
-# 3. Check Skewness of Numeric Columns
-skewness = data[numeric_columns].skew()
-print("\nSkewness of Numeric Columns:\n", skewness)
-
-# 4. Analyze Distribution of Categorical Variables
-categorical_columns = data.select_dtypes(include=['object']).columns
-categorical_distributions = {col: data[col].value_counts() for col in categorical_columns}
-print("\nDistribution of Categorical Variables:")
-for col, distribution in categorical_distributions.items():
-    print(f"\n{col}:\n{distribution}")
-
-# 5. Check for Class Imbalance in Categorical Variables
-class_imbalance = {col: (data[col].value_counts(normalize=True) * 100).to_dict() for col in categorical_columns}
-print("\nClass Imbalance (Percentage Distribution) of Categorical Variables:")
-for col, imbalance in class_imbalance.items():
-    print(f"\n{col}:\n{imbalance}")
-
-# 6. Checking for High Correlation (Redundancy)
-high_correlation_pairs = []
-correlation_threshold = 0.8
-for i in range(len(numeric_columns)):
-    for j in range(i+1, len(numeric_columns)):
-        if abs(correlation_matrix.iloc[i, j]) > correlation_threshold:
-            high_correlation_pairs.append((numeric_columns[i], numeric_columns[j], correlation_matrix.iloc[i, j]))
-
-print("\nHighly Correlated Feature Pairs (Correlation > 0.8):")
-for pair in high_correlation_pairs:
-    print(f"{pair[0]} and {pair[1]}: {pair[2]}")
-
-# Output results
-missing_values, outliers, skewness, categorical_distributions, class_imbalance, high_correlation_pairs
+# Check for common data issues in the dataset: missing values, z-score
+# outliers, skewness, categorical distributions, class imbalance and highly
+# correlated pairs, all gathered in a single pass
+report = profile_dataset(data)
+print_report(report)
 
 
 # Save the DataFrame to a CSV file
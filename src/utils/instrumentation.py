@@ -0,0 +1,191 @@
+# instrumentation.py
+#
+# Lightweight stage timing for the pipeline. A stage is a block of work
+# (generation, encoding, training, a CSV write, ...) wrapped in
+#
+#   with stage("train_model", rows=len(X)) as record:
+#       ...
+#
+# or decorated with @instrumented("train_model"). Every stage records wall
+# and CPU time, rows (set up front or on the record inside the block) and
+# the change in resident memory, optionally the tracemalloc peak and a
+# cProfile dump. Finished stages are emitted as one JSON line each on the
+# "supplysim.stages" logger and, when an MLflow run is active, logged as
+# <stage>_seconds / _cpu_seconds / _rows / _rss_delta_mb metrics.
+
+import cProfile
+import functools
+import json
+import logging
+import os
+import sys
+import time
+import tracemalloc
+from collections import deque
+from contextlib import contextmanager
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # Not available on Windows
+    resource = None
+
+logger = logging.getLogger("supplysim.stages")
+
+# Stages to profile with cProfile, e.g. SUPPLYSIM_PROFILE=train_model,predict_horizon
+PROFILE_ENV = "SUPPLYSIM_PROFILE"
+DEFAULT_PROFILE_DIR = "reports/profiles"
+
+DEFAULT_LOG_PATH = "reports/stages.jsonl"
+
+# The most recent finished stages, for summarize()
+_records = deque(maxlen=10000)
+_depth = [0]
+
+
+def rss_mb():
+    """
+    Current resident set size of this process in MB (peak RSS where /proc is unavailable).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError, AttributeError):
+        if resource is None:
+            return float("nan")
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is reported in bytes on macOS and in kilobytes elsewhere
+        return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def _profiled_stages():
+    return {name.strip() for name in os.environ.get(PROFILE_ENV, "").split(",") if name.strip()}
+
+
+def _log_to_mlflow(record):
+    # Only when the caller already imported mlflow and started a run
+    mlflow = sys.modules.get("mlflow")
+    if mlflow is None or mlflow.active_run() is None:
+        return
+    metrics = {f"{record['stage']}_{key}": record[key]
+               for key in ("seconds", "cpu_seconds", "rows", "rss_delta_mb", "peak_traced_mb")
+               if record.get(key) is not None}
+    mlflow.log_metrics(metrics)
+
+
+# 1. Stages
+@contextmanager
+def stage(name, rows=None, trace_memory=False, profile=None, profile_dir=DEFAULT_PROFILE_DIR):
+    """
+    Time the enclosed block as stage `name` and yield its record (a dict).
+
+    Set record["rows"] inside the block when the row count is only known
+    there. `trace_memory` adds the tracemalloc peak (slower), and `profile`
+    (default: listed in SUPPLYSIM_PROFILE) dumps a cProfile of the block to
+    `profile_dir/<name>.prof`.
+    """
+    # Nested stages are also part of their parent's time
+    record = {"stage": name, "rows": rows, "depth": _depth[0]}
+    profile = name in _profiled_stages() if profile is None else profile
+    profiler = cProfile.Profile() if profile else None
+    tracing = trace_memory and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+
+    rss_start = rss_mb()
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    if profiler is not None:
+        profiler.enable()
+    _depth[0] += 1
+    try:
+        yield record
+    finally:
+        _depth[0] -= 1
+        if profiler is not None:
+            profiler.disable()
+        record["seconds"] = time.perf_counter() - wall_start
+        record["cpu_seconds"] = time.process_time() - cpu_start
+        record["rss_delta_mb"] = rss_mb() - rss_start
+        if trace_memory:
+            record["peak_traced_mb"] = tracemalloc.get_traced_memory()[1] / 1024 ** 2
+            if tracing:
+                tracemalloc.stop()
+        if profiler is not None:
+            Path(profile_dir).mkdir(parents=True, exist_ok=True)
+            record["profile"] = str(Path(profile_dir) / f"{name}.prof")
+            profiler.dump_stats(record["profile"])
+
+        _records.append(record)
+        logger.info(json.dumps(record))
+        _log_to_mlflow(record)
+
+
+def instrumented(name=None, rows=None, **options):
+    """
+    Decorator running the function as a stage (named after the function by default).
+
+    `rows` is a function of the return value giving the row count, e.g. len.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with stage(name or function.__name__, **options) as record:
+                result = function(*args, **kwargs)
+                if rows is not None:
+                    record["rows"] = rows(result)
+                return result
+        return wrapper
+    return decorator
+
+
+# 2. Records
+def stage_records(reset=False):
+    """
+    Records of the stages finished in this process, oldest first.
+    """
+    records = list(_records)
+    if reset:
+        _records.clear()
+    return records
+
+
+def configure_stage_log(path=None, stream=sys.stderr, level=logging.INFO):
+    """
+    Send stage records as JSON lines to `path` (appending) and/or `stream`.
+    """
+    logger.setLevel(level)
+    logger.propagate = False
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    if path is not None:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        logger.addHandler(logging.FileHandler(path))
+    if stream is not None:
+        logger.addHandler(logging.StreamHandler(stream))
+    return logger
+
+
+def setup_stage_log(config=None):
+    """
+    configure_stage_log() with the log path from the "instrumentation" section of configs/config.yaml.
+    """
+    from src.utils.config import load_config, resolve_path
+
+    config = (config or load_config()).get("instrumentation", {})
+    return configure_stage_log(resolve_path(config.get("log_path", DEFAULT_LOG_PATH)),
+                               stream=sys.stderr if config.get("stderr", False) else None)
+
+
+def summarize(records=None):
+    """
+    Stage records as a DataFrame with each stage's share of the total
+    wall time of the top-level stages.
+    """
+    import pandas as pd
+
+    frame = pd.DataFrame(records if records is not None else stage_records())
+    if len(frame):
+        frame["share"] = frame["seconds"] / frame.loc[frame["depth"] == 0, "seconds"].sum()
+    return frame
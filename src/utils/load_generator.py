@@ -0,0 +1,142 @@
+# load_generator.py
+#
+# Load generator for the prediction service (src/models/prediction_service.py).
+# `concurrency` client threads each keep one connection open and send
+# requests of `rows` simulated SKU rows back to back for `duration`
+# seconds. Client-side p50/p99 latency and throughput are reported next
+# to the service's own /metrics counters.
+#
+#   python -m src.utils.load_generator --url http://127.0.0.1:8765 --concurrency 16 --rows 1
+#   python -m src.utils.load_generator --socket /tmp/supplysim.sock --duration 5
+
+import argparse
+import http.client
+import json
+import sys
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from src.models.prediction_service import UnixHTTPConnection
+from src.utils.data_sim import simulate_daily_data
+
+
+def request_rows(n_skus=1000, seed=42):
+    """
+    JSON-ready prediction rows for `n_skus` simulated SKUs (one day).
+    """
+    day = datetime(2024, 1, 1)
+    simulated = simulate_daily_data(day, day, [f"SKU{i}" for i in range(n_skus)], seed=seed)
+    simulated = simulated.drop(columns=["Date"]).astype({"SKU": str})
+    return json.loads(simulated.to_json(orient="records"))
+
+
+def connect(url=None, socket_path=None, timeout=30):
+    if socket_path:
+        return UnixHTTPConnection(socket_path, timeout=timeout)
+    parts = urlsplit(url)
+    return http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+
+
+def _get_json(connection, method, path, body=None):
+    headers = {"Content-Type": "application/json"} if body is not None else {}
+    connection.request(method, path, body=body, headers=headers)
+    response = connection.getresponse()
+    payload = json.loads(response.read())
+    if response.status != 200:
+        raise RuntimeError(f"{method} {path} returned {response.status}: {payload.get('error')}")
+    return payload
+
+
+def run_load(url=None, socket_path=None, concurrency=8, duration=10.0, rows=1, n_skus=1000, seed=42):
+    """
+    Send prediction requests from `concurrency` threads for `duration` seconds.
+
+    Returns the client-side summary and the service's /metrics snapshot.
+    """
+    pool = request_rows(n_skus, seed)
+    latencies = [[] for _ in range(concurrency)]
+    errors = [0] * concurrency
+    start_barrier = threading.Barrier(concurrency + 1)
+
+    def client(worker):
+        rng = np.random.default_rng([seed, worker])
+        connection = connect(url, socket_path)
+        # Pre-encode the request bodies so the client measures the service, not json.dumps
+        bodies = [json.dumps({"rows": [pool[i] for i in rng.integers(0, len(pool), rows)]}) for _ in range(64)]
+        start_barrier.wait()
+        deadline = time.perf_counter() + duration
+        i = 0
+        while time.perf_counter() < deadline:
+            sent = time.perf_counter()
+            try:
+                _get_json(connection, "POST", "/predict", bodies[i % len(bodies)])
+            except (OSError, http.client.HTTPException, RuntimeError):
+                errors[worker] += 1
+                connection.close()
+                connection = connect(url, socket_path)
+            else:
+                latencies[worker].append(time.perf_counter() - sent)
+            i += 1
+        connection.close()
+
+    threads = [threading.Thread(target=client, args=(worker,), daemon=True) for worker in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    all_latencies = np.concatenate([np.array(worker_latencies) for worker_latencies in latencies]) * 1000
+    summary = {
+        "concurrency": concurrency,
+        "rows_per_request": rows,
+        "requests": len(all_latencies),
+        "errors": sum(errors),
+        "seconds": elapsed,
+        "requests_per_second": len(all_latencies) / elapsed,
+        "rows_per_second": len(all_latencies) * rows / elapsed,
+        "latency_p50_ms": float(np.percentile(all_latencies, 50)) if len(all_latencies) else None,
+        "latency_p99_ms": float(np.percentile(all_latencies, 99)) if len(all_latencies) else None,
+    }
+
+    connection = connect(url, socket_path)
+    try:
+        service = _get_json(connection, "GET", "/metrics")
+    finally:
+        connection.close()
+    return summary, service
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load generator for the prediction service")
+    parser.add_argument("--url", default="http://127.0.0.1:8765")
+    parser.add_argument("--socket", help="connect to this Unix socket instead of --url")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds")
+    parser.add_argument("--rows", type=int, default=1, help="SKU rows per request")
+    parser.add_argument("--skus", type=int, default=1000, help="number of distinct simulated SKU rows to send")
+    parser.add_argument("--output", help="write the client summary and service metrics to this JSON file")
+    args = parser.parse_args(argv)
+
+    summary, service = run_load(args.url, args.socket, concurrency=args.concurrency, duration=args.duration,
+                                rows=args.rows, n_skus=args.skus)
+    print(f"Client:  {summary['requests']} requests ({summary['errors']} errors) in {summary['seconds']:.1f}s, "
+          f"{summary['requests_per_second']:.0f} req/s, {summary['rows_per_second']:.0f} rows/s, "
+          f"p50 {summary['latency_p50_ms']:.2f} ms, p99 {summary['latency_p99_ms']:.2f} ms")
+    print(f"Service: {service['requests']} requests in {service['batches']} batches "
+          f"(mean {service['mean_batch_rows'] or 0:.1f} rows), p50 {service['latency_p50_ms'] or 0:.2f} ms, "
+          f"p99 {service['latency_p99_ms'] or 0:.2f} ms")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"client": summary, "service": service}, f, indent=2)
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,109 @@
+# parallel_sim.py
+#
+# Process-pool versions of the simulations in data_sim.py and
+# daily_timeseries_dataset.py. The SKU list (or product catalog) is cut into
+# fixed-size shards and every shard gets its own child seed spawned from one
+# root SeedSequence. Because the shard layout does not depend on the number
+# of workers, the merged output is bit-identical for any `n_workers`.
+# Workers write their shard to an Arrow IPC file and the parent memory-maps
+# the files back, so results never travel through pickled DataFrames.
+
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+import pyarrow as pa
+
+from src.utils.data_sim import simulate_daily_data
+from src.utils.daily_timeseries_dataset import generate_daily_series
+
+DEFAULT_SHARD_SIZE = 1000
+
+# 1. Arrow IPC helpers
+def write_arrow(df, path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    with pa.OSFile(str(path), 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+        writer.write_table(table)
+    return path
+
+def read_arrow(paths):
+    """
+    Memory-map Arrow IPC files and concatenate them into one table without copying.
+    """
+    tables = [pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all() for path in paths]
+    return pa.concat_tables(tables).unify_dictionaries()
+
+# 2. Shard workers
+def _simulate_shard(task):
+    shard_path, start_date, end_date, skus, seed = task
+    return write_arrow(simulate_daily_data(start_date, end_date, skus, seed=seed), shard_path)
+
+def _daily_series_shard(task):
+    shard_path, catalog_path, start, stop, start_date, n_days, seed = task
+    catalog = read_arrow([catalog_path]).slice(start, stop - start).to_pandas()
+    daily_df = generate_daily_series(catalog, start_date=start_date, n_days=n_days, seed=seed)
+    return write_arrow(daily_df, shard_path)
+
+def run_shards(worker, tasks, n_workers=None):
+    """
+    Run `worker` over `tasks` and return the shard file paths in task order.
+    """
+    n_workers = n_workers or os.cpu_count()
+    if n_workers == 1:
+        return [worker(task) for task in tasks]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(worker, tasks))
+
+# 3. Sharded simulations
+def parallel_simulate_daily_data(start_date, end_date, skus, seed=None, n_workers=None,
+                                 shard_size=DEFAULT_SHARD_SIZE, output_dir=None):
+    """
+    Sharded, multi-process version of simulate_daily_data.
+
+    Rows come back in the same date-major, SKU order as simulate_daily_data.
+    Shard files are kept in `output_dir` when given, otherwise they live in a
+    temporary directory for the duration of the call.
+    """
+    skus = list(skus)
+    shards = [skus[i:i + shard_size] for i in range(0, len(skus), shard_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(shards))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        shard_dir = Path(output_dir or tmp_dir)
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        tasks = [(shard_dir / f"shard-{i:05d}.arrow", start_date, end_date, shard, shard_seed)
+                 for i, (shard, shard_seed) in enumerate(zip(shards, seeds))]
+        paths = run_shards(_simulate_shard, tasks, n_workers)
+        simulated_data = read_arrow(paths).to_pandas()
+
+        # Shards are concatenated SKU-block by SKU-block; a stable sort on Date
+        # restores the date-major layout without reordering SKUs within a date
+        return simulated_data.sort_values('Date', kind='stable', ignore_index=True)
+
+def parallel_generate_daily_series(data, start_date=None, n_days=30, seed=None, n_workers=None,
+                                   shard_size=DEFAULT_SHARD_SIZE, output_dir=None):
+    """
+    Sharded, multi-process version of generate_daily_series.
+
+    The catalog is deduplicated on SKU up front so that every SKU lives in
+    exactly one shard, and it is handed to the workers as a memory-mapped
+    Arrow file rather than pickled slices.
+    """
+    if start_date is None:
+        start_date = datetime.now() - timedelta(days=60)
+
+    data = data.drop_duplicates(subset=["SKU"])
+    bounds = [(i, min(i + shard_size, len(data))) for i in range(0, len(data), shard_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(bounds))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        shard_dir = Path(output_dir or tmp_dir)
+        shard_dir.mkdir(parents=True, exist_ok=True)
+        catalog_path = write_arrow(data, Path(tmp_dir) / "catalog.arrow")
+        tasks = [(shard_dir / f"shard-{i:05d}.arrow", catalog_path, start, stop, start_date, n_days, shard_seed)
+                 for i, ((start, stop), shard_seed) in enumerate(zip(bounds, seeds))]
+        paths = run_shards(_daily_series_shard, tasks, n_workers)
+        return read_arrow(paths).to_pandas()
@@ -0,0 +1,223 @@
+# profiler.py
+#
+# Single-pass data-quality profile of a dataset: missing values, z-score
+# outliers, skewness, categorical distributions and class imbalance, and
+# highly correlated numeric pairs. The data is consumed chunk by chunk and
+# only mergeable summaries are kept, so the input can be far larger than
+# memory.
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+
+# 1. Chunk Sources
+def iter_chunks(source, chunksize=100000):
+    """
+    Yield DataFrame chunks from a DataFrame, a CSV/Parquet path or an iterable of DataFrames.
+    """
+    if isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunksize):
+            yield source.iloc[start:start + chunksize]
+    elif isinstance(source, (str, Path)):
+        if str(source).endswith('.parquet'):
+            import pyarrow.parquet as pq
+            for batch in pq.ParquetFile(source).iter_batches(batch_size=chunksize):
+                yield batch.to_pandas()
+        else:
+            yield from pd.read_csv(source, chunksize=chunksize)
+    else:
+        yield from source
+
+
+# 2. Mergeable Summaries
+class _StreamingHistogram:
+    """
+    Fixed number of equal-width bins whose range grows by doubling the bin
+    width, so values seen later never fall outside it.
+    """
+
+    def __init__(self, bins):
+        self.bins = bins
+        self.counts = None
+
+    def update(self, values):
+        values = values[np.isfinite(values)]
+        if len(values) == 0:
+            return
+        vmin, vmax = values.min(), values.max()
+        if self.counts is None:
+            self.lo = vmin
+            self.width = (vmax - vmin) / self.bins or max(abs(vmin), 1.0) * 1e-9
+            self.counts = np.zeros(self.bins, dtype=np.int64)
+
+        while vmin < self.lo or vmax >= self.lo + self.bins * self.width:
+            empty = np.zeros(self.bins, dtype=np.int64)
+            if vmin < self.lo:
+                self.counts = np.concatenate([empty, self.counts])
+                self.lo -= self.bins * self.width
+            else:
+                self.counts = np.concatenate([self.counts, empty])
+            self.counts = self.counts.reshape(-1, 2).sum(axis=1)
+            self.width *= 2
+
+        index = np.minimum(((values - self.lo) / self.width).astype(np.int64), self.bins - 1)
+        self.counts += np.bincount(index, minlength=self.bins)
+
+    def count_outside(self, lower, upper):
+        # Values are assumed uniform within the bin that straddles a limit
+        if self.counts is None:
+            return 0
+        edges = self.lo + np.arange(self.bins + 1) * self.width
+        above = np.clip((edges[1:] - upper) / self.width, 0, 1)
+        below = np.clip((lower - edges[:-1]) / self.width, 0, 1)
+        return int(round(float((self.counts * np.minimum(above + below, 1)).sum())))
+
+
+def _merge_moments(a, b):
+    """
+    Merge per-column (n, mean, M2, M3, M4) arrays of two partitions (Pébay, 2008).
+    """
+    n_a, mean_a, m2_a, m3_a, m4_a = a
+    n_b, mean_b, m2_b, m3_b, m4_b = b
+    n = n_a + n_b
+    safe_n = np.where(n == 0, 1, n)
+    delta = mean_b - mean_a
+
+    mean = mean_a + delta * n_b / safe_n
+    m2 = m2_a + m2_b + delta ** 2 * n_a * n_b / safe_n
+    m3 = (m3_a + m3_b + delta ** 3 * n_a * n_b * (n_a - n_b) / safe_n ** 2
+          + 3 * delta * (n_a * m2_b - n_b * m2_a) / safe_n)
+    m4 = (m4_a + m4_b + delta ** 4 * n_a * n_b * (n_a ** 2 - n_a * n_b + n_b ** 2) / safe_n ** 3
+          + 6 * delta ** 2 * (n_a ** 2 * m2_b + n_b ** 2 * m2_a) / safe_n ** 2
+          + 4 * delta * (n_a * m3_b - n_b * m3_a) / safe_n)
+    return n, mean, m2, m3, m4
+
+
+def _chunk_moments(values):
+    n = np.sum(~np.isnan(values), axis=0).astype(np.float64)
+    with np.errstate(invalid='ignore'):
+        mean = np.where(n > 0, np.nansum(values, axis=0) / np.where(n == 0, 1, n), 0.0)
+    deviation = values - mean
+    return (n, mean, np.nansum(deviation ** 2, axis=0), np.nansum(deviation ** 3, axis=0),
+            np.nansum(deviation ** 4, axis=0))
+
+
+# 3. Profile
+def profile_dataset(source, numeric_columns=None, categorical_columns=None, z_threshold=3,
+                    correlation_threshold=0.8, chunksize=100000, bins=4096):
+    """
+    Profile `source` in one pass over its chunks and return a report dict.
+
+    Numeric and categorical columns are detected from the first chunk
+    unless given. Skewness is the same bias-adjusted estimate as pandas'
+    skew(), z-scores use the population standard deviation like
+    scipy.stats.zscore (and is the reported "std"), and correlations are Pearson coefficients over the
+    rows where every numeric column is present. Outlier counts come from a
+    streaming histogram and are exact up to the one bin that straddles each
+    limit.
+    """
+    missing = None
+    moments = None
+    histograms = None
+    category_counts = None
+    co_moments = None  # (n, mean vector, co-moment matrix) over complete rows
+    n_rows = 0
+
+    for chunk in iter_chunks(source, chunksize=chunksize):
+        if missing is None:
+            if numeric_columns is None:
+                numeric_columns = chunk.select_dtypes(include=['number'], exclude=['bool']).columns.tolist()
+            if categorical_columns is None:
+                categorical_columns = chunk.select_dtypes(include=['object', 'category', 'string']).columns.tolist()
+            missing = pd.Series(0, index=chunk.columns, dtype=np.int64)
+            moments = tuple(np.zeros(len(numeric_columns)) for _ in range(5))
+            histograms = [_StreamingHistogram(bins) for _ in numeric_columns]
+            category_counts = {column: pd.Series(dtype=np.int64) for column in categorical_columns}
+            k = len(numeric_columns)
+            co_moments = (0, np.zeros(k), np.zeros((k, k)))
+
+        n_rows += len(chunk)
+        missing = missing.add(chunk.isnull().sum(), fill_value=0).astype(np.int64)
+
+        values = chunk[numeric_columns].to_numpy(dtype=np.float64)
+        moments = _merge_moments(moments, _chunk_moments(values))
+        for i, histogram in enumerate(histograms):
+            histogram.update(values[:, i])
+
+        for column in categorical_columns:
+            category_counts[column] = category_counts[column].add(
+                chunk[column].value_counts(), fill_value=0).astype(np.int64)
+
+        complete = values[~np.isnan(values).any(axis=1)]
+        if len(complete):
+            n_a, mean_a, c_a = co_moments
+            n_b, mean_b = len(complete), complete.mean(axis=0)
+            deviation = complete - mean_b
+            n = n_a + n_b
+            delta = mean_b - mean_a
+            co_moments = (n, mean_a + delta * n_b / n,
+                          c_a + deviation.T @ deviation + np.outer(delta, delta) * n_a * n_b / n)
+
+    if missing is None:
+        raise ValueError("Cannot profile an empty dataset")
+
+    n, mean, m2, m3, m4 = moments
+    with np.errstate(divide='ignore', invalid='ignore'):
+        # Adjusted Fisher-Pearson skewness, as computed by pandas
+        g1 = np.sqrt(n) * m3 / m2 ** 1.5
+        skewness = np.where((n > 2) & (m2 > 0), g1 * np.sqrt(n * (n - 1)) / (n - 2), np.nan)
+        std = np.sqrt(m2 / n)
+        _, _, co = co_moments
+        scale = np.sqrt(np.diag(co))
+        correlation = co / np.outer(scale, scale)
+
+    outliers = [histogram.count_outside(mu - z_threshold * sigma, mu + z_threshold * sigma)
+                for histogram, mu, sigma in zip(histograms, mean, std)]
+
+    # Vectorized search over the upper triangle of the correlation matrix
+    rows, columns = np.triu_indices(len(numeric_columns), k=1)
+    strong = np.abs(correlation[rows, columns]) > correlation_threshold
+    high_correlation_pairs = [(numeric_columns[i], numeric_columns[j], float(correlation[i, j]))
+                              for i, j in zip(rows[strong], columns[strong])]
+
+    categorical_distributions = {column: counts.sort_values(ascending=False)
+                                 for column, counts in category_counts.items()}
+    return {
+        "rows": n_rows,
+        "missing_values": missing,
+        "mean": pd.Series(np.where(n > 0, mean, np.nan), index=numeric_columns),
+        "std": pd.Series(std, index=numeric_columns),
+        "outliers": pd.Series(outliers, index=numeric_columns, dtype=np.int64),
+        "skewness": pd.Series(skewness, index=numeric_columns),
+        "categorical_distributions": categorical_distributions,
+        "class_imbalance": {column: (counts / counts.sum() * 100).to_dict()
+                            for column, counts in categorical_distributions.items()},
+        "correlation_matrix": pd.DataFrame(correlation, index=numeric_columns, columns=numeric_columns),
+        "high_correlation_pairs": high_correlation_pairs,
+    }
+
+
+def print_report(report, z_threshold=3, correlation_threshold=0.8):
+    print("Missing Values in Each Column:\n", report["missing_values"])
+    print(f"\nNumber of Outliers in Each Numeric Column (Z-score > {z_threshold}):\n", report["outliers"])
+    print("\nSkewness of Numeric Columns:\n", report["skewness"])
+
+    print("\nDistribution of Categorical Variables:")
+    for col, distribution in report["categorical_distributions"].items():
+        print(f"\n{col}:\n{distribution}")
+
+    print("\nClass Imbalance (Percentage Distribution) of Categorical Variables:")
+    for col, imbalance in report["class_imbalance"].items():
+        print(f"\n{col}:\n{imbalance}")
+
+    print(f"\nHighly Correlated Feature Pairs (Correlation > {correlation_threshold}):")
+    for pair in report["high_correlation_pairs"]:
+        print(f"{pair[0]} and {pair[1]}: {pair[2]}")
+
+
+if __name__ == '__main__':
+    import sys
+
+    print_report(profile_dataset(sys.argv[1]))
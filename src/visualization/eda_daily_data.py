@@ -1,36 +1,38 @@
 import pandas as pd
-import matplotlib.pyplot as plt
-
-file_path = 'S:/SJSU/DATA_226/group_project/daily_time_series_data.csv'
-daily_df = pd.read_csv(file_path)
-
-# Convert the 'Date' column to a datetime object
-daily_df['Date'] = pd.to_datetime(daily_df['Date'])
-
-# Plotting daily sales and stock levels for visualization
-plt.figure(figsize=(20, 6))
-
-# Plot daily sales
-plt.subplot(1, 2, 1)
-for sku in daily_df['SKU'].unique():
-    product_data = daily_df[daily_df['SKU'] == sku]
-    plt.plot(product_data['Date'], product_data['Daily Sales'], label=f"{sku} Sales")
-plt.xlabel('Date')
-plt.ylabel('Daily Sales')
-plt.title('Daily Sales Over Time')
-plt.legend()
-plt.tight_layout()
-plt.show()
-
-# Plot stock levels
-plt.subplot(1, 2, 2)
-for sku in daily_df['SKU'].unique():
-    product_data = daily_df[daily_df['SKU'] == sku]
-    plt.plot(product_data['Date'], product_data['Stock Level'], label=f"{sku} Stock Level")
-plt.xlabel('Date')
-plt.ylabel('Stock Level')
-plt.title('Stock Levels Over Time')
-plt.legend()
-
-plt.tight_layout()
-plt.show()
\ No newline at end of file
+
+from src.utils.config import load_config, resolve_path
+from src.visualization.rendering import render_figures, series_panel
+
+
+def eda_figures(daily_df, output_dir, max_series=20, max_points=1000):
+    """
+    Daily sales and stock level panels for every SKU, keyed by output path.
+    """
+    # Convert the 'Date' column to a datetime object, leaving the caller's frame as it was
+    daily_df = daily_df.assign(Date=pd.to_datetime(daily_df['Date']))
+    output_dir = resolve_path(output_dir)
+
+    # One figure each for daily sales and stock levels, rendered in parallel
+    return {
+        output_dir / 'daily_sales.png': [
+            series_panel(daily_df, 'Date', 'Daily Sales', title='Daily Sales Over Time',
+                         max_series=max_series, max_points=max_points),
+        ],
+        output_dir / 'stock_levels.png': [
+            series_panel(daily_df, 'Date', 'Stock Level', title='Stock Levels Over Time',
+                         max_series=max_series, max_points=max_points),
+        ],
+    }
+
+
+def main():
+    config = load_config().get('visualization', {})
+    daily_df = pd.read_csv(resolve_path(config.get('daily_series', 'daily_time_series_data.csv')))
+    figures = eda_figures(daily_df, config.get('output_dir', 'reports/figures'),
+                          max_series=config.get('max_series', 20), max_points=config.get('max_points', 1000))
+    for path in render_figures(figures):
+        print(f"Saved {path}")
+
+
+if __name__ == '__main__':
+    main()
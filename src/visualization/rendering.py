@@ -0,0 +1,180 @@
+# rendering.py
+#
+# Headless rendering of per-SKU time series. The frame is sorted once and
+# split into contiguous per-SKU slices instead of being filtered once per
+# SKU, every series is downsampled to what a figure can show (LTTB or
+# min/max buckets), and past `max_series` series the panel shows quantile
+# bands across SKUs instead of one line and legend entry per SKU. Panels
+# are plain dicts of arrays, so figures can be rendered to files in worker
+# processes. Figures are drawn on an Agg canvas without pyplot, so rendering
+# never switches the backend of the calling process (e.g. a notebook).
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_QUANTILES = (0.05, 0.25, 0.5, 0.75, 0.95)
+
+
+# 1. Grouping
+def group_series(frame, x, y, group="SKU"):
+    """
+    Split `frame` into one (x, y) series per `group` value with a single sort.
+
+    Returns (keys, x_values, y_values, starts, counts), where series i is
+    x_values[starts[i]:starts[i] + counts[i]] (sorted by x).
+    """
+    codes, keys = pd.factorize(frame[group], sort=True)
+    x_values = frame[x].to_numpy()
+    order = np.lexsort((x_values, codes))
+    codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]]) if len(codes) else np.zeros(0, dtype=np.int64)
+    counts = np.diff(np.r_[starts, len(codes)])
+    return np.asarray(keys), x_values[order], frame[y].to_numpy(dtype=np.float64)[order], starts, counts
+
+
+def _numeric(x):
+    x = np.asarray(x)
+    return x.astype("datetime64[ns]").astype(np.int64).astype(np.float64) if x.dtype.kind == "M" else x.astype(np.float64)
+
+
+# 2. Downsampling
+def lttb_indices(x, y, n_out):
+    """
+    Indices of the Largest-Triangle-Three-Buckets downsample of (x, y) to `n_out` points.
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    x = _numeric(x)
+    y = np.asarray(y, dtype=np.float64)
+
+    # n_out - 2 buckets between the fixed first and last points
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        next_lo, next_hi = (edges[i + 1], edges[i + 2]) if i + 2 < len(edges) else (n - 1, n)
+        x_c, y_c = x[next_lo:next_hi].mean(), y[next_lo:next_hi].mean()
+        area = np.abs((x[a] - x_c) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (y_c - y[a]))
+        a = lo + int(np.argmax(area))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(y, n_buckets):
+    """
+    Indices of the minimum and maximum of `y` in each of `n_buckets` equal buckets, in order.
+    """
+    n = len(y)
+    if 2 * n_buckets >= n:
+        return np.arange(n)
+    bucket = np.arange(n) * n_buckets // n
+    order = np.lexsort((y, bucket))
+    starts = np.flatnonzero(np.r_[True, bucket[order][1:] != bucket[order][:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.r_[order[starts], order[ends]])
+
+
+def downsample(x, y, max_points=1000, method="lttb"):
+    if method == "lttb":
+        index = lttb_indices(x, y, max_points)
+    elif method == "minmax":
+        index = minmax_indices(y, max_points // 2)
+    else:
+        raise ValueError(f"Unknown downsampling method {method!r}, expected 'lttb' or 'minmax'")
+    return x[index], y[index]
+
+
+# 3. Quantile Bands
+def quantile_bands(x_values, y_values, starts, counts, quantiles=DEFAULT_QUANTILES):
+    """
+    Quantiles of y across series at every distinct x.
+
+    Returns (x, bands) with bands of shape (len(quantiles), len(x)).
+    """
+    x, x_codes = np.unique(x_values, return_inverse=True)
+    series = np.repeat(np.arange(len(starts)), counts)
+    matrix = np.full((len(starts), len(x)), np.nan)
+    matrix[series, x_codes] = y_values
+    return x, np.nanquantile(matrix, quantiles, axis=0)
+
+
+# 4. Panels
+def series_panel(frame, x, y, group="SKU", title=None, xlabel=None, ylabel=None, max_series=20,
+                 max_points=1000, method="lttb", quantiles=DEFAULT_QUANTILES, marker=None):
+    """
+    Describe one axes of per-group lines, or of quantile bands when there are
+    more than `max_series` groups, as a picklable dict for render_figure().
+    """
+    keys, x_values, y_values, starts, counts = group_series(frame, x, y, group)
+    panel = {"title": title or f"{y} over {x}", "xlabel": xlabel or x, "ylabel": ylabel or y,
+             "lines": [], "bands": None}
+
+    if len(keys) <= max_series:
+        for key, start, count in zip(keys, starts, counts):
+            line_x, line_y = downsample(x_values[start:start + count], y_values[start:start + count],
+                                        max_points, method)
+            panel["lines"].append({"label": str(key), "x": line_x, "y": line_y, "marker": marker})
+        return panel
+
+    band_x, bands = quantile_bands(x_values, y_values, starts, counts, quantiles)
+    # Downsample along the median and keep the same x positions for every quantile
+    median = bands[len(quantiles) // 2]
+    index = lttb_indices(band_x, median, max_points) if method == "lttb" else minmax_indices(median, max_points // 2)
+    panel["bands"] = {"x": band_x[index], "quantiles": list(quantiles), "values": bands[:, index],
+                      "series": len(keys)}
+    return panel
+
+
+def _draw_panel(ax, panel):
+    if panel["bands"] is not None:
+        bands = panel["bands"]
+        values, n = bands["values"], len(bands["quantiles"])
+        for i in range(n // 2):
+            ax.fill_between(bands["x"], values[i], values[n - 1 - i], alpha=0.2 + 0.2 * i, color="tab:blue",
+                            linewidth=0, label=f"{bands['quantiles'][i]:.0%}-{bands['quantiles'][n - 1 - i]:.0%}")
+        ax.plot(bands["x"], values[n // 2], color="tab:blue", label=f"median of {bands['series']} series")
+    for line in panel["lines"]:
+        ax.plot(line["x"], line["y"], marker=line["marker"], label=line["label"])
+    ax.set_title(panel["title"])
+    ax.set_xlabel(panel["xlabel"])
+    ax.set_ylabel(panel["ylabel"])
+    ax.grid(True)
+    ax.legend()
+
+
+# 5. Rendering
+def render_figure(panels, output_path, figsize=None, dpi=100):
+    """
+    Render panels side by side into `output_path` on an Agg canvas.
+    """
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    from matplotlib.figure import Figure
+
+    fig = Figure(figsize=figsize or (10 * len(panels), 6))
+    FigureCanvasAgg(fig)
+    axes = fig.subplots(1, len(panels), squeeze=False)
+    for ax, panel in zip(axes[0], panels):
+        _draw_panel(ax, panel)
+    fig.tight_layout()
+    Path(output_path).parent.mkdir(parents=True, exist_ok=True)
+    fig.savefig(output_path, dpi=dpi)
+    return Path(output_path)
+
+
+def render_figures(figures, n_workers=None):
+    """
+    Render {output_path: [panel, ...]} in parallel worker processes.
+    Returns the written paths.
+    """
+    n_workers = min(n_workers or os.cpu_count() or 1, len(figures))
+    if n_workers <= 1:
+        return [render_figure(panels, path) for path, panels in figures.items()]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(render_figure, figures.values(), figures.keys()))
@@ -0,0 +1,31 @@
+import pytest
+
+from src.utils import benchmarks
+from src.utils.benchmarks import compare, save_results
+
+
+def results(**stages):
+    return {"results": [{"stage": stage, "n_skus": 100, "n_days": 30, "rows": 3000, "seconds": seconds,
+                         "peak_mb": peak_mb} for stage, (seconds, peak_mb) in stages.items()]}
+
+
+def test_compare_flags_only_regressions_beyond_the_tolerance():
+    baseline = results(simulate=(1.0, 50.0), train=(2.0, 100.0), tiny=(0.01, 0.1))
+    current = results(simulate=(1.1, 55.0), train=(2.6, 130.0), tiny=(0.03, 0.5))
+    comparison = compare(current, baseline, tolerance=0.2).set_index("stage")
+
+    # 10% slower passes, 30% slower and bigger fails, and noise-sized stages never flag
+    assert not comparison.loc["simulate", "regression"]
+    assert comparison.loc["train", ["time_regression", "memory_regression", "regression"]].all()
+    assert not comparison.loc["tiny", "regression"]
+    assert comparison.loc["train", "time_ratio"] == pytest.approx(1.3)
+
+
+def test_baseline_gate_exits_1_on_a_regression(tmp_path, monkeypatch):
+    baseline_path = tmp_path / "baseline.json"
+    save_results(results(simulate=(1.0, 50.0)), baseline_path)
+    exit_codes = []
+    for seconds in (1.05, 2.0):
+        monkeypatch.setattr(benchmarks, "run_suite", lambda *args, **kwargs: results(simulate=(seconds, 50.0)))
+        exit_codes.append(benchmarks.main(["--baseline", str(baseline_path)]))
+    assert exit_codes == [0, 1]
@@ -0,0 +1,39 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+import yaml
+
+HEAVY_MODULES = ["sklearn", "matplotlib", "mlflow"]
+
+
+def run_cli(*argv):
+    # In a fresh process, listing the heavy modules the command left in sys.modules
+    script = f"""
+import runpy, sys
+sys.argv = ["src", *{list(argv)!r}]
+try:
+    runpy.run_module("src", run_name="__main__")
+except SystemExit as exit:
+    assert not exit.code, exit.code
+print(sorted(name for name in {HEAVY_MODULES!r} if name in sys.modules))
+"""
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).resolve().parents[1])
+    return result.stdout.strip().splitlines()[-1]
+
+
+@pytest.mark.parametrize("command", ["--help", "simulate"])
+def test_light_commands_skip_heavy_imports(tmp_path, command):
+    config = tmp_path / "config.yaml"
+    config.write_text(yaml.safe_dump({
+        "simulate": {"start_date": "2024-01-01", "end_date": "2024-01-03", "skus": 5, "seed": 0,
+                     "output": str(tmp_path / "simulated.csv")},
+        "instrumentation": {"log_path": str(tmp_path / "stages.jsonl")},
+    }))
+    argv = ["--help"] if command == "--help" else ["--config", str(config), "simulate"]
+    assert run_cli(*argv) == "[]"
+    if command == "simulate":
+        assert len(pd.read_csv(tmp_path / "simulated.csv")) == 3 * 5
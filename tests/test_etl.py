@@ -0,0 +1,352 @@
+import sqlite3
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from src.etl import incremental, load
+from src.etl.aggregates import PredictionAggregates
+from src.etl.extract import available_path, extract
+from src.etl.features import FeatureEngine, compute_features
+from src.etl.transform import ingest, load_report
+from src.etl.load import SkuDateStore
+from src.utils.config import load_config, resolve_path
+from src.utils.fix_outliers import write_chunks
+from src.utils.profiler import _StreamingHistogram, iter_chunks, profile_dataset
+
+
+def daily_predictions(seed, skus=("SKU1", "SKU2"), start="2023-01-01", end="2023-01-31"):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range(start, end)
+    frame = pd.DataFrame({"SKU": np.repeat(skus, len(dates)), "Date": np.tile(dates, len(skus))})
+    frame["Restock Indicator"] = rng.integers(0, 2, len(frame))
+    frame["Restock Date (days)"] = rng.uniform(0, 30, len(frame))
+    frame["Restock Quantity"] = rng.integers(0, 100, len(frame))
+    frame["Predicted Costs"] = rng.uniform(0, 1000, len(frame))
+    frame["Product type"] = "haircare"
+    return frame
+
+
+def expected_weekly(predictions):
+    iso = predictions["Date"].dt.isocalendar()
+    weekly = predictions.groupby([iso["year"].astype("int64").rename("ISO Year"),
+                                  iso["week"].astype("int64").rename("Week"), "SKU"]).agg({
+        "Restock Indicator": "sum", "Restock Date (days)": "mean", "Restock Quantity": "sum",
+        "Predicted Costs": "sum", "Product type": "first"}).reset_index()
+    return weekly
+
+
+def test_aggregates_replace_repredicted_days(tmp_path):
+    first, second = daily_predictions(seed=42), daily_predictions(seed=7)
+    with SkuDateStore(tmp_path / "store.db") as store:
+        PredictionAggregates(store).add(first)
+    # A second run over the same days, as from data_sim.main with another seed
+    with SkuDateStore(tmp_path / "store.db") as store:
+        aggregates = PredictionAggregates(store)
+        assert aggregates.add(second) == len(second)
+        weekly = aggregates.weekly(["SKU1", "SKU2"], "2023-01-01", "2023-01-31")
+
+    assert_frame_equal(weekly, expected_weekly(second), check_dtype=False)
+
+
+def test_aggregates_merge_new_days_into_partial_weeks():
+    everything = daily_predictions(seed=0)
+    with SkuDateStore(":memory:") as store:
+        aggregates = PredictionAggregates(store)
+        # Day-by-day batches, each splitting a week that was already partly merged
+        for _, day in everything.groupby("Date"):
+            aggregates.add(day)
+        aggregates.add(everything.iloc[:10])
+        assert_frame_equal(aggregates.weekly(), expected_weekly(everything), check_dtype=False)
+
+
+def test_aggregates_report_more_skus_than_sql_variables():
+    skus = [f"SKU{i}" for i in range(1200)]
+    predictions = daily_predictions(seed=1, skus=skus, start="2023-01-02", end="2023-01-03")
+    with SkuDateStore(":memory:") as store:
+        # SQLite's lowest default limit on bound variables
+        store.connection.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+        aggregates = PredictionAggregates(store)
+        aggregates.add(predictions)
+        weekly = aggregates.weekly(skus[:1000] + ["SKU_missing"])
+        monthly = aggregates.monthly(skus)
+
+    assert sorted(weekly["SKU"]) == sorted(skus[:1000])
+    expected = expected_weekly(predictions)
+    assert_frame_equal(weekly, expected[expected["SKU"].isin(skus[:1000])].reset_index(drop=True), check_dtype=False)
+    assert len(monthly) == len(skus)
+
+
+def test_write_chunks_widens_the_first_chunks_types(tmp_path):
+    # All-null text and integers in the first chunk, a string and a fraction later
+    chunks = [pd.DataFrame({"SKU": ["SKU1", "SKU2"], "Notes": [None, None], "Price": [1.5, 2.5], "Lead time": [4, 5]}),
+              pd.DataFrame({"SKU": ["SKU3"], "Notes": ["late"], "Price": [3.5], "Lead time": [3.5]})]
+    output_path = tmp_path / "cleaned.parquet"
+    assert write_chunks(iter(chunks), output_path) == 3
+
+    written = pd.read_parquet(output_path)
+    assert written["Notes"].tolist()[2] == "late" and written["Notes"].isna().sum() == 2
+    assert written["Price"].tolist() == [1.5, 2.5, 3.5]
+    assert written["Lead time"].tolist() == [4.0, 5.0, 3.5]
+
+
+def test_profile_matches_pandas():
+    rng = np.random.default_rng(0)
+    frame = pd.DataFrame({"price": rng.lognormal(3, 0.5, 5000), "noise": rng.standard_t(3, 5000),
+                          "kind": rng.choice(["a", "b", "c"], 5000, p=[0.7, 0.2, 0.1])})
+    frame["revenue"] = frame["price"] * 2 + rng.normal(0, 1, 5000)
+    for column, share in (("price", 0.05), ("noise", 0.1), ("kind", 0.02)):
+        frame.loc[rng.random(5000) < share, column] = None
+    numeric = frame[["price", "noise", "revenue"]]
+
+    report = profile_dataset(frame, chunksize=700, z_threshold=3)
+    assert report["rows"] == 5000
+    assert report["missing_values"].equals(frame.isnull().sum())
+    pd.testing.assert_series_equal(report["mean"], numeric.mean())
+    pd.testing.assert_series_equal(report["std"], numeric.std(ddof=0))
+    pd.testing.assert_series_equal(report["skewness"], numeric.skew())
+    # Correlations only use the rows where every numeric column is present
+    pd.testing.assert_frame_equal(report["correlation_matrix"], numeric.dropna().corr())
+    assert [pair[:2] for pair in report["high_correlation_pairs"]] == [("price", "revenue")]
+    assert report["categorical_distributions"]["kind"].equals(frame["kind"].value_counts())
+
+    # Outlier counts come from a histogram, so a value in the bin that
+    # straddles a limit is counted as a fraction of that bin. The count is
+    # off by at most the number of values within one bin width of a limit.
+    for column in numeric:
+        values, mean, std = numeric[column], numeric[column].mean(), numeric[column].std(ddof=0)
+        histogram = _StreamingHistogram(4096)
+        for chunk in iter_chunks(frame, chunksize=700):
+            histogram.update(chunk[column].to_numpy(dtype=np.float64))
+        limits = np.array([mean - 3 * std, mean + 3 * std])
+        near_a_limit = (np.abs(values.to_numpy()[:, None] - limits) <= histogram.width).any(axis=1).sum()
+        assert abs(report["outliers"][column] - ((values - mean).abs() > 3 * std).sum()) <= near_a_limit
+
+
+def test_extract_reads_the_cleaned_catalog_parquet_with_its_schema(tmp_path):
+    cleaned = pd.DataFrame({"SKU": ["SKU1", "SKU2", "SKU1"], "Stock levels": [1.0, 2.5, 3.0]})
+    write_chunks([cleaned], tmp_path / "cleaned.parquet")
+
+    chunks = list(extract("cleaned_catalog", tmp_path / "cleaned.parquet", chunksize=2))
+    assert [len(chunk) for chunk in chunks] == [2, 1]
+    assert isinstance(chunks[0]["SKU"].dtype, pd.CategoricalDtype)
+    assert chunks[0]["Stock levels"].dtype == np.float64
+
+
+def test_ingest_keeps_missing_integers_and_reports_the_load(tmp_path):
+    source = tmp_path / "daily.csv"
+    source.write_text("Date,SKU,Daily Sales,Stock Level,Price\n"
+                      "2024-01-01,SKU1,5,100,9.5\n"
+                      "2024-01-01,SKU2,,80,12.25\n"
+                      "2024-01-02,SKU1,7,93,9.5\n")
+    datasets = {"daily_series": source}
+    paths = ingest(datasets, output_dir=tmp_path / "parquet")
+
+    ingested = pd.read_parquet(paths["daily_series"])
+    assert ingested["Daily Sales"].dtype == "Int32"
+    # Sorted by SKU and Date, with the missing count kept as <NA>
+    assert ingested["Daily Sales"].tolist() == [5, 7, pd.NA]
+    assert ingested["SKU"].astype(str).tolist() == ["SKU1", "SKU1", "SKU2"]
+
+    report = load_report(datasets, paths)
+    assert report["dataset"].tolist() == ["daily_series"]
+    timings = report.filter(regex="_seconds$|_mb$")
+    assert len(timings.columns) == 6 and (timings > 0).all(axis=None)
+
+
+def test_unwritten_cleaned_catalog_falls_back_to_the_tracked_csv(tmp_path, capsys):
+    assert available_path(tmp_path / "cleaned.parquet", "cleaned_catalog") == \
+        resolve_path("data/processed/cleaned_improved_dataset.csv")
+    assert "python -m src clean" in capsys.readouterr().err
+
+    write_chunks([pd.DataFrame({"SKU": ["SKU1"], "Price": [1.5]})], tmp_path / "cleaned.parquet")
+    assert available_path(tmp_path / "cleaned.parquet", "cleaned_catalog") == tmp_path / "cleaned.parquet"
+
+
+@pytest.fixture
+def pipeline(tmp_path):
+    """
+    Config for a pipeline over 20 catalog rows under `tmp_path`, and a function running its dated tasks for a ds.
+    """
+    def make(name):
+        catalog_path = tmp_path / "catalog.csv"
+        if not catalog_path.exists():
+            pd.read_csv(resolve_path("data/synthetic/improved_dataset.csv")).head(20).to_csv(catalog_path, index=False)
+        return {"pipeline": {"root": str(tmp_path / name), "catalog_source": str(catalog_path),
+                             "start_date": "2024-01-01"},
+                "load": {"database": str(tmp_path / f"{name}.db")},
+                "outliers": load_config()["outliers"]}
+    return make
+
+
+TASKS = (incremental.run_extract, incremental.run_fix_outliers, incremental.run_daily_series,
+         incremental.run_features, incremental.run_anomalies)
+
+
+def run_tasks(ds, config):
+    return [task(ds, config) for task in TASKS]
+
+
+def read_tables(config, tables=("daily_series", "features", "anomalies", "watermarks")):
+    with sqlite3.connect(config["load"]["database"]) as connection:
+        return {table: pd.read_sql_query(f'SELECT * FROM "{table}"', connection) for table in tables}
+
+
+def written_files(root):
+    return {path.relative_to(root): path.stat().st_mtime_ns for path in root.rglob("*") if path.is_file()}
+
+
+def test_pending_ranges_groups_skus_by_range():
+    done = {"A": "2024-01-03", "B": "2024-01-03", "C": "2024-01-05"}
+    ranges = incremental._pending_ranges(done, pd.Timestamp("2024-01-05"), "2024-01-01", ["A", "B", "C", "D"])
+    assert ranges == {(pd.Timestamp("2024-01-04"), pd.Timestamp("2024-01-05")): ["A", "B"],
+                      (pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-05")): ["D"]}
+
+
+def test_rerunning_the_same_ds_is_a_no_op(pipeline):
+    config = pipeline("daily")
+    assert all(run_tasks("2024-01-03", config))
+    tables, files = read_tables(config), written_files(resolve_path(config["pipeline"]["root"]))
+
+    assert run_tasks("2024-01-03", config) == [0, 0, 0, 0, 0]
+    assert written_files(resolve_path(config["pipeline"]["root"])) == files
+    for name, table in read_tables(config).items():
+        assert_frame_equal(table, tables[name])
+
+
+def test_backfill_matches_daily_runs(pipeline):
+    daily, backfill = pipeline("daily"), pipeline("backfill")
+    for ds in pd.date_range("2024-01-01", "2024-01-04"):
+        run_tasks(f"{ds:%Y-%m-%d}", daily)
+    run_tasks("2024-01-04", backfill)
+
+    daily_tables, backfill_tables = read_tables(daily), read_tables(backfill)
+    assert len(daily_tables["daily_series"]) == 20 * 4
+    for name in ("daily_series", "features", "anomalies"):
+        assert_frame_equal(backfill_tables[name], daily_tables[name])
+    # Catalog tasks record file fingerprints, the dated tasks the same last Dates
+    dated = lambda marks: marks[~marks["task"].isin(["extract", "fix_outliers"])]  # noqa: E731
+    assert_frame_equal(dated(backfill_tables["watermarks"]), dated(daily_tables["watermarks"]))
+
+
+def test_rerun_after_a_failure_replaces_its_partition_files(pipeline):
+    config = pipeline("daily")
+    root = resolve_path(config["pipeline"]["root"])
+    run_tasks("2024-01-02", config)
+    before = written_files(root / "daily_series")
+    assert sorted(path.parent.name for path in before) == ["date=2024-01-01", "date=2024-01-02"]
+
+    # The marks of a run that failed before moving them forward
+    with SkuDateStore(config["load"]["database"]) as store, store.connection:
+        store.connection.execute("DELETE FROM watermarks WHERE task = 'daily_series'")
+    rows = read_tables(config, ["daily_series"])["daily_series"]
+    assert incremental.run_daily_series("2024-01-02", config) == 40
+    rerun = written_files(root / "daily_series")
+    assert rerun.keys() == before.keys()
+    assert_frame_equal(read_tables(config, ["daily_series"])["daily_series"], rows)
+
+    # The next day gets its own file and leaves the earlier partitions alone
+    incremental.run_daily_series("2024-01-03", config)
+    after = written_files(root / "daily_series")
+    assert {path: after[path] for path in rerun} == rerun
+    assert [path.name for path in after if path not in rerun] == ["daily_series-20240103-20240103-00000.parquet"]
+
+
+def test_date_range_batches_many_skus(monkeypatch):
+    frame = pd.DataFrame({"SKU": np.repeat([f"SKU{i}" for i in range(7)], 3),
+                          "Date": np.tile(pd.date_range("2024-01-01", periods=3), 7), "Value": np.arange(21.0)})
+    with SkuDateStore(":memory:") as store:
+        store.upsert("series", frame)
+        monkeypatch.setattr(load, "MAX_SKU_VARIABLES", 2)
+        skus = ["SKU6", "SKU0", "SKU3", "SKU4", "SKU1"]
+        batched = store.date_range("series", "2024-01-02", "2024-01-03", skus=skus)
+
+    expected = frame[frame["SKU"].isin(skus) & (frame["Date"] >= "2024-01-02")]
+    assert_frame_equal(batched, expected.sort_values(["SKU", "Date"]).reset_index(drop=True))
+
+
+def test_store_upsert_replaces_rows_with_the_same_sku_and_date():
+    with SkuDateStore(":memory:") as store:
+        store.upsert("series", pd.DataFrame({"SKU": ["SKU1", "SKU1"], "Date": ["2024-01-01", "2024-01-02"],
+                                             "Value": [1.0, 2.0]}))
+        assert store.upsert("series", pd.DataFrame({"SKU": ["SKU1", "SKU2"], "Date": ["2024-01-02", "2024-01-02"],
+                                                    "Value": [5.0, None]})) == 2
+
+        assert store.history("series", "SKU1")["Value"].tolist() == [1.0, 5.0]
+        assert store.get("series", "SKU2", "2024-01-02") == {"SKU": "SKU2", "Date": pd.Timestamp("2024-01-02"),
+                                                            "Value": None}
+        assert store.get("series", "SKU2", "2024-01-01") is None
+        assert store.skus("series") == ["SKU1", "SKU2"]
+
+
+def test_store_ensure_table_adds_new_columns():
+    with SkuDateStore(":memory:") as store:
+        store.upsert("series", pd.DataFrame({"SKU": ["SKU1"], "Date": ["2024-01-01"], "Value": [1.0]}))
+        store.upsert("series", pd.DataFrame({"SKU": ["SKU1"], "Date": ["2024-01-02"], "Value": [2.0],
+                                             "Count": [3], "Label": ["x"]}))
+
+        assert store.columns("series") == ["SKU", "Date", "Value", "Count", "Label"]
+        rows = store.history("series", "SKU1")
+        assert rows["Count"].isna().tolist() == [True, False] and rows["Label"].isna().tolist() == [True, False]
+
+
+def test_store_date_range_filters_dates_and_skus():
+    frame = pd.DataFrame({"SKU": np.repeat(["SKU1", "SKU2", "SKU3"], 4),
+                          "Date": np.tile(pd.date_range("2024-01-01", periods=4), 3), "Value": np.arange(12.0)})
+    with SkuDateStore(":memory:") as store:
+        store.upsert("series", frame.sample(frac=1, random_state=0))
+
+        every_sku = store.date_range("series", "2024-01-02", "2024-01-03")
+        assert_frame_equal(every_sku, frame[frame["Date"].between("2024-01-02", "2024-01-03")]
+                           .reset_index(drop=True))
+        some = store.date_range("series", "2024-01-04", "2024-01-31", skus=["SKU3", "SKU1"], columns=["SKU", "Value"])
+        assert some.to_dict("list") == {"SKU": ["SKU1", "SKU3"], "Value": [3.0, 11.0]}
+        assert store.last_dates("series").to_dict() == {sku: pd.Timestamp("2024-01-04")
+                                                        for sku in ["SKU1", "SKU2", "SKU3"]}
+
+
+def test_store_watermarks_are_per_task_and_replaced():
+    with SkuDateStore(":memory:") as store:
+        assert store.watermarks("features") == {}
+        store.set_watermarks("features", {"SKU1": "2024-01-01", "SKU2": "2024-01-01"})
+        store.set_watermarks("features", {"SKU1": "2024-01-03"})
+        store.set_watermarks("anomalies", {"SKU1": "2024-01-02"})
+
+        assert store.watermarks("features") == {"SKU1": "2024-01-03", "SKU2": "2024-01-01"}
+        assert store.watermarks("anomalies") == {"SKU1": "2024-01-02"}
+
+
+def test_incremental_features_match_batch_and_pandas(tmp_path):
+    rng = np.random.default_rng(0)
+    dates = pd.date_range("2024-01-01", periods=20)
+    frame = pd.DataFrame({"SKU": np.tile(["SKU1", "SKU2", "SKU3"], len(dates)),
+                          "Date": np.repeat(dates, 3), "Daily Sales": rng.poisson(20, 3 * len(dates))})
+    params = {"lags": [1, 7], "windows": [3, 7], "spans": [7]}
+    batch = compute_features(frame, **params)
+
+    # One day at a time, saving and reloading the state halfway through
+    engine, days = FeatureEngine(**params), []
+    for i, (_, day) in enumerate(frame.groupby("Date")):
+        if i == 10:
+            engine.save(tmp_path / "feature_state.npz")
+            engine = FeatureEngine.load(tmp_path / "feature_state.npz")
+        days.append(engine.update(day))
+    incremental = pd.concat(days).sort_values(["SKU", "Date"], kind="stable").reset_index(drop=True)
+    assert_frame_equal(incremental, batch)
+
+    # The same features with pandas, filling missing history with 0
+    sales = batch.groupby("SKU")["Daily Sales"]
+    expected = {"Day of the Week": batch["Date"].dt.dayofweek}
+    for lag in params["lags"]:
+        expected[f"Lag_{lag}_Day_Sales"] = sales.shift(lag)
+    for window in params["windows"]:
+        expected[f"Rolling_{window}_Day_Mean_Sales"] = sales.transform(
+            lambda values: values.shift(1).rolling(window, min_periods=1).mean())
+        expected[f"Rolling_{window}_Day_Std_Sales"] = sales.transform(
+            lambda values: values.shift(1).rolling(window, min_periods=1).std())
+    for span in params["spans"]:
+        expected[f"EWMA_{span}_Day_Sales"] = sales.transform(
+            lambda values: values.ewm(span=span, adjust=False).mean().shift(1))
+    for name, values in expected.items():
+        np.testing.assert_allclose(batch[name], values.fillna(0), rtol=1e-9, atol=1e-9, err_msg=name)
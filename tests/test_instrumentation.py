@@ -0,0 +1,54 @@
+import json
+import sys
+import types
+
+import pytest
+
+from src.utils import instrumentation
+from src.utils.instrumentation import configure_stage_log, stage
+
+
+@pytest.fixture
+def stage_log(tmp_path):
+    # configure_stage_log() replaces the handlers of a module-level logger
+    logger = instrumentation.logger
+    handlers, propagate, level = list(logger.handlers), logger.propagate, logger.level
+    path = tmp_path / "logs" / "stages.jsonl"
+    configure_stage_log(path, stream=None)
+    yield path
+    configure_stage_log(stream=None)
+    logger.handlers[:], logger.propagate = handlers, propagate
+    logger.setLevel(level)
+
+
+def test_stage_records_are_appended_to_the_jsonl_log(stage_log):
+    with stage("outer", rows=10):
+        with stage("inner") as record:
+            record["rows"] = 4
+
+    records = [json.loads(line) for line in stage_log.read_text().splitlines()]
+    # Inner stages finish, and are written, first
+    assert [(record["stage"], record["rows"], record["depth"]) for record in records] == \
+        [("inner", 4, 1), ("outer", 10, 0)]
+    assert all(record["seconds"] >= 0 and "cpu_seconds" in record for record in records)
+
+
+def test_stage_metrics_go_to_the_active_mlflow_run(stage_log, monkeypatch):
+    logged = []
+    mlflow = types.ModuleType("mlflow")
+    mlflow.active_run = lambda: None
+    mlflow.log_metrics = logged.append
+    monkeypatch.setitem(sys.modules, "mlflow", mlflow)
+
+    # Nothing is logged outside a run
+    with stage("idle", rows=1):
+        pass
+    mlflow.active_run = lambda: object()
+    with stage("train_model") as record:
+        record["rows"] = 250
+
+    assert len(logged) == 1
+    assert logged[0]["train_model_rows"] == 250
+    assert logged[0]["train_model_seconds"] >= 0
+    assert set(logged[0]) == {"train_model_seconds", "train_model_cpu_seconds", "train_model_rows",
+                              "train_model_rss_delta_mb"}
@@ -0,0 +1,330 @@
+import os
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+import scipy.sparse as sp
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.tree import DecisionTreeRegressor
+
+from src.models.anomaly_detection import AnomalyDetector, detect_anomalies
+from src.models.compact_forest import CompactForest
+from src.models.encoder import FeatureEncoder
+from src.models.prediction_service import MicroBatcher
+from src.utils.data_sim import (generate_training_data, predict_day_by_day, predict_horizon, prepare_training_data,
+                                 simulate_daily_data, train_model)
+from src.utils.load_generator import request_rows
+
+
+@pytest.fixture(scope="module")
+def batcher():
+    X, y, encoder = prepare_training_data(generate_training_data(seed=0).iloc[:500])
+    model = RandomForestRegressor(n_estimators=5, random_state=0).fit(X, y)
+    batcher = MicroBatcher(model, encoder, max_wait_ms=50)
+    yield batcher
+    batcher.close()
+
+
+def test_micro_batcher_rejects_incomplete_rows_in_any_batch(batcher):
+    valid, incomplete = request_rows(2)
+    del incomplete["Price"]
+
+    alone = batcher.submit([incomplete])
+    with pytest.raises(KeyError):
+        alone.result(5)
+
+    # Queued next to a valid request, the incomplete row must still fail
+    # and the valid one must still be answered
+    good, bad = batcher.submit([valid]), batcher.submit([incomplete])
+    assert len(good.result(5)) == 1
+    with pytest.raises(KeyError):
+        bad.result(5)
+
+
+def test_micro_batcher_rejects_null_numeric_values(batcher):
+    valid, null_price = request_rows(2)
+    null_price["Price"] = None
+
+    good, bad = batcher.submit([valid]), batcher.submit([null_price])
+    assert len(good.result(5)) == 1
+    with pytest.raises(ValueError):
+        bad.result(5)
+
+
+def test_micro_batcher_matches_unbatched_predictions(batcher):
+    rows = request_rows(20)
+    batched = [batcher.submit([row]) for row in rows]
+    expected = batcher.predict(rows, timeout=5)
+    assert [future.result(5)[0] for future in batched] == expected
+    assert np.isfinite(batcher.metrics.snapshot()["latency_p99_ms"])
+
+
+def test_model_cache_exports_the_compact_forest_once(tmp_path, monkeypatch):
+    from src.models import model_cache
+    from src.models.model_cache import ModelCache
+
+    training_data = generate_training_data(seed=0).iloc[:300]
+    X, y, encoder = prepare_training_data(training_data)
+    exports = []
+    from_model = CompactForest.from_model
+    monkeypatch.setattr(model_cache.CompactForest, "from_model",
+                        classmethod(lambda cls, model: exports.append(model) or from_model(model)))
+
+    cache = ModelCache(tmp_path)
+    fit = lambda: RandomForestRegressor(n_estimators=3, random_state=0).fit(X, y)  # noqa: E731
+    model, hit = cache.get_or_fit(training_data, encoder, {"n": 3}, fit, compact=True)
+    assert isinstance(model, CompactForest) and not hit
+    model, hit = cache.get_or_fit(training_data, encoder, {"n": 3}, fit, compact=True)
+    assert isinstance(model, CompactForest) and hit
+    assert len(exports) == 1
+
+
+def test_model_cache_hits_until_the_data_or_params_change(tmp_path):
+    from src.models.model_cache import ModelCache
+
+    training_data = generate_training_data(seed=0).iloc[:200]
+    X, y, encoder = prepare_training_data(training_data)
+    changed_data = training_data.copy()
+    changed_data.loc[changed_data.index[0], "Price"] += 1
+    fits = []
+    fit = lambda: fits.append(1) or DecisionTreeRegressor(max_depth=3, random_state=0).fit(X, y)  # noqa: E731
+
+    cache = ModelCache(tmp_path)
+    hits = [cache.get_or_fit(data, encoder, params, fit)[1]
+            for data, params in [(training_data, {"max_depth": 3}), (training_data, {"max_depth": 3}),
+                                 (changed_data, {"max_depth": 3}), (training_data, {"max_depth": 4}),
+                                 (training_data, {"max_depth": 3})]]
+    assert hits == [False, True, False, False, True]
+    assert len(fits) == 3
+
+
+def test_model_cache_evicts_least_recently_used_and_abandoned_staging(tmp_path):
+    from src.models.model_cache import STAGING_MAX_AGE, ModelCache
+
+    X, y, encoder = prepare_training_data(generate_training_data(seed=0).iloc[:200])
+    model = DecisionTreeRegressor(max_depth=3, random_state=0).fit(X, y)
+    cache = ModelCache(tmp_path, max_bytes=float("inf"))
+    for age, key in enumerate(["b", "a"]):
+        entry = cache.put(key, model, encoder)
+        os.utime(entry, (1000 + age, 1000 + age))
+    entry_bytes = sum(f.stat().st_size for f in entry.rglob("*") if f.is_file())
+    # A crashed put() long ago, and one still being written by another process
+    abandoned, writing = tmp_path / ".staging-abandoned", tmp_path / ".staging-writing"
+    abandoned.mkdir(), writing.mkdir()
+    os.utime(abandoned, (time.time() - STAGING_MAX_AGE - 1,) * 2)
+
+    # Reading "b" makes "a" the least recently used entry
+    assert cache.get("b") is not None
+    cache.max_bytes = 2.5 * entry_bytes
+    cache.put("c", model, encoder)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [".staging-writing", "b", "c"]
+
+
+def daily_series(n_skus=5, n_days=40, seed=0):
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2024-01-01", periods=n_days)
+    skus = pd.Categorical(np.tile([f"SKU{i}" for i in range(n_skus)], n_days),
+                          categories=[f"SKU{i}" for i in range(n_skus + 3)])
+    frame = pd.DataFrame({"SKU": skus, "Date": np.repeat(dates, n_skus),
+                          "Daily Sales": rng.poisson(20, n_skus * n_days).astype(float),
+                          "Stock Level": rng.integers(0, 1000, n_skus * n_days).astype(float)})
+    # A few spikes so that some rows are flagged
+    frame.loc[rng.choice(len(frame), 5, replace=False), "Daily Sales"] = 500.0
+    return frame
+
+
+def test_anomaly_detector_streaming_matches_backfill(tmp_path):
+    frame = daily_series()
+    backfill = detect_anomalies(frame)
+    assert backfill["Anomaly"].any()
+
+    streaming = AnomalyDetector()
+    streamed = pd.concat([streaming.update(day) for _, day in frame.groupby("Date", observed=True)])
+
+    # Chunks of several days, reloading the saved state between chunks
+    state_path = tmp_path / "anomaly_state.npz"
+    chunked = []
+    for start in range(0, frame["Date"].nunique(), 9):
+        detector = AnomalyDetector.load(state_path) if state_path.exists() else AnomalyDetector()
+        dates = frame["Date"].drop_duplicates().iloc[start:start + 9]
+        chunked.append(detector.update(frame[frame["Date"].isin(dates)]))
+        detector.save(state_path)
+
+    assert_frame_equal(streamed.sort_index(), backfill)
+    assert_frame_equal(pd.concat(chunked).sort_index(), backfill)
+    # Unused categories get no state and no watermark
+    assert detector.last_dates() == {f"SKU{i}": "2024-02-09" for i in range(5)}
+
+
+def test_anomaly_detector_rejects_null_skus():
+    for skus in (["A", "B", None], pd.Categorical(["A", "B", None])):
+        frame = pd.DataFrame({"SKU": skus, "Date": ["2024-01-01"] * 3, "Daily Sales": [1.0, 2.0, 3.0],
+                              "Stock Level": [1.0, 2.0, 3.0]})
+        detector = AnomalyDetector()
+        with pytest.raises(ValueError):
+            detector.update(frame)
+        assert len(detector.skus_) == 0
+
+
+def test_anomaly_detector_rejected_update_leaves_state_unchanged():
+    frame = daily_series(n_skus=2, n_days=3)
+    detector = AnomalyDetector()
+    detector.update(frame)
+    skus, seen, marks = detector.skus_.copy(), detector.seen_.copy(), detector.last_dates()
+
+    # A new SKU next to a row that is not after SKU0's last date
+    stale = pd.DataFrame({"SKU": ["SKU9", "SKU0"], "Date": ["2024-01-04", "2024-01-03"],
+                          "Daily Sales": [1.0, 2.0], "Stock Level": [1.0, 2.0]})
+    with pytest.raises(ValueError, match="SKU0"):
+        detector.update(stale)
+    assert detector.skus_.equals(skus)
+    assert np.array_equal(detector.seen_, seen) and detector.last_dates() == marks
+
+
+@pytest.fixture(scope="module")
+def training_set():
+    return prepare_training_data(generate_training_data(seed=0).iloc[:400])
+
+
+@pytest.mark.parametrize("backend", ["forest", "multioutput_forest", "tree"])
+def test_compact_forest_matches_sklearn(backend, training_set, tmp_path):
+    X, y, _ = training_set
+    if backend == "tree":
+        model = DecisionTreeRegressor(random_state=0).fit(X, y.iloc[:, 0])
+    else:
+        model = train_model(X, y, backend=backend, n_estimators=4, n_jobs=1)
+    expected = model.predict(X)
+
+    compact = CompactForest.from_model(model)
+    # The memory-mapped export predicts the same as the in-memory one
+    loaded = CompactForest.load(compact.save(tmp_path / "forest"))
+    assert isinstance(loaded.threshold, np.memmap)
+    for forest in (compact, loaded):
+        for data in (np.asarray(X), sp.csr_matrix(X)):
+            predicted = forest.predict(data, block_size=97)
+            assert predicted.shape == expected.shape
+            np.testing.assert_allclose(predicted, expected, rtol=0, atol=1e-9)
+    if backend == "tree":
+        # Single-target output is 1-D like sklearn's, and every sample
+        # reaches the same leaf despite the float32 thresholds
+        assert expected.ndim == 1
+        leaves = compact.apply(np.ascontiguousarray(X, dtype=np.float32))[:, 0] - compact.roots[0]
+        assert np.array_equal(leaves, model.apply(X))
+
+
+def test_predict_horizon_matches_day_by_day(training_set):
+    X, y, encoder = training_set
+    model = train_model(X, y, n_estimators=4, n_jobs=1)
+    simulated = simulate_daily_data(pd.Timestamp("2023-01-01"), pd.Timestamp("2023-01-06"),
+                                    ["SKU47", "SKU48", "SKU49"], seed=3)
+
+    expected = predict_day_by_day(simulated, model, encoder)
+    for block_size in (None, 5):
+        predicted = predict_horizon(simulated, model, encoder, block_size=block_size)
+        assert_frame_equal(predicted.astype({"SKU": str, "Product type": str}),
+                           expected.astype({"SKU": str, "Product type": str}), check_dtype=False)
+
+
+def encoder_frame(n=60, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"Price": rng.uniform(1, 100, n), "Stock levels": rng.integers(0, 500, n),
+                         "Product type": rng.choice(["cosmetics", "haircare", "skincare"], n),
+                         "Location": pd.Categorical(rng.choice(["Delhi", "Mumbai"], n)),
+                         "Season": rng.choice(["Winter", "Spring", "Summer", "Fall"], n)})
+
+
+def test_feature_encoder_matches_get_dummies_and_standard_scaler():
+    from sklearn.preprocessing import StandardScaler
+
+    frame = encoder_frame()
+    encoded = FeatureEncoder().fit_transform(frame)
+    numeric = frame.select_dtypes(include=["number"])
+    expected = pd.concat([pd.DataFrame(StandardScaler().fit_transform(numeric), columns=numeric.columns),
+                          pd.get_dummies(frame.drop(columns=numeric.columns), drop_first=True)], axis=1)
+
+    assert FeatureEncoder().fit(frame).feature_names_ == expected.columns.tolist()
+    assert encoded.dtype == np.float32
+    np.testing.assert_allclose(encoded, expected.to_numpy(dtype=np.float64), rtol=1e-5, atol=1e-6)
+
+
+def test_feature_encoder_unseen_categories_and_sparse_output():
+    frame = encoder_frame()
+    cyclical = {"Season": ["Winter", "Spring", "Summer", "Fall"]}
+    dense = FeatureEncoder(cyclical_columns=cyclical).fit(frame)
+    sparse = FeatureEncoder(sparse=True, cyclical_columns=cyclical).fit(frame)
+
+    new = encoder_frame(n=5, seed=1)
+    new.loc[0, "Product type"] = "fragrance"
+    new.loc[1, "Season"] = "Monsoon"
+    encoded = dense.transform(new)
+    assert sp.issparse(sparse.transform(new))
+    np.testing.assert_array_equal(sparse.transform(new).toarray(), encoded)
+
+    names = dense.feature_names_
+    product_type = [i for i, name in enumerate(names) if name.startswith("Product type_")]
+    assert not encoded[0, product_type].any() and encoded[1:, product_type].sum() > 0
+    assert not encoded[1, [names.index("Season_Sin"), names.index("Season_Cos")]].any()
+
+
+def test_feature_encoder_round_trips(tmp_path):
+    import json
+
+    frame = encoder_frame()
+    encoder = FeatureEncoder(sparse=True, cyclical_columns={"Season": ["Winter", "Spring", "Summer", "Fall"]})
+    encoded = encoder.fit_transform(frame).toarray()
+
+    from_dict = FeatureEncoder.from_dict(json.loads(json.dumps(encoder.to_dict())))
+    loaded = FeatureEncoder.load(encoder.save(tmp_path / "encoder.json"))
+    for restored in (from_dict, loaded):
+        assert restored.feature_names_ == encoder.feature_names_
+        np.testing.assert_array_equal(restored.transform(frame).toarray(), encoded)
+
+
+class Killed(Exception):
+    pass
+
+
+def test_tuning_resumes_without_refitting_finished_trials(tmp_path, monkeypatch):
+    from src.models import tuning
+
+    data = encoder_frame(n=80)
+    data["Revenue"] = data["Price"] * 3 + np.random.default_rng(0).normal(0, 5, len(data))
+    fits = {"count": 0, "limit": None}
+
+    class CountingForest(RandomForestRegressor):
+        def fit(self, X, y, sample_weight=None):
+            if fits["count"] == fits["limit"]:
+                raise Killed()
+            fits["count"] += 1
+            return super().fit(X, y, sample_weight)
+
+    monkeypatch.setattr(tuning, "RandomForestRegressor", CountingForest)
+
+    def search(frame, journal):
+        fits["count"] = 0
+        return tuning.successive_halving_search(
+            frame, "Revenue", {"categorical_columns": ["Product type", "Location"], "numeric_columns": ["Price"]},
+            param_distributions={"max_depth": [2, 4, None], "min_samples_leaf": [1, 3]}, n_candidates=4, cv=2,
+            min_resource=2, max_resource=8, factor=2, n_jobs=1, journal_path=tmp_path / journal,
+            cache_dir=tmp_path / "cache", log_to_mlflow=False)
+
+    best_params, best_mse, trials = search(data, "full.jsonl")
+    total = fits["count"]
+
+    # Killed partway through the second rung, then resumed from the journal
+    fits["limit"] = 10
+    with pytest.raises(Killed):
+        search(data, "killed.jsonl")
+    fits["limit"] = None
+    journaled = sum(1 for _ in open(tmp_path / "killed.jsonl"))
+    resumed = search(data, "killed.jsonl")
+    assert journaled == 5 and fits["count"] == total - 2 * journaled
+    assert resumed[0] == best_params and resumed[1] == best_mse
+    assert_frame_equal(resumed[2].drop(columns="fit_seconds"), trials.drop(columns="fit_seconds"))
+
+    # Changed values with the same shape start a new search instead of reusing scores
+    changed = data.assign(Revenue=data["Revenue"] * 2)
+    search(changed, "killed.jsonl")
+    assert fits["count"] == total
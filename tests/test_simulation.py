@@ -0,0 +1,128 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+from pandas.testing import assert_frame_equal
+
+from src.models.simulation import InventorySimulation
+
+from src.utils.config import resolve_path
+from src.utils.data_sim import SIMULATED_COLUMNS, iter_daily_data, simulate_daily_data, simulate_to_files
+from src.utils.parallel_sim import parallel_generate_daily_series, parallel_simulate_daily_data
+
+SKUS = [f"SKU{i}" for i in range(23)]
+
+
+def test_parallel_simulation_is_identical_for_any_worker_count():
+    # Shards of 5 SKUs, so two workers each get several shards
+    runs = [parallel_simulate_daily_data(datetime(2024, 1, 1), datetime(2024, 1, 5), SKUS, seed=7,
+                                         n_workers=n_workers, shard_size=5) for n_workers in (1, 2)]
+    assert len(runs[0]) == 5 * len(SKUS)
+    assert_frame_equal(runs[0], runs[1])
+    # Date-major and SKU order within every date, like simulate_daily_data
+    assert runs[0]["SKU"].astype(str).tolist()[:len(SKUS)] == SKUS
+
+
+def test_parallel_daily_series_is_identical_for_any_worker_count():
+    catalog = pd.read_csv(resolve_path("data/synthetic/improved_dataset.csv")).head(40)
+    runs = [parallel_generate_daily_series(catalog, start_date="2024-01-01", n_days=6, seed=7,
+                                           n_workers=n_workers, shard_size=4) for n_workers in (1, 2)]
+    assert len(runs[0]) == 6 * catalog["SKU"].nunique()
+    assert_frame_equal(runs[0], runs[1])
+
+
+def read_partitions(output_dir):
+    # Every file of every date=YYYY-MM-DD partition, in date and file order
+    files = sorted(output_dir.glob("date=*/*.parquet"))
+    return as_strings(pd.concat([pd.read_parquet(path) for path in files], ignore_index=True))
+
+
+def as_strings(frame):
+    # Every chunk and file has its own categories
+    return frame.astype({name: str for name, kind, _ in SIMULATED_COLUMNS if kind in ("choice", "sku")})
+
+
+def test_simulation_is_reproducible_from_the_seed():
+    runs = [simulate_daily_data(datetime(2024, 1, 1), datetime(2024, 1, 10), SKUS, seed=seed) for seed in (3, 3, 4)]
+    assert_frame_equal(runs[0], runs[1])
+    assert not runs[0]["Price"].equals(runs[2]["Price"])
+    # A generator passed in gives what its seed gives
+    assert_frame_equal(simulate_daily_data(datetime(2024, 1, 1), datetime(2024, 1, 10), SKUS,
+                                           rng=np.random.default_rng(3)), runs[0])
+
+
+def test_simulation_schema_and_dtypes():
+    simulated = simulate_daily_data(datetime(2024, 1, 1), datetime(2024, 1, 10), SKUS, seed=0)
+    assert list(simulated.columns) == ["Date"] + [name for name, _, _ in SIMULATED_COLUMNS]
+    assert len(simulated) == 10 * len(SKUS)
+    assert simulated["Date"].dtype.kind == "M"
+    for name, kind, params in SIMULATED_COLUMNS:
+        column = simulated[name]
+        if kind == "sku":
+            assert isinstance(column.dtype, pd.CategoricalDtype) and list(column.cat.categories) == SKUS
+        elif kind == "choice":
+            assert isinstance(column.dtype, pd.CategoricalDtype) and list(column.cat.categories) == params
+        elif kind == "integers":
+            # Exclusive upper bound, like np.random.randint
+            assert column.dtype == np.int64 and column.min() >= params[0] and column.max() < params[1]
+        else:
+            assert column.dtype == np.float64 and column.min() >= params[0] and column.max() < params[1]
+
+
+def test_chunked_simulation_matches_the_in_memory_frame(tmp_path):
+    start_date, end_date = datetime(2024, 1, 1), datetime(2024, 1, 10)
+    # One chunk draws exactly what simulate_daily_data draws
+    single, = iter_daily_data(start_date, end_date, SKUS, chunk_days=10, seed=5)
+    assert_frame_equal(single, simulate_daily_data(start_date, end_date, SKUS, seed=5))
+
+    # Smaller chunks cover every cell once, and the files hold exactly the chunks
+    chunks = list(iter_daily_data(start_date, end_date, SKUS, chunk_days=3, chunk_skus=10, seed=5))
+    assert len(chunks) == 4 * 3
+    in_memory = as_strings(pd.concat(chunks, ignore_index=True).sort_values("Date", kind="stable")
+                           .reset_index(drop=True))
+    assert in_memory[["Date", "SKU"]].equals(as_strings(single)[["Date", "SKU"]])
+    assert simulate_to_files(start_date, end_date, SKUS, tmp_path, chunk_days=3, chunk_skus=10, seed=5) == \
+        len(in_memory)
+    assert_frame_equal(read_partitions(tmp_path), in_memory, check_dtype=False)
+
+
+def test_partition_layout_and_rerun_replaces_dates(tmp_path):
+    simulate_to_files(datetime(2024, 1, 1), datetime(2024, 1, 5), SKUS, tmp_path, chunk_days=1, seed=1)
+    assert sorted(path.name for path in tmp_path.iterdir()) == [f"date=2024-01-0{day}" for day in range(1, 6)]
+    assert [path.name for path in (tmp_path / "date=2024-01-03").iterdir()] == ["part-00002.parquet"]
+    untouched = read_partitions(tmp_path).query("Date < '2024-01-03'")
+
+    # A rerun over days 3-7 with another chunk layout names its files differently
+    simulate_to_files(datetime(2024, 1, 3), datetime(2024, 1, 7), SKUS, tmp_path, chunk_days=5, seed=2)
+    rerun = as_strings(simulate_daily_data(datetime(2024, 1, 3), datetime(2024, 1, 7), SKUS, seed=2))
+    written = read_partitions(tmp_path)
+    # Old files of the rerun's dates are gone, no staging file is left, and earlier dates are untouched
+    assert sorted(path.name for path in tmp_path.glob("date=*/*")) == ["part-00000.parquet"] * 5 + \
+        ["part-00000.parquet", "part-00001.parquet"]
+    assert_frame_equal(written.query("Date >= '2024-01-03'").reset_index(drop=True), rerun, check_dtype=False)
+    assert_frame_equal(written.query("Date < '2024-01-03'"), untouched)
+
+
+def test_inventory_simulation_follows_the_hand_computed_stock_path():
+    # 10 on hand, reorder 8 units at a position of 4 or less, arriving 2 days later
+    engine = InventorySimulation(initial_stock=10, reorder_point=4, order_quantity=8, lead_time=2)
+    steps = [engine.step(np.array([demand], dtype=np.float64)) for demand in [3, 3, 3, 3, 3, 5, 3]]
+
+    # Day 1 ends at 4 and orders, which arrives on day 3; day 4 orders again and
+    # day 5 can only sell the 3 units left
+    assert [step["ordered"][0] for step in steps] == [0, 8, 0, 0, 8, 0, 0]
+    assert [step["arrived"][0] for step in steps] == [0, 0, 0, 8, 0, 0, 8]
+    assert [step["lost"][0] for step in steps] == [0, 0, 0, 0, 0, 2, 0]
+    demand = np.array([[3], [3], [3], [3], [3], [5], [3]], dtype=np.float64)
+    _, summary, history = InventorySimulation(10, 4, 8, 2).run(demand, record=True)
+    assert history[:, 0].tolist() == [7, 4, 1, 6, 3, 0, 5]
+    assert summary.loc[0, "Sold"] == 21 and summary.loc[0, "Stockout Days"] == 1
+
+
+def test_inventory_simulation_rejects_same_day_orders():
+    engine = InventorySimulation(initial_stock=10, reorder_point=4, order_quantity=8, lead_time=2)
+    with pytest.raises(ValueError, match="at least 1 day"):
+        engine.step(np.array([3.0]), order_quantity=np.array([8.0]), lead_time=np.array([0]))
+    # Nothing was sold or advanced by the rejected day
+    assert engine.day == 0 and engine.on_hand.tolist() == [10]
@@ -0,0 +1,46 @@
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.visualization.eda_daily_data import eda_figures
+from src.visualization.rendering import render_figure, series_panel
+
+
+def test_render_figure_leaves_the_backend_alone(tmp_path):
+    # In a fresh process with an interactive-style backend selected, as in a notebook
+    script = f"""
+import matplotlib
+matplotlib.use("svg")
+import numpy as np, pandas as pd
+from src.visualization.rendering import render_figure, series_panel
+frame = pd.DataFrame({{"SKU": ["SKU1"] * 3, "Date": pd.date_range("2024-01-01", periods=3), "Sales": [1, 2, 3]}})
+render_figure([series_panel(frame, "Date", "Sales")], {str(tmp_path / "figure.png")!r})
+print(matplotlib.get_backend())
+"""
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                            cwd=Path(__file__).resolve().parents[1])
+    assert result.stdout.strip() == "svg"
+    assert (tmp_path / "figure.png").read_bytes()[:8] == b"\x89PNG\r\n\x1a\n"
+
+
+def test_render_figure_draws_bands_past_max_series(tmp_path):
+    frame = pd.DataFrame({"SKU": np.repeat([f"SKU{i}" for i in range(30)], 10),
+                          "Date": np.tile(pd.date_range("2024-01-01", periods=10), 30),
+                          "Sales": np.arange(300.0)})
+    panel = series_panel(frame, "Date", "Sales", max_series=20)
+    assert panel["bands"]["series"] == 30 and not panel["lines"]
+    assert render_figure([panel, series_panel(frame.head(20), "Date", "Sales")], tmp_path / "out" / "bands.png") \
+        .stat().st_size > 0
+
+
+def test_eda_figures_leave_the_callers_frame_alone(tmp_path):
+    daily_df = pd.DataFrame({"SKU": ["SKU1", "SKU2"] * 3,
+                             "Date": np.repeat(["2024-01-01", "2024-01-02", "2024-01-03"], 2),
+                             "Daily Sales": np.arange(6), "Stock Level": np.arange(6) * 10})
+    original = daily_df.copy()
+    figures = eda_figures(daily_df, tmp_path)
+    assert sorted(path.name for path in figures) == ["daily_sales.png", "stock_levels.png"]
+    pd.testing.assert_frame_equal(daily_df, original)